@@ -0,0 +1,230 @@
+"""
+Module containing static control flow analysis of loaded IPPcode2022 program.
+
+Author: Vilém Gottwald (xgottw07)
+Project: IPP 2022 - IPPcode2022 interpret
+"""
+
+from program import *
+
+
+class ControlFlow:
+    """Static control flow information about list of instructions."""
+
+    TERMINATING = (Jump, Return, Exit)
+    """Instructions that never continue with the following instruction."""
+
+    BRANCHING = (Jump, Jumpifeq, Jumpifneq, Call, Return, Exit)
+    """Instructions that end a basic block."""
+
+    @staticmethod
+    def labelIndexes(instructions):
+        """Returns dictionary mapping label names to their instruction indexes."""
+        indexes = dict()
+        for idx, instruction in enumerate(instructions):
+            if isinstance(instruction, Label):
+                indexes[instruction.getNT().name] = idx
+        return indexes
+
+    @staticmethod
+    def isTerminating(instruction):
+        """Returns bool whether instruction never continues with the next one."""
+        return isinstance(instruction, ControlFlow.TERMINATING)
+
+    @staticmethod
+    def leaders(instructions):
+        """Returns sorted list of basic block leaders (first instruction indexes)."""
+        leaders = {0}
+        for idx, instruction in enumerate(instructions):
+            if isinstance(instruction, Label):
+                leaders.add(idx)
+            elif isinstance(instruction, ControlFlow.BRANCHING):
+                leaders.add(idx + 1)
+
+        return sorted(idx for idx in leaders if idx < len(instructions))
+
+    @staticmethod
+    def blocks(instructions):
+        """Returns list of basic blocks as (start, end) index pairs, end exclusive."""
+        leaders = ControlFlow.leaders(instructions)
+        ends = leaders[1:] + [len(instructions)]
+        return list(zip(leaders, ends))
+
+
+class Subroutine:
+    """Statically analysed subroutine - code reached by CALL of its label."""
+    def __init__(self, entry):
+        """Creates subroutine starting with label on given instruction index."""
+        self.entry = entry
+        self.body = set()
+        """Indexes of instructions reachable from the entry label."""
+        self.calls = set()
+        """Entry indexes of called subroutines."""
+        self.returns = set()
+        """Indexes of RETURN instructions of the subroutine."""
+        self.consumed = 0
+        """Number of data stack items the subroutine takes from its caller."""
+        self.produced = 0
+        """Number of data stack items the subroutine leaves to its caller."""
+        self.ownFrame = False
+        """Subroutine creates frame for itself, so it doesn't use the caller's one."""
+
+
+class Subroutines:
+    """Static analysis of program subroutines."""
+
+    IMPURE = (Read, Write, Dprint, Break, Exit)
+    """Instructions with effects observable outside of subroutine."""
+
+    MAX_ITERATIONS = 32
+    """Maximal number of iterations of data stack effects fixpoint computation."""
+
+    @classmethod
+    def find(cls, instructions):
+        """Returns dictionary of subroutines (by entry index) called in the program."""
+        labels = ControlFlow.labelIndexes(instructions)
+        subroutines = dict()
+        for instruction in instructions:
+            if isinstance(instruction, Call):
+                entry = labels.get(instruction.args[0].name)
+                if entry is not None and entry not in subroutines:
+                    subroutines[entry] = cls._explore(instructions, labels, entry)
+        return {entry: sub for entry, sub in subroutines.items() if sub is not None}
+
+    @staticmethod
+    def _explore(instructions, labels, entry):
+        """Finds instructions reachable from subroutine entry until its returns.
+        Returns None if control flow of subroutine can't be followed statically."""
+        sub = Subroutine(entry)
+        work = [entry]
+        while work:
+            idx = work.pop()
+            if idx in sub.body:
+                continue
+            if idx >= len(instructions):
+                return None # program can end inside subroutine
+            instruction = instructions[idx]
+            sub.body.add(idx)
+
+            if isinstance(instruction, (Jump, Jumpifeq, Jumpifneq, Call)):
+                target = labels.get(instruction.args[0].name)
+                if target is None:
+                    return None
+                if isinstance(instruction, Call):
+                    sub.calls.add(target)
+                else:
+                    work.append(target)
+                if isinstance(instruction, Jump):
+                    continue
+
+            if isinstance(instruction, Return):
+                sub.returns.add(idx)
+            elif not isinstance(instruction, Exit):
+                work.append(idx + 1)
+
+        return sub
+
+    @classmethod
+    def isolated(cls, instructions, sub):
+        """Returns bool whether subroutine works only with the frame and data stack items
+        passed by its caller: it starts with PUSHFRAME (optionally preceded by CREATEFRAME),
+        pops the frame right before each RETURN and has no other effects
+        (input, output, global frame, exit)."""
+        pushIdx = sub.entry
+        while isinstance(instructions[pushIdx], Label):
+            pushIdx += 1
+        if isinstance(instructions[pushIdx], Createframe):
+            sub.ownFrame = True
+            pushIdx += 1
+        if not isinstance(instructions[pushIdx], Pushframe) or not sub.returns:
+            return False
+
+        labels = ControlFlow.labelIndexes(instructions)
+        for idx in sub.body:
+            instruction = instructions[idx]
+            if isinstance(instruction, cls.IMPURE):
+                return False
+            if isinstance(instruction, (Jump, Jumpifeq, Jumpifneq)) \
+                    and sub.entry <= labels[instruction.args[0].name] <= pushIdx:
+                return False # entry frame instructions would be executed again
+            if isinstance(instruction, Pushframe) and idx != pushIdx:
+                return False
+            if isinstance(instruction, Popframe) and idx + 1 not in sub.returns:
+                return False
+            if isinstance(instruction, Return) and not isinstance(instructions[idx - 1], Popframe):
+                return False
+            for arg in instruction.args:
+                if isinstance(arg, Variable) and arg.frame is GlobFrame:
+                    return False
+        return True
+
+    @classmethod
+    def pure(cls, instructions):
+        """Returns dictionary of pure subroutines (by entry index) with their data stack effects.
+
+        Subroutine is pure if it is isolated, calls only pure subroutines
+        and its data stack effect doesn't depend on taken path."""
+        candidates = {entry: sub for entry, sub in cls.find(instructions).items()
+                      if cls.isolated(instructions, sub)}
+
+        for _ in range(cls.MAX_ITERATIONS):
+            changed = False
+            for entry, sub in list(candidates.items()):
+                effect = None
+                if sub.calls.issubset(candidates):
+                    effect = cls._stackEffect(instructions, sub, candidates)
+                if effect is None:
+                    del candidates[entry]
+                    changed = True
+                elif effect != (sub.consumed, sub.produced):
+                    sub.consumed, sub.produced = effect
+                    changed = True
+            if not changed:
+                return candidates
+
+        return dict() # effects of recursive subroutines didn't stabilise
+
+    @staticmethod
+    def _stackEffect(instructions, sub, subroutines):
+        """Returns (consumed, produced) data stack effect of subroutine,
+        None if the data stack depth at some instruction depends on taken path."""
+        labels = ControlFlow.labelIndexes(instructions)
+        depths = {sub.entry: 0}
+        work = [sub.entry]
+        lowest = 0
+        returnDepth = None
+        while work:
+            idx = work.pop()
+            depth = depths[idx]
+            instruction = instructions[idx]
+
+            successors = list()
+            if isinstance(instruction, Pushs):
+                depth += 1
+            elif isinstance(instruction, Pops):
+                depth -= 1
+            elif isinstance(instruction, Call):
+                called = subroutines[labels[instruction.args[0].name]]
+                depth -= called.consumed
+                lowest = min(lowest, depth)
+                depth += called.produced
+            lowest = min(lowest, depth)
+
+            if isinstance(instruction, Return):
+                if returnDepth is not None and returnDepth != depth:
+                    return None
+                returnDepth = depth
+                continue
+            if isinstance(instruction, (Jump, Jumpifeq, Jumpifneq)):
+                successors.append(labels[instruction.args[0].name])
+            if not isinstance(instruction, Jump):
+                successors.append(idx + 1)
+
+            for successor in successors:
+                if successor not in depths:
+                    depths[successor] = depth
+                    work.append(successor)
+                elif depths[successor] != depth:
+                    return None
+
+        return (-lowest, returnDepth - lowest)
@@ -6,6 +6,7 @@ Project: IPP 2022 - IPPcode2022 interpret
 """
 
 from ret_codes import *
+import os
 import sys
 
 class ArgumentProcessor:
@@ -19,16 +20,172 @@ class ArgumentProcessor:
         self.statiFile = None
         self.stats = list()
 
+        self.loadOptions = dict()
+        """Program loading options passed to Program.load."""
+        self.options = dict()
+        """Interpretation options passed to Program.interpret."""
+        self.batch = None
+        self.batchOutput = None
+        self.schedule = None
+        self.scheduleOutput = None
+        self.scheduleOptions = dict()
+        """Scheduling options passed to Scheduler."""
+        self.timings = None
+
         for arg in sys.argv[:]:
-            if  arg in {"--insts", "--vars", "--hot"}:
+            if  arg in {"--insts", "--vars", "--hot", "--memohits", "--memomisses", "--opcodes",
+                        "--calldepth", "--stackdepth", "--framedepth", "--frames", "--written", "--reads",
+                        "--quickened", "--deopts", "--inlined"}:
                 self.stats.append(arg[2:])
                 sys.argv.remove(arg)
             elif arg.startswith("--stats="):
                 self.statiFile = arg[8:]
                 sys.argv.remove(arg)
+            elif arg.startswith("--stats-format="):
+                self.options["statsFormat"] = self._parseStatsFormat(arg[15:])
+                sys.argv.remove(arg)
+            elif arg.startswith("--optimize="):
+                self.loadOptions["optimize"] = self._parseLevel(arg[11:])
+                sys.argv.remove(arg)
+            elif arg == "--memoize":
+                self.loadOptions["memoize"] = 0
+                sys.argv.remove(arg)
+            elif arg.startswith("--memoize="):
+                self.loadOptions["memoize"] = self._parseNumber(arg[10:], int)
+                sys.argv.remove(arg)
+            elif arg == "--inline":
+                self.loadOptions["inline"] = 0
+                sys.argv.remove(arg)
+            elif arg.startswith("--inline="):
+                self.loadOptions["inline"] = self._parseNumber(arg[9:], int)
+                sys.argv.remove(arg)
+            elif arg == "--tail-calls":
+                self.loadOptions["tailCalls"] = True
+                sys.argv.remove(arg)
+            elif arg.startswith("--source-format="):
+                self.loadOptions["sourceFormat"] = self._parseSourceFormat(arg[16:])
+                sys.argv.remove(arg)
+            elif arg.startswith("--store="):
+                self.loadOptions["store"] = self._parseStore(arg[8:])
+                sys.argv.remove(arg)
+            elif arg == "--load-jobs":
+                self.loadOptions["jobs"] = os.cpu_count() or 1
+                sys.argv.remove(arg)
+            elif arg.startswith("--load-jobs="):
+                self.loadOptions["jobs"] = self._parseNumber(arg[12:], int)
+                sys.argv.remove(arg)
+            elif arg == "--footprint":
+                self.loadOptions["footprint"] = True
+                sys.argv.remove(arg)
+            elif arg.startswith("--max-steps="):
+                self._limits()["maxSteps"] = self._parseNumber(arg[12:], int)
+                sys.argv.remove(arg)
+            elif arg.startswith("--max-memory="):
+                self._limits()["maxMemory"] = self._parseNumber(arg[13:], int)
+                sys.argv.remove(arg)
+            elif arg.startswith("--timeout="):
+                self._limits()["timeout"] = self._parseNumber(arg[10:], float)
+                sys.argv.remove(arg)
+            elif arg.startswith("--trace="):
+                self.options["traceFile"] = arg[8:]
+                sys.argv.remove(arg)
+            elif arg.startswith("--trace-size="):
+                self.options["traceSize"] = self._parseNumber(arg[13:], int)
+                sys.argv.remove(arg)
+            elif arg.startswith("--hooks="):
+                self.options["hooks"] = self._parseHooks(arg[8:])
+                sys.argv.remove(arg)
+            elif arg.startswith("--checkpoint="):
+                self.options["checkpointFile"] = arg[13:]
+                sys.argv.remove(arg)
+            elif arg.startswith("--checkpoint-every="):
+                self.options["checkpointEvery"] = self._parseNumber(arg[19:], int)
+                sys.argv.remove(arg)
+            elif arg.startswith("--resume="):
+                self.options["resumeFile"] = arg[9:]
+                sys.argv.remove(arg)
+            elif arg == "--quicken":
+                self.options["quicken"] = True
+                sys.argv.remove(arg)
+            elif arg == "--tier":
+                self.options["tier"] = 0
+                sys.argv.remove(arg)
+            elif arg.startswith("--tier="):
+                self.options["tier"] = self._parseNumber(arg[7:], int)
+                sys.argv.remove(arg)
+            elif arg.startswith("--tier-log="):
+                self.options["tierLog"] = arg[11:]
+                sys.argv.remove(arg)
+            elif arg == "--debug":
+                self.options["debug"] = True
+                sys.argv.remove(arg)
+            elif arg.startswith("--debug="):
+                self.options["debug"] = arg[8:]
+                sys.argv.remove(arg)
+            elif arg.startswith("--expect-output="):
+                self.options["expectOutput"] = arg[16:]
+                sys.argv.remove(arg)
+            elif arg.startswith("--expect-rc="):
+                self.options["expectRc"] = arg[12:]
+                sys.argv.remove(arg)
+            elif arg.startswith("--coverage="):
+                self.options["coverageFile"] = arg[11:]
+                sys.argv.remove(arg)
+            elif arg.startswith("--timings="):
+                self.timings = arg[10:]
+                sys.argv.remove(arg)
+            elif arg.startswith("--batch="):
+                self.batch = arg[8:]
+                sys.argv.remove(arg)
+            elif arg.startswith("--batch-output="):
+                self.batchOutput = arg[15:]
+                sys.argv.remove(arg)
+            elif arg.startswith("--schedule="):
+                self.schedule = arg[11:]
+                sys.argv.remove(arg)
+            elif arg.startswith("--schedule-output="):
+                self.scheduleOutput = arg[18:]
+                sys.argv.remove(arg)
+            elif arg.startswith("--quantum="):
+                self.scheduleOptions["quantum"] = self._parseNumber(arg[10:], int)
+                sys.argv.remove(arg)
+            elif arg.startswith("--policy="):
+                self.scheduleOptions["policy"] = self._parsePolicy(arg[9:])
+                sys.argv.remove(arg)
 
-        if self.stats and self.statiFile is None:
+        if (self.stats or "statsFormat" in self.options) and self.statiFile is None:
+            self._paramErrExit()
+        if self.loadOptions.get("store") == "compact" \
+                and (self.loadOptions.get("optimize") or "memoize" in self.loadOptions or "inline" in self.loadOptions
+                     or "tailCalls" in self.loadOptions or "quicken" in self.options):
             self._paramErrExit()
+        if "coverageFile" in self.options and (self.loadOptions.get("optimize") or "inline" in self.loadOptions):
+            self._paramErrExit() # coverage is recorded by orders of instructions of source program
+        if "jobs" in self.loadOptions and self.loadOptions.get("sourceFormat") == "ippcode":
+            self._paramErrExit()
+        if "debug" in self.options and (self.loadOptions.get("store") == "compact" or "quicken" in self.options
+                                        or "limits" in self.options or "checkpointFile" in self.options):
+            self._paramErrExit()
+        if "tier" in self.options and (self.stats or self.statiFile is not None
+                                       or self.loadOptions.get("store") == "compact"
+                                       or any(option in self.options for option in ("debug", "limits", "checkpointFile",
+                                                                                    "hooks", "coverageFile", "traceFile"))):
+            self._paramErrExit()
+        self._checkDependentOption("tierLog", "tier")
+        self._checkDependentOption("expectRc", "expectOutput")
+        if "expectOutput" in self.options and "resumeFile" in self.options:
+            self._paramErrExit() # output written before the checkpoint is not repeated
+        self._checkDependentOption("traceSize", "traceFile")
+        self._checkDependentOption("checkpointEvery", "checkpointFile")
+        self._checkDependentOption("checkpointFile", "checkpointEvery")
+
+        if self.schedule is not None or self.scheduleOutput is not None or self.scheduleOptions:
+            self._parseSchedule()
+            return
+
+        if self.batch is not None or self.batchOutput is not None:
+            self._parseBatch()
+            return
 
         argc = len(sys.argv)
         if argc == 2:
@@ -57,6 +214,9 @@ class ArgumentProcessor:
         else:
             self._paramErrExit()
 
+        if self.options.get("debug") is True and (self.source is None or self.input is None):
+            self._paramErrExit() # debugger commands are read from standard input
+
     @staticmethod
     def _printHelp():
         print("Usage: python3.8 interpret.py")
@@ -66,6 +226,96 @@ class ArgumentProcessor:
         print(" --input=file    file with input for the interpretation itself")
         print("  One of these parameters has to be present.")
         print("  If file parameter missing, standard input is used instead of it")
+        print(" --source-format=name  format of source file: xml (default)")
+        print("  or ippcode (IPPcode22 source code, errors are reported with codes 21 - 23)")
+        print(" --optimize=N    optimize loaded program on level N (0 - 2)")
+        print("  1 removes unreachable instructions and redundant jumps,")
+        print("  2 also folds constant expressions and propagates constants and copies")
+        print("  STATI insts then counts executed instructions of the optimized program")
+        print(" --memoize[=N]   cache results of pure subroutines calls (N results, default 4096)")
+        print("  STATI insts then counts only executed instructions,")
+        print("  --memohits and --memomisses STATI options count cache hits and misses")
+        print(" --inline[=N]    replace calls of leaf subroutines with at most N instructions (default 8)")
+        print("  and without jumps out of their body by copies of their body,")
+        print("  STATI insts then counts only executed instructions, --inlined counts executed inlined calls")
+        print(" --tail-calls    execute CALL followed by RETURN (or by POPFRAME and RETURN) as jump,")
+        print("  so tail recursion doesn't grow the call stack")
+        print("  STATI insts then counts only executed instructions")
+        print(" --store=name    representation of loaded program: objects (default)")
+        print("  or compact (instructions stored in arrays, operands shared in tables),")
+        print("  compact store can't be combined with --optimize, --memoize, --inline, --tail-calls and --quicken")
+        print(" --load-jobs[=N]  load XML source larger than 1 MiB by N processes (default number of CPUs),")
+        print("  can't be combined with ippcode source format")
+        print(" --footprint     print number of loaded instructions and their size in memory to stderr")
+        print(" --stats=file    write STATI statistics selected by options --insts, --hot, --vars,")
+        print("  --memohits, --memomisses, --opcodes, --calldepth, --stackdepth, --framedepth,")
+        print("  --frames, --written, --reads, --quickened, --deopts and --inlined into file")
+        print(" --stats-format=name  format of STATI file: lines (default) or json")
+        print(" --quicken       rewrite arithmetic, relational, CONCAT and conditional jump instructions")
+        print("  into variants specialised for operand types they see (can't be combined with compact store)")
+        print(" --tier[=N]      compile region starting with label executed N times (default 100)")
+        print("  into Python function executing it, loop jumping to the label runs inside of it;")
+        print("  can't be combined with compact store, STATI, hooks, coverage, trace, debugger,")
+        print("  limits and checkpoints")
+        print(" --tier-log=file write tier-up events, compile time and side exits of compiled regions into file")
+        print(" --max-steps=N   end with error after N executed instructions (labels included)")
+        print(" --max-memory=N  end with error when interpret uses more than N MiB of memory")
+        print(" --timeout=N     end with error after N seconds of execution")
+        print("  Limits are checked periodically, exceeding them ends with exit code 59")
+        print(" --trace=file    record last executed instructions into binary trace file")
+        print(" --trace-size=N  number of recorded instructions (default 65536)")
+        print("  Trace file is written when interpretation ends and can be read by trace_decode.py")
+        print(" --hooks=modules  comma separated modules (names or .py files) registering execution hooks")
+        print("  Each module defines register(hooks) function, see hooks module")
+        print(" --coverage=file  record executed instructions and conditional jumps outcomes")
+        print("  into coverage file, merged with its existing coverage of the same program,")
+        print("  see coverage_report.py; can't be combined with --optimize and --inline")
+        print(" --debug[=file]  interpret program in debugger with breakpoints (by order or label),")
+        print("  watchpoints and stepping, commands are read from file or from standard input")
+        print("  (both --source and --input are required then), see help command of debugger;")
+        print("  can't be combined with compact store, --quicken, limits and checkpoints")
+        print(" --expect-output=file  compare output with expected output file while it is written,")
+        print("  the first difference ends execution with exit code 60 and its byte offset")
+        print(" --expect-rc=file      file with expected exit code, different exit code ends with exit code 60")
+        print(" --timings=file  write wall and CPU time, peak memory and garbage collections")
+        print("  of each interpret phase and numbers of loaded and executed instructions into file")
+        print(" --checkpoint=file     save interpret state into file periodically")
+        print(" --checkpoint-every=N  number of executed instructions between checkpoints")
+        print(" --resume=file   continue interpretation from state saved in checkpoint file")
+        print("  The same program, options and input have to be given when resuming")
+        print(" --batch=file         interpret program over each input file listed in file at once")
+        print(" --batch-output=dir   directory for output (NAME.out) and exit code (NAME.rc) of each input")
+        print("  Lanes with the same control flow are executed together (requires NumPy),")
+        print("  only --source, --optimize, --memoize, --inline and --tail-calls can be combined")
+        print("  with batch interpretation")
+        print(" --schedule=file      run jobs listed in file (line \"source [input [priority]]\") in one process")
+        print(" --schedule-output=dir  directory for output, error output and exit code of each job")
+        print(" --quantum=N     number of instructions executed by job before it yields (default 1000)")
+        print(" --policy=name   scheduling policy: fair (slice weighted by priority, default)")
+        print("  or priority (ready job with the highest priority runs first)")
+        print("  Job waiting for READ input (e.g. from pipe) yields until the input arrives,")
+        print("  only --optimize, --inline and --tail-calls can be combined with scheduled jobs")
+
+    def _parseBatch(self):
+        """Checks batch interpretation arguments, only source (and --optimize, --memoize,
+        --inline, --tail-calls) can be combined with them."""
+        if self.batch is None or self.batchOutput is None or self.stats or self.statiFile is not None \
+                or self.options:
+            self._paramErrExit()
+
+        argc = len(sys.argv)
+        if argc == 2 and sys.argv[1].startswith("--source="):
+            self.source = self._parseSource(sys.argv[1])
+        elif argc != 1:
+            self._paramErrExit()
+
+    def _parseSchedule(self):
+        """Checks scheduled jobs arguments, only --optimize, --inline and --tail-calls
+        can be combined with them."""
+        if self.schedule is None or self.scheduleOutput is None or self.stats or self.statiFile is not None \
+                or self.options or self.batch is not None or self.batchOutput is not None \
+                or "memoize" in self.loadOptions or len(sys.argv) != 1:
+            self._paramErrExit()
 
     @staticmethod
     def _parseSource(source):
@@ -77,6 +327,69 @@ class ArgumentProcessor:
         """Parses --input=file parameter and returns only file"""
         return input[8:]
 
+    def _limits(self):
+        """Returns execution limits options."""
+        return self.options.setdefault("limits", dict())
+
+    def _checkDependentOption(self, option, requiredOption):
+        """Exits with error if option is given without option it requires."""
+        if option in self.options and requiredOption not in self.options:
+            self._paramErrExit()
+
+    @classmethod
+    def _parseLevel(cls, level):
+        """Parses optimization level value."""
+        if level not in {"0", "1", "2"}:
+            cls._paramErrExit()
+        return int(level)
+
+    @classmethod
+    def _parseStatsFormat(cls, statsFormat):
+        """Parses STATI output file format name."""
+        if statsFormat not in {"lines", "json"}:
+            cls._paramErrExit()
+        return statsFormat
+
+    @classmethod
+    def _parseSourceFormat(cls, sourceFormat):
+        """Parses source file format name."""
+        if sourceFormat not in {"xml", "ippcode"}:
+            cls._paramErrExit()
+        return sourceFormat
+
+    @classmethod
+    def _parseStore(cls, store):
+        """Parses loaded program representation name."""
+        if store not in {"objects", "compact"}:
+            cls._paramErrExit()
+        return store
+
+    @classmethod
+    def _parsePolicy(cls, policy):
+        """Parses scheduling policy name."""
+        if policy not in {"fair", "priority"}:
+            cls._paramErrExit()
+        return policy
+
+    @classmethod
+    def _parseHooks(cls, modules):
+        """Parses comma separated list of hooks modules."""
+        modules = modules.split(",")
+        if "" in modules:
+            cls._paramErrExit()
+        return modules
+
+    @classmethod
+    def _parseNumber(cls, value, numType):
+        """Parses positive number option value of given type."""
+        try:
+            number = numType(value)
+        except ValueError:
+            cls._paramErrExit()
+        if number <= 0:
+            cls._paramErrExit()
+        return number
+
     @staticmethod
     def _paramErrExit():
         """Prints wrong params error to stderr and exits with corresponing code"""
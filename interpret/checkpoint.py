@@ -0,0 +1,123 @@
+"""
+Module containing checkpoints of interpret state.
+
+Checkpoint file format:
+    magic "IPPSNAP" (7 bytes), version (u16),
+    fingerprint of loaded program (20 bytes, SHA-1),
+    zlib compressed pickle of interpret state
+
+Author: Vilém Gottwald (xgottw07)
+Project: IPP 2022 - IPPcode2022 interpret
+"""
+
+import os
+import pickle
+import sys
+import zlib
+from hashlib import sha1
+from struct import Struct
+
+from program import *
+
+
+class Checkpoint(PeriodicTask):
+    """Periodic checkpoint of interpret state and resuming from it."""
+
+    MAGIC = b"IPPSNAP"
+    VERSION = 2
+    HEADER = Struct("<7sH20s")
+
+    def __init__(self, file, every):
+        """Creates checkpoint task saving state into file every given number of instructions."""
+        self.file = file
+        self.every = every
+        self.next = every
+
+    def nextSlice(self, executed):
+        """Returns number of instructions remaining to the next checkpoint."""
+        return self.next - executed
+
+    def check(self, executed):
+        """Saves the state if checkpoint was reached."""
+        if executed >= self.next and not Program.isFinished():
+            self.save()
+            self.next = executed + self.every
+
+    @staticmethod
+    def fingerprint():
+        """Returns fingerprint of loaded program (instruction orders and classes)."""
+        digest = sha1()
+        for instruction in Program.instructions:
+            if instruction is not None:
+                digest.update(f"{instruction.order}:{type(instruction).__name__};".encode())
+        return digest.digest()
+
+    @staticmethod
+    def capture():
+        """Returns current interpret state."""
+        return {
+            "counter": Program.counter.getIndex(),
+            "globFrame": GlobFrame._vars,
+            "locFrames": LocFrame._stack.stack,
+            "tempFrame": TempFrame._vars,
+            "callStack": Program.callStack.stack,
+            "dataStack": Program.dataStack.stack,
+            "readPosition": Program.readInput.position,
+            "stats": {name: getattr(Program.stats, name) for name in Stats.COUNTERS},
+        }
+
+    @staticmethod
+    def restore(state):
+        """Restores interpret state captured by capture."""
+        Program.counter.jumpTo(state["counter"])
+        Program.counter.jump = False
+
+        GlobFrame._vars = state["globFrame"]
+        LocFrame._stack.stack = state["locFrames"]
+        LocFrame._vars = None if LocFrame._stack.isEmpty() else LocFrame._stack.top()
+        TempFrame._vars = state["tempFrame"]
+        Frame.newGeneration()
+
+        Program.callStack.stack = state["callStack"]
+        Program.dataStack.stack = state["dataStack"]
+        Program.readInput.skipTo(state["readPosition"])
+        for name, value in state["stats"].items():
+            setattr(Program.stats, name, value)
+
+    def save(self):
+        """Atomically writes current interpret state into checkpoint file.
+        Output is flushed first, so the resumed run continues right after it."""
+        sys.stdout.flush()
+        payload = zlib.compress(pickle.dumps(self.capture(), pickle.HIGHEST_PROTOCOL), 1)
+        header = self.HEADER.pack(self.MAGIC, self.VERSION, self.fingerprint())
+
+        tmpFile = self.file + ".tmp"
+        try:
+            with open(tmpFile, "wb") as f:
+                f.write(header)
+                f.write(payload)
+            os.replace(tmpFile, self.file)
+        except OSError:
+            exitWMsg(OUTPUT_FILE_ERR, "Could not write checkpoint file.")
+
+    @classmethod
+    def resume(cls, file):
+        """Restores interpret state from checkpoint file."""
+        try:
+            with open(file, "rb") as f:
+                data = f.read()
+        except OSError:
+            exitWMsg(INPUT_FILE_ERR, "Couldn't open checkpoint file")
+
+        try:
+            magic, version, fingerprint = cls.HEADER.unpack_from(data)
+            if magic != cls.MAGIC or version != cls.VERSION:
+                raise ValueError
+            state = pickle.loads(zlib.decompress(data[cls.HEADER.size:]))
+        except Exception:
+            exitWMsg(INPUT_FILE_ERR, "Checkpoint file is not valid")
+
+        if fingerprint != cls.fingerprint():
+            exitWMsg(INPUT_FILE_ERR, "Checkpoint file was created for different program")
+
+        cls.restore(state)
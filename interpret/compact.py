@@ -0,0 +1,206 @@
+"""
+Module containing compact struct-of-arrays representation of loaded program.
+
+Instructions are not kept as objects, program is stored in flat arrays:
+    opcodes  - index of instruction class of each instruction (array 'B')
+    orders   - order of each instruction (array 'q', list if any order is out of its range)
+    argStart - index of the first operand of each instruction (array 'I'),
+               operands of instruction idx are argStart[idx]:argStart[idx + 1]
+    argKinds - kind of each operand (variable, constant, label or type; array 'B')
+    argIndex - index of each operand into the table of its kind (array 'I')
+Operands are shared in tables, every variable, constant and label is stored once.
+
+Program executes instructions taken from the store as from list of instructions.
+Indexing returns flyweight instruction of the opcode (one object per opcode)
+with order and operands of the indexed instruction.
+
+Author: Vilém Gottwald (xgottw07)
+Project: IPP 2022 - IPPcode2022 interpret
+"""
+
+import sys
+import xml.etree.ElementTree as ET
+from array import array
+from enum import Enum
+from types import FunctionType, ModuleType
+
+from program import *
+
+_VAR = 0
+_CONST = 1
+_LABEL = 2
+_TYPE = 3
+
+
+class CompactProgram:
+    """Loaded program stored in arrays with shared operand tables."""
+    def __init__(self):
+        self.opcodes = array("B")
+        self.orders = array("q")
+        self.argStart = array("I", [0])
+        self.argKinds = array("B")
+        self.argIndex = array("I")
+
+        self.classes = list()
+        """Instruction classes indexed by opcodes."""
+        self.variables = list()
+        self.constants = list()
+        self.labels = list()
+        self._tables = (self.variables, self.constants, self.labels, list(ConstantType))
+
+        self._flyweights = list()
+        self._lastIdx = None
+        self._last = None
+
+    @classmethod
+    def load(cls, source, sourceFormat = "xml", jobs = 1):
+        """Loads program from given input XML (or IPPcode22 source code) file into compact store."""
+        if sourceFormat == "ippcode":
+            from ippcode_parser import IppcodeParser
+            rows = IppcodeParser.rows(source)
+        elif jobs > 1:
+            from parallel_loader import ParallelLoader
+            rows = ParallelLoader.rows(source, jobs)
+        else:
+            rows = cls._xmlRows(source)
+
+        store = cls()
+        interned = dict()
+        classIds = dict()
+        for instrClass, order, args in rows:
+            if instrClass is Label:
+                Label.declare(args[0].name)
+
+            if instrClass not in classIds:
+                classIds[instrClass] = len(store.classes)
+                store.classes.append(instrClass)
+            store.opcodes.append(classIds[instrClass])
+            try:
+                store.orders.append(order)
+            except OverflowError: # order out of array range, orders are kept in list
+                store.orders = list(store.orders)
+                store.orders.append(order)
+            for arg in args:
+                kind, index = store._intern(arg, interned)
+                store.argKinds.append(kind)
+                store.argIndex.append(index)
+            store.argStart.append(len(store.argKinds))
+
+        store._sort()
+        store._setLabels()
+        store._flyweights = [instrClass.fromArgs(0, ()) for instrClass in store.classes]
+        return store
+
+    @staticmethod
+    def _xmlRows(source):
+        """Yields instruction class, order and arguments of each instruction of XML file."""
+        try:
+            root = ET.parse(source).getroot()
+        except ET.ParseError:
+            exitWMsg(XML_FORMAT_ERR, "Input xml is not well-formed")
+        except OSError:
+            exitWMsg(INPUT_FILE_ERR, "Couldn't open XML program source file")
+
+        Program._checkRoot(root)
+        for instrTag in root:
+            instrClass = Program._instructionClass(instrTag)
+            order = Instruction._parseOrder(instrTag)
+            args = Instruction._parseArgTags(instrTag)
+            instrClass._checkOperands(order, args)
+            yield instrClass, order, args
+        root.clear()
+
+    def _intern(self, arg, interned):
+        """Returns kind and table index of operand, equal operands share one table entry."""
+        if isinstance(arg, Variable):
+            kind, key, table = _VAR, (arg.frame, arg.name), self.variables
+        elif isinstance(arg, Constant):
+            value = float.hex(arg.value) if arg.type is ConstantType.FLOAT else arg.value
+            kind, key, table = _CONST, (arg.type, value), self.constants
+        elif isinstance(arg, LabelNT):
+            kind, key, table = _LABEL, arg.name, self.labels
+        else:
+            return _TYPE, arg.value
+
+        index = interned.get((kind, key))
+        if index is None:
+            index = len(table)
+            table.append(arg)
+            interned[(kind, key)] = index
+        return kind, index
+
+    def _sort(self):
+        """Sorts instructions by their order attribute in ascending order."""
+        orders = self.orders
+        if all(orders[i] < orders[i + 1] for i in range(len(orders) - 1)):
+            return
+
+        permutation = sorted(range(len(orders)), key = orders.__getitem__)
+        argStart = self.argStart
+        opcodes, argKinds, argIndex = array("B"), array("B"), array("I")
+        starts = array("I", [0])
+        for idx in permutation:
+            opcodes.append(self.opcodes[idx])
+            argKinds.extend(self.argKinds[argStart[idx]:argStart[idx + 1]])
+            argIndex.extend(self.argIndex[argStart[idx]:argStart[idx + 1]])
+            starts.append(len(argKinds))
+
+        self.opcodes, self.argKinds, self.argIndex, self.argStart = opcodes, argKinds, argIndex, starts
+        sortedOrders = [orders[idx] for idx in permutation]
+        self.orders = array("q", sortedOrders) if isinstance(orders, array) else sortedOrders
+
+    def _setLabels(self):
+        """Assigns labels their jump indexes."""
+        labelId = self.classes.index(Label) if Label in self.classes else None
+        for idx, opcode in enumerate(self.opcodes):
+            if opcode == labelId:
+                labelNT = self.labels[self.argIndex[self.argStart[idx]]]
+                Label.updateInstrIdx(labelNT, idx)
+
+    def __len__(self):
+        """Number of instructions including the terminating one."""
+        return len(self.opcodes) + 1
+
+    def __getitem__(self, idx):
+        """Returns instruction on given index, None for the terminating one.
+        Returned flyweight is valid until instruction of the same opcode is taken."""
+        if idx == self._lastIdx:
+            return self._last
+        if idx == len(self.opcodes):
+            return None
+        if idx < 0 or idx > len(self.opcodes):
+            raise IndexError(idx)
+
+        instruction = self._flyweights[self.opcodes[idx]]
+        instruction.order = self.orders[idx]
+        tables = self._tables
+        kinds = self.argKinds
+        indexes = self.argIndex
+        instruction.args = [tables[kinds[j]][indexes[j]]
+                            for j in range(self.argStart[idx], self.argStart[idx + 1])]
+        self._lastIdx = idx
+        self._last = instruction
+        return instruction
+
+
+def deepSize(root):
+    """Returns size of object with all objects reachable from it in bytes.
+    Classes, modules, functions and enumeration members are shared, so they are not counted."""
+    seen = set()
+    pending = [root]
+    size = 0
+    while pending:
+        obj = pending.pop()
+        if id(obj) in seen or isinstance(obj, (type, ModuleType, FunctionType, Enum)):
+            continue
+        seen.add(id(obj))
+        size += sys.getsizeof(obj)
+
+        if isinstance(obj, dict):
+            pending.extend(obj.keys())
+            pending.extend(obj.values())
+        elif isinstance(obj, (list, tuple, set, frozenset)):
+            pending.extend(obj)
+        if hasattr(obj, "__dict__"):
+            pending.append(vars(obj))
+    return size
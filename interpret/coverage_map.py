@@ -0,0 +1,200 @@
+"""
+Module containing instruction coverage bitmaps.
+
+Coverage records which instructions of loaded program were executed and which
+outcomes (taken, not taken) of conditional jumps occured, each as one bit
+per instruction. Executed instructions are marked once per new executed
+sequence of consecutive instructions (block hook), so repeated execution
+costs only a set lookup per sequence.
+
+Coverage file is written when interpretation ends. If the file already exists
+and was created for the same program, its bitmaps are merged with the new ones,
+so coverage accumulates over many runs. Files can be also merged and reported
+by coverage_report.py.
+
+Coverage file format (little endian):
+    header:  magic "IPPCOV", version (u16), fingerprint of program (20 bytes, SHA-1),
+             number of merged runs (u32), number of instructions (u32),
+             number of opcodes (u16), opcode names (u8 length + ASCII)
+    records: instruction order (u64, larger orders are stored as the maximal u64 value)
+             and opcode id (u8) of each instruction
+    bitmaps: executed, branch taken, branch not taken (ceil(count / 8) bytes each,
+             bit idx % 8 of byte idx // 8 belongs to instruction idx)
+
+Author: Vilém Gottwald (xgottw07)
+Project: IPP 2022 - IPPcode2022 interpret
+"""
+
+import os
+from hashlib import sha1
+from struct import Struct
+
+from ret_codes import *
+
+
+class CoverageMap:
+    """Coverage bitmaps of one program merged over any number of runs."""
+
+    MAGIC = b"IPPCOV"
+    VERSION = 2
+    HEADER = Struct("<6sH20sIIH")
+    RECORD = Struct("<QB")
+    MAX_ORDER = 2 ** 64 - 1
+
+    def __init__(self, opcodes, orders, opcodeIds, runs = 0):
+        """Creates empty coverage of instructions with given orders and opcode ids
+        (indexes into opcodes, list of all opcode names)."""
+        self.opcodes = opcodes
+        self.orders = orders
+        self.opcodeIds = opcodeIds
+        self.runs = runs
+        size = (len(orders) + 7) // 8
+        self.executed = bytearray(size)
+        self.taken = bytearray(size)
+        self.notTaken = bytearray(size)
+
+    def fingerprint(self):
+        """Returns fingerprint of covered program (instruction orders and opcodes)."""
+        digest = sha1()
+        for order, opcodeId in zip(self.orders, self.opcodeIds):
+            digest.update(f"{order}:{self.opcodes[opcodeId]};".encode())
+        return digest.digest()
+
+    @staticmethod
+    def isSet(bitmap, idx):
+        """Returns bool whether bit of instruction idx is set in bitmap."""
+        return bool(bitmap[idx >> 3] & (1 << (idx & 7)))
+
+    def merge(self, other):
+        """Merges coverage of other runs of the same program into this coverage."""
+        if other.fingerprint() != self.fingerprint():
+            raise ValueError("coverage of different program")
+        for bitmap, otherBitmap in ((self.executed, other.executed), (self.taken, other.taken),
+                                    (self.notTaken, other.notTaken)):
+            merged = int.from_bytes(bitmap, "little") | int.from_bytes(otherBitmap, "little")
+            bitmap[:] = merged.to_bytes(len(bitmap), "little")
+        self.runs += other.runs
+
+    def toBytes(self):
+        """Returns coverage file content."""
+        data = bytearray(self.HEADER.pack(self.MAGIC, self.VERSION, self.fingerprint(), self.runs,
+                                          len(self.orders), len(self.opcodes)))
+        for name in self.opcodes:
+            data += bytes([len(name)]) + name.encode("ascii")
+        for order, opcodeId in zip(self.orders, self.opcodeIds):
+            data += self.RECORD.pack(order, opcodeId)
+        return bytes(data + self.executed + self.taken + self.notTaken)
+
+    @classmethod
+    def fromBytes(cls, data):
+        """Parses coverage file content, raises ValueError if it is not valid."""
+        try:
+            magic, version, fingerprint, runs, count, opcodeCount = cls.HEADER.unpack_from(data)
+            if magic != cls.MAGIC or version != cls.VERSION:
+                raise ValueError("unsupported coverage file")
+
+            offset = cls.HEADER.size
+            opcodes = list()
+            for _ in range(opcodeCount):
+                length = data[offset]
+                opcodes.append(data[offset + 1:offset + 1 + length].decode("ascii"))
+                offset += 1 + length
+
+            records = [cls.RECORD.unpack_from(data, offset + i * cls.RECORD.size) for i in range(count)]
+            offset += count * cls.RECORD.size
+            coverage = cls(opcodes, [order for order, _ in records],
+                           [opcodeId for _, opcodeId in records], runs)
+            size = len(coverage.executed)
+            if len(data) != offset + 3 * size:
+                raise ValueError("truncated coverage file")
+            coverage.executed[:] = data[offset:offset + size]
+            coverage.taken[:] = data[offset + size:offset + 2 * size]
+            coverage.notTaken[:] = data[offset + 2 * size:]
+        except Exception as err:
+            raise ValueError("invalid coverage file") from err
+
+        if coverage.fingerprint() != fingerprint:
+            raise ValueError("invalid coverage file")
+        return coverage
+
+    @classmethod
+    def read(cls, file):
+        """Reads coverage file."""
+        with open(file, "rb") as f:
+            return cls.fromBytes(f.read())
+
+    def write(self, file):
+        """Atomically writes coverage file."""
+        tmpFile = file + ".tmp"
+        with open(tmpFile, "wb") as f:
+            f.write(self.toBytes())
+        os.replace(tmpFile, file)
+
+
+class CoverageRecorder:
+    """Records coverage of loaded program execution into coverage file."""
+
+    def __init__(self, file):
+        """Creates recorder of coverage of program loaded in Program class."""
+        from ippcode_parser import IppcodeParser
+        from program import Program
+
+        self.file = file
+        opcodes = sorted(IppcodeParser.opcodes())
+        self._opcodeIds = {name: i for i, name in enumerate(opcodes)}
+        orders, opcodeIds = list(), list()
+        self._indexes = dict()
+        for idx in range(len(Program.instructions) - 1):
+            instruction = Program.instructions[idx] # flyweight of compact store is reused
+            orders.append(min(instruction.order, CoverageMap.MAX_ORDER))
+            opcodeIds.append(self._opcodeId(instruction.__class__))
+            self._indexes[instruction.order] = idx
+        self.map = CoverageMap(opcodes, orders, opcodeIds, 1)
+        self._blocks = set()
+
+    def _opcodeId(self, instrClass):
+        """Returns opcode id of instruction class (specialised classes have id of their opcode)."""
+        for cls in instrClass.__mro__:
+            opcodeId = self._opcodeIds.get(cls.__name__.upper())
+            if opcodeId is not None:
+                return opcodeId
+        return 0
+
+    def register(self):
+        """Registers recording into program execution, hooks have to be installed then."""
+        from hooks import Hooks
+        from program import Program
+        Hooks.register("block", self.markBlock)
+        Hooks.register("branch", self.markBranch)
+        Program.finalizers.append(self.finish)
+
+    def markBlock(self, first, last):
+        """Marks executed sequence of consecutive instructions."""
+        block = (first, last)
+        if block in self._blocks:
+            return
+        self._blocks.add(block)
+        executed = self.map.executed
+        for idx in range(first, last + 1):
+            executed[idx >> 3] |= 1 << (idx & 7)
+
+    def markBranch(self, instruction, taken):
+        """Marks outcome of conditional jump."""
+        idx = self._indexes[instruction.order]
+        bitmap = self.map.taken if taken else self.map.notTaken
+        bitmap[idx >> 3] |= 1 << (idx & 7)
+
+    def finish(self, exitCode):
+        """Writes coverage file, merged with existing coverage of the same program."""
+        coverage = self.map
+        if os.path.exists(self.file):
+            try:
+                previous = CoverageMap.read(self.file)
+                previous.merge(coverage)
+                coverage = previous
+            except (OSError, ValueError):
+                exitWMsg(OUTPUT_FILE_ERR, "Existing coverage file is not valid or belongs to different program.")
+        try:
+            coverage.write(self.file)
+        except OSError:
+            exitWMsg(OUTPUT_FILE_ERR, "Could not write coverage file.")
@@ -0,0 +1,99 @@
+"""
+IPPcode22 coverage report
+
+Merges coverage files created by interpret --coverage=FILE option
+and prints coverage of instructions, conditional jumps and opcodes.
+
+    Usage: python3.8 coverage_report.py FILE... [--merge=OUTPUT] [--uncovered]
+        --merge=OUTPUT  write merged coverage into OUTPUT
+        --uncovered     list orders of not executed instructions
+                        and of conditional jumps with not covered outcome
+
+Author: Vilém Gottwald (xgottw07)
+Project: IPP 2022 - IPPcode2022 interpret
+"""
+
+import sys
+
+from coverage_map import CoverageMap
+
+BRANCHES = {"JUMPIFEQ", "JUMPIFNEQ"}
+
+
+def percent(part, whole):
+    """Returns readable percentage."""
+    return f"{100 * part / whole:.1f} %" if whole else "-"
+
+
+def report(coverage, uncovered):
+    """Prints coverage report."""
+    count = len(coverage.orders)
+    executed = [coverage.isSet(coverage.executed, idx) for idx in range(count)]
+    branches = [idx for idx in range(count) if coverage.opcodes[coverage.opcodeIds[idx]] in BRANCHES]
+    outcomes = sum(coverage.isSet(coverage.taken, idx) + coverage.isSet(coverage.notTaken, idx)
+                   for idx in branches)
+
+    print(f"# coverage of {coverage.runs} runs")
+    print(f"instructions: {sum(executed)}/{count} ({percent(sum(executed), count)})")
+    print(f"branch outcomes: {outcomes}/{2 * len(branches)} ({percent(outcomes, 2 * len(branches))})")
+
+    print("opcodes:")
+    perOpcode = dict()
+    for idx in range(count):
+        covered, total = perOpcode.get(coverage.opcodeIds[idx], (0, 0))
+        perOpcode[coverage.opcodeIds[idx]] = (covered + executed[idx], total + 1)
+    for opcodeId, name in enumerate(coverage.opcodes):
+        covered, total = perOpcode.get(opcodeId, (0, 0))
+        state = "not in program" if total == 0 else f"{covered}/{total}"
+        print(f"  {name:<12} {state}")
+
+    if uncovered:
+        print("not executed:", " ".join(str(coverage.orders[idx]) for idx in range(count) if not executed[idx]))
+        for idx in branches:
+            missing = [outcome for outcome, bitmap in (("taken", coverage.taken), ("not taken", coverage.notTaken))
+                       if not coverage.isSet(bitmap, idx)]
+            if missing:
+                print(f"branch order={coverage.orders[idx]} never {' nor '.join(missing)}")
+
+
+def main():
+    args = sys.argv[1:]
+    output = None
+    uncovered = False
+    for arg in args[:]:
+        if arg.startswith("--merge="):
+            output = arg[8:]
+            args.remove(arg)
+        elif arg == "--uncovered":
+            uncovered = True
+            args.remove(arg)
+    if not args:
+        print("Usage: python3.8 coverage_report.py FILE... [--merge=OUTPUT] [--uncovered]", file=sys.stderr)
+        exit(10)
+
+    coverage = None
+    for file in args:
+        try:
+            fileCoverage = CoverageMap.read(file)
+            if coverage is None:
+                coverage = fileCoverage
+            else:
+                coverage.merge(fileCoverage)
+        except OSError:
+            print("ERROR - Couldn't open coverage file", file, file=sys.stderr)
+            exit(11)
+        except ValueError:
+            print("ERROR - Invalid coverage file or coverage of different program", file, file=sys.stderr)
+            exit(11)
+
+    if output is not None:
+        try:
+            coverage.write(output)
+        except OSError:
+            print("ERROR - Couldn't write merged coverage file", file=sys.stderr)
+            exit(12)
+
+    report(coverage, uncovered)
+
+if __name__ == "__main__":
+    main()
@@ -93,6 +93,15 @@ class Constant(Symb):
         else: # ConstantType.NIL
             return ""
 
+    def toDebugString(self):
+        """Convert constant to type@value string with escaped string value (debugging output)."""
+        if self.type is ConstantType.NIL:
+            return "nil@nil"
+        value = self.toString()
+        if self.type is ConstantType.STRING:
+            value = sub(r"[\x00-\x20#\\]", lambda char: f"\\{ord(char.group()):03d}", value)
+        return f"{self.getTypeString()}@{value}"
+
     @staticmethod
     def parseFromStrXml(constTypeStr, string):
         """Creates new constant based on given string values from input XML."""
@@ -188,23 +197,51 @@ class Constant(Symb):
             exitWMsg(RUN_OPERANDS_ERR, "Wrong operand types")
 
 class Variable(Symb):
-    """Variable data type located in a frame"""
+    """Variable data type located in a frame.
+
+    Variable caches storage of its frame (dictionary of frame variables)
+    together with frames generation it was valid for, so accesses inside
+    one frames generation need just single dictionary lookup. Errors are
+    always reported by the frame itself.
+    """
     def __init__(self, name):
         """Creates new variable in frame based on its name"""
         self.name = name[3:]
         self.frame = Frame.parse(name)
+        self._vars = None
+        self._generation = -1
+
+    def _storage(self):
+        """Returns cached frame storage, refreshed if frames changed since last access."""
+        if self._generation != Frame.generation:
+            self._vars = self.frame._vars
+            self._generation = Frame.generation
+        return self._vars
 
     def getValue(self):
         """Get variable value, if its initialized, otherwise error"""
-        return self.frame.getVar(self.name)
+        try:
+            value = self._storage()[self.name]
+        except (KeyError, TypeError):
+            value = None
+        if value is None:
+            return self.frame.getVar(self.name)
+        return value
 
     def getValueUninit(self):
         """Get variable value, even if its uninitialized"""
-        return self.frame.getVar(self.name, hasToBeInit = False)
+        try:
+            return self._storage()[self.name]
+        except (KeyError, TypeError):
+            return self.frame.getVar(self.name, hasToBeInit = False)
 
     def updateValue(self, value):
         """Change value of given variable to given value"""
-        self.frame.updateVar(self.name, value)
+        storage = self._storage()
+        if storage is not None and self.name in storage:
+            storage[self.name] = value
+        else:
+            self.frame.updateVar(self.name, value)
     
     def define(self):
         """Defines new variable that is uninitialised"""
@@ -0,0 +1,314 @@
+"""
+Module containing interactive debugger of interpreted program.
+
+Breakpoints replace instructions in their slots of the loaded program by traps
+stopping the execution before the instruction, watchpoints switch instructions
+writing the watched variable to variants comparing its value before and after
+execution. Other instructions are executed by the ordinary main loop, so program
+runs at full speed between stops. BREAK instructions are breakpoints too.
+
+Commands (read from standard input or from file, one per line):
+    break ORDER|LABEL    stop before instructions with order or before label
+    delete ORDER|LABEL   remove breakpoint
+    watch VAR            stop after instruction writing variable changes its value
+    unwatch VAR          remove watchpoint
+    step [N]             execute N instructions (default 1)
+    continue             continue until breakpoint, watchpoint or program end
+    print VAR            print variable value
+    state                print counter, frames and stacks
+    detach               remove all breakpoints and watchpoints and continue
+    help                 list commands
+Commands can be abbreviated to their first letter (except delete, detach,
+unwatch and state). End of commands input detaches the debugger.
+
+Author: Vilém Gottwald (xgottw07)
+Project: IPP 2022 - IPPcode2022 interpret
+"""
+
+import sys
+
+from program import *
+
+
+class Stop(Exception):
+    """Interruption of program execution by debugger."""
+    def __init__(self, reason):
+        super().__init__(reason)
+        self.reason = reason
+
+
+class Trap:
+    """Instruction slot replacement stopping execution before the replaced instruction."""
+    def __init__(self, instruction, reason):
+        self.instruction = instruction
+        self.reason = reason
+
+    def exec(self):
+        raise Stop(self.reason)
+
+
+class Debugger:
+    """Debugger controlling execution of program loaded in Program class."""
+
+    PROMPT = "(debug) "
+
+    HELP = sys.modules[__name__].__doc__.split("one per line):\n")[1].split("Commands can")[0]
+    """List of commands from module documentation."""
+
+    active = None
+    """Debugger controlling execution."""
+
+    _watchedClasses = dict()
+
+    def __init__(self, commands = None):
+        """Creates debugger reading commands from file (standard input if None)."""
+        self.file = commands
+        self.commands = None
+        self.stepping = None
+        self._traps = dict()
+        """Traps by instruction index."""
+        self._watched = dict()
+        """Watched variables by their name with instructions switched to watching variants."""
+        self._watchStop = None
+        """Index of the next instruction and reason of stop after watched variable changed."""
+
+        for idx, instruction in enumerate(Program.instructions):
+            if isinstance(instruction, Break):
+                self._traps[idx] = Trap(instruction, "BREAK")
+                Program.instructions[idx] = self._traps[idx]
+
+    def run(self):
+        """Executes program under debugger control."""
+        if self.file is None:
+            self.commands = sys.stdin
+        else:
+            try:
+                self.commands = open(self.file)
+            except OSError:
+                exitWMsg(INPUT_FILE_ERR, "Couldn't open debugger commands file")
+
+        Debugger.active = self
+        self.prompt("start")
+        while not Program.isFinished():
+            try:
+                self._executeCurrent()
+                if self.stepping != 1 and self._watchStop is None and not Program.isFinished():
+                    Program.run(None if self.stepping is None else self.stepping - 1)
+            except Stop as stop:
+                self.prompt(stop.reason)
+                continue
+            if not Program.isFinished() and (self.stepping is not None or self._watchStop is not None):
+                self.prompt("step")
+
+        if self._watchStop is not None:
+            self._print(f"{self._watchStop[1]}, program ended")
+
+    def _executeCurrent(self):
+        """Executes instruction the program stopped at, also if it is replaced by trap."""
+        idx = Program.counter.getIndex()
+        trap = self._traps.get(idx)
+        if trap is None:
+            Program.run(1)
+            return
+
+        Program.instructions[idx] = trap.instruction
+        try:
+            Program.run(1)
+        finally:
+            if self._traps.get(idx) is trap:
+                Program.instructions[idx] = trap
+
+    def watchpointHit(self, reason):
+        """Stops execution before the next instruction after watched variable changed.
+        Writing instructions never jump, so the next instruction follows them."""
+        idx = Program.counter.getIndex() + 1
+        if Program.instructions[idx] is not None and idx not in self._traps:
+            Program.instructions[idx] = Trap(Program.instructions[idx], reason)
+        self._watchStop = (idx, reason)
+
+    # --- Commands -----
+
+    def prompt(self, reason):
+        """Stops execution and executes commands until execution continues."""
+        if self._watchStop is not None:
+            idx, reason = self._watchStop
+            self._watchStop = None
+            if isinstance(Program.instructions[idx], Trap) and idx not in self._traps:
+                Program.instructions[idx] = Program.instructions[idx].instruction
+
+        idx = Program.counter.getIndex()
+        self._print(f"stopped ({reason}) at {Program.positionDump(self._instruction(idx))}")
+        while True:
+            if self.file is None:
+                print(self.PROMPT, end = "", file = sys.stderr, flush = True)
+            line = self.commands.readline()
+            if not line:
+                self.detach()
+                return
+
+            command, *args = line.split() or ("",)
+            handler = self._COMMANDS.get(command)
+            if handler is None:
+                self._print(f"unknown command: {command}, see help")
+            elif handler(self, *args[:1]):
+                return
+
+    def breakpoint(self, where = None):
+        """Sets breakpoint on instructions with given order or label."""
+        indexes = self._indexes(where)
+        for idx in indexes:
+            if idx not in self._traps:
+                self._traps[idx] = Trap(Program.instructions[idx], f"breakpoint {where}")
+                Program.instructions[idx] = self._traps[idx]
+        if indexes:
+            self._print(f"breakpoint {where} at index {' '.join(map(str, indexes))}")
+
+    def delete(self, where = None):
+        """Removes breakpoint on instructions with given order or label."""
+        for idx in self._indexes(where):
+            trap = self._traps.pop(idx, None)
+            if trap is not None:
+                Program.instructions[idx] = trap.instruction
+
+    def watch(self, name = None):
+        """Watches changes of variable."""
+        var = self._variable(name)
+        if var is None or name in self._watched:
+            return
+
+        switched = list()
+        for idx in range(len(Program.instructions) - 1):
+            instruction = self._instruction(idx)
+            if "var" in instruction.operands[:1] \
+                    and instruction.args[0].frame is var.frame and instruction.args[0].name == var.name:
+                switched.append((instruction, instruction.__class__))
+                instruction.__class__ = self._watchedClass(instruction.__class__)
+        self._watched[name] = switched
+        self._print(f"watchpoint {name} on {len(switched)} instructions")
+
+    def unwatch(self, name = None):
+        """Stops watching variable."""
+        for instruction, instrClass in self._watched.pop(name, ()):
+            instruction.__class__ = instrClass
+
+    def step(self, count = "1"):
+        """Executes given number of instructions."""
+        try:
+            self.stepping = int(count)
+        except ValueError:
+            self._print("step count has to be a number")
+            return False
+        if self.stepping < 1:
+            self.stepping = 1
+        return True
+
+    def cont(self):
+        """Continues execution."""
+        self.stepping = None
+        return True
+
+    def printVar(self, name = None):
+        """Prints value of variable."""
+        var = self._variable(name)
+        if var is not None:
+            self._print(f"{name} = {self._value(var)}")
+
+    def state(self):
+        """Prints counter, frames and stacks."""
+        idx = Program.counter.getIndex()
+        self._print(Program.stateDump(self._instruction(idx)), end = "")
+
+    def detach(self):
+        """Removes breakpoints and watchpoints and continues execution without stops."""
+        for name in list(self._watched):
+            self.unwatch(name)
+        for idx, trap in self._traps.items():
+            Program.instructions[idx] = trap.instruction
+        self._traps = dict()
+        self.stepping = None
+        return True
+
+    def help(self):
+        """Prints list of commands."""
+        self._print(self.HELP, end = "")
+
+    _COMMANDS = {
+        "": lambda self: False,
+        "break": breakpoint, "b": breakpoint,
+        "delete": delete,
+        "watch": watch, "w": watch,
+        "unwatch": unwatch,
+        "step": step, "s": step,
+        "continue": cont, "c": cont,
+        "print": printVar, "p": printVar,
+        "state": state,
+        "detach": detach,
+        "help": help, "h": help,
+    }
+
+    # --- Helpers -----
+
+    def _instruction(self, idx):
+        """Returns instruction on index (also if it is replaced by trap)."""
+        trap = self._traps.get(idx)
+        return Program.instructions[idx] if trap is None else trap.instruction
+
+    def _indexes(self, where):
+        """Returns indexes of instructions with given order or of given label."""
+        if where is None:
+            self._print("missing instruction order or label")
+            return []
+        if where in Label._definedLabels:
+            return [Label._definedLabels[where]]
+        if where.isdigit():
+            indexes = [idx for idx in range(len(Program.instructions) - 1)
+                       if self._instruction(idx).order == int(where)]
+            if indexes:
+                return indexes
+        self._print(f"no instruction with order or label {where}")
+        return []
+
+    def _variable(self, name):
+        """Returns variable of given name (e.g. GF@x), None if the name is not valid."""
+        if name is None or Frame.parse(name) is None or name[2:3] != "@":
+            self._print("variable has to be given as GF@name, LF@name or TF@name")
+            return None
+        return Variable(name)
+
+    @staticmethod
+    def _value(var):
+        """Returns description of variable value (or why it is not available)."""
+        frame = var.frame._vars
+        if frame is None:
+            return "(undefined frame)"
+        if var.name not in frame:
+            return "(undefined variable)"
+        const = frame[var.name]
+        return "uninitialised" if const is None else const.toDebugString()
+
+    @classmethod
+    def _watchedClass(cls, instrClass):
+        """Returns variant of instruction class which stops debugger when written variable
+        changes. Variant has the same name, so it is reported as the original opcode."""
+        watched = cls._watchedClasses.get(instrClass)
+        if watched is None:
+            execute = instrClass.exec
+            value = cls._value
+
+            def exec(self):
+                var = self.args[0]
+                before = value(var)
+                execute(self)
+                after = value(var)
+                if after != before:
+                    Debugger.active.watchpointHit(f"watchpoint {var.frame.__name__[:1]}F@{var.name}: "
+                                                  f"{before} -> {after}")
+
+            watched = type(instrClass.__name__, (instrClass,), {"exec": exec})
+            cls._watchedClasses[instrClass] = watched
+        return watched
+
+    @staticmethod
+    def _print(*args, end = "\n"):
+        """Prints debugger output into standard error output."""
+        print(*args, end = end, file = sys.stderr)
@@ -0,0 +1,112 @@
+"""
+Module containing comparison of program output with expected output.
+
+Standard output is replaced by stream comparing each written chunk with the
+expected output file as it is written. Expected output is read in blocks, so
+only the current block is held in memory. Execution ends at the first differing
+byte with exit code OUTPUT_MISMATCH_ERR and error message with its byte offset. When program ends,
+expected output has to be consumed whole and exit code of program is compared
+with expected exit code (if it is given). Written output is still passed
+to the original standard output.
+
+Author: Vilém Gottwald (xgottw07)
+Project: IPP 2022 - IPPcode2022 interpret
+"""
+
+import sys
+
+from program import *
+
+
+class ExpectedOutput:
+    """Standard output replacement comparing output with expected output file."""
+
+    CONTEXT = 16
+    """Number of bytes of expected and actual output shown in mismatch report."""
+
+    BLOCK = 1 << 16
+
+    def __init__(self, outputFile, rcFile = None):
+        try:
+            self.expected = open(outputFile, "rb")
+        except OSError:
+            exitWMsg(INPUT_FILE_ERR, "Couldn't open expected output file")
+        self.expectedRc = None if rcFile is None else self._readRc(rcFile)
+        self.output = sys.stdout
+        self.encoding = self.output.encoding
+        self.errors = self.output.errors
+        self.block = b""
+        self.position = 0
+        """Position of the next expected byte in the current block."""
+        self.offset = 0
+        """Number of compared bytes of blocks before the current block."""
+        self.failed = False
+
+    @staticmethod
+    def _readRc(rcFile):
+        """Returns exit code from expected exit code file."""
+        try:
+            with open(rcFile) as f:
+                return int(f.read().strip())
+        except OSError:
+            exitWMsg(INPUT_FILE_ERR, "Couldn't open expected exit code file")
+        except ValueError:
+            exitWMsg(INPUT_FILE_ERR, "Expected exit code file doesn't contain a number")
+
+    def install(self):
+        """Replaces standard output and checks the end of output when program ends."""
+        sys.stdout = self
+        Program.finalizers.append(self.finish)
+
+    def write(self, text):
+        """Writes text to the original standard output and compares it with expected output."""
+        written = self.output.write(text)
+        if text:
+            data = text.encode(self.encoding, self.errors)
+            if self.block.startswith(data, self.position):
+                self.position += len(data)
+            else:
+                self._compareNextBlock(data)
+        return written
+
+    def _compareNextBlock(self, data):
+        """Compares data crossing the end of the current block, reads the next block."""
+        self.offset += self.position
+        self.block = self.block[self.position:] + self.expected.read(max(self.BLOCK, len(data)))
+        self.position = 0
+        if not self.block.startswith(data):
+            expected = self.block[:len(data)]
+            diff = next((i for i, (a, b) in enumerate(zip(expected, data)) if a != b), len(expected))
+            self._mismatch(self.offset + diff, expected[diff:diff + self.CONTEXT], data[diff:diff + self.CONTEXT])
+        self.position = len(data)
+
+    def flush(self):
+        self.output.flush()
+
+    def __getattr__(self, name):
+        return getattr(self.output, name)
+
+    def finish(self, exitCode):
+        """Checks that the whole expected output was written and compares exit code."""
+        sys.stdout = self.output
+        if self.failed:
+            return
+        rest = self.block[self.position:self.position + self.CONTEXT] or self.expected.read(self.CONTEXT)
+        if rest:
+            self._mismatch(self.offset + self.position, rest, b"")
+        exitCode = exitCode or SUCCES
+        if self.expectedRc is not None and exitCode != self.expectedRc:
+            self.failed = True
+            exitWMsg(OUTPUT_MISMATCH_ERR, f"Exit code {exitCode} differs from expected exit code {self.expectedRc}")
+
+    def _mismatch(self, offset, expected, actual):
+        """Ends execution with report of the first differing byte of output."""
+        self.failed = True
+        self.output.flush()
+        exitWMsg(OUTPUT_MISMATCH_ERR, f"Output differs from expected output at byte {offset}: "
+                                      f"expected {self._describe(expected)}, got {self._describe(actual)}")
+
+    @staticmethod
+    def _describe(data):
+        """Returns description of output bytes."""
+        return repr(data)[1:] if data else "end of output"
@@ -10,6 +10,15 @@ from ret_codes import *
 from stack import Stack
 class Frame:
     """Generic frame implementing common methods for further inheritance."""
+    generation = 0
+    """Counter changed whenever any frame is created, pushed, popped or undefined.
+    Variables use it to invalidate their cached frame storage."""
+
+    @staticmethod
+    def newGeneration():
+        """Marks change of frames, invalidating all cached frame storages."""
+        Frame.generation += 1
+
     @classmethod
     def defVar(cls, name):
         """Define new variable in a frame."""
@@ -133,6 +142,7 @@ class LocFrame(Frame):
         cls._stack.push(TempFrame._vars)
         cls._vars = cls._stack.top()
         TempFrame.undefFrame()
+        Frame.newGeneration()
 
     @classmethod
     def popFrame(cls):
@@ -146,6 +156,7 @@ class LocFrame(Frame):
             cls._vars = None
         else:
             cls._vars = cls._stack.top()
+        Frame.newGeneration()
 
 
 class TempFrame(Frame):
@@ -153,11 +164,17 @@ class TempFrame(Frame):
     _vars = None
 
     @classmethod    
-    def createFrame(cls):
-        """Creates new frame"""
-        cls._vars = dict()
-    
+    def createFrame(cls, layout = None):
+        """Creates new frame, optionally as copy of given frame layout.
+        Copying prepared layout is cheaper than building the frame variable by variable."""
+        if layout is None:
+            cls._vars = dict()
+        else:
+            cls._vars = layout.copy()
+        Frame.newGeneration()
+
     @classmethod
     def undefFrame(cls):
         """Undefines existing frame"""
-        cls._vars = None
\ No newline at end of file
+        cls._vars = None
+        Frame.newGeneration()
\ No newline at end of file
@@ -0,0 +1,848 @@
+"""
+IPPcode22 differential fuzzer
+
+Generates random well-formed IPPcode22 programs (XML and source code) with
+seeded inputs and executes each of them by every execution mode of interpret
+(reference interpretation, optimization levels, memoization, quickening,
+inlining, tail calls, tiered execution, compact store, source code loading,
+detached debugger, batch and scheduled execution) in parallel. Standard output,
+exit code and STATI output of each mode are compared with the reference interpretation,
+unhandled Python exception is a failure in any mode. Every mismatching program
+is shrunk to a minimal program which still mismatches and saved as reproducer.
+
+    Usage: python3.8 fuzz.py [--seed=N] [--count=N] [--size=N] [--jobs=N]
+                             [--modes=mode1,mode2] [--output=dir] [--keep]
+        --seed=N      seed of the first program (default 1), program i has seed N + i
+        --count=N     number of generated programs (default 100)
+        --size=N      approximate number of statements of program (default 40)
+        --jobs=N      number of interprets running in parallel (default number of CPUs)
+        --modes=list  compared modes (default all available), see MODES
+        --output=dir  directory for reproducers (default fuzz-failures)
+        --keep        save reproducers without shrinking
+
+Batch mode runs program over BATCH_LANES inputs at once: the program input
+and its copies and variants (values of input lines replaced by other values
+of the same type). Result of every lane is compared with the reference
+interpretation of the same input.
+
+Reproducer of program with seed N is saved as N.xml, N.src (source code),
+N.in (input), N.laneK.in (other inputs of batch mode) and N.txt (mode,
+compared results and command line).
+
+Author: Vilém Gottwald (xgottw07)
+Project: IPP 2022 - IPPcode2022 interpret
+"""
+
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import xml.etree.ElementTree as ET
+from concurrent.futures import ThreadPoolExecutor
+
+INTERPRET = os.path.join(os.path.dirname(os.path.abspath(__file__)), "interpret.py")
+TIMEOUT = 20
+UNHANDLED = "unhandled exception"
+"""Exit code of interpret which ended by unhandled Python exception."""
+
+BATCH_LANES = 16
+"""Number of inputs of batch mode, twice Lockstep.SCALAR_LANES, so groups are executed
+vectorized also after a split."""
+
+BASIC_STATS = ["--written", "--reads"]
+EXACT_STATS = BASIC_STATS + ["--insts", "--hot", "--vars", "--opcodes", "--calldepth",
+                             "--stackdepth", "--framedepth", "--frames"]
+
+
+class Mode:
+    """Execution mode of interpret compared with the reference interpretation."""
+
+    def __init__(self, name, args = (), source = "xml", stats = BASIC_STATS, kind = "single"):
+        """Creates mode running interpret with given arguments.
+
+        source - source file format given to interpret ("xml" or "ippcode")
+        stats  - compared STATI options (executed instructions are compared only in modes
+                 which don't change executed program), None if mode can't collect STATI
+        kind   - "single" (one interpretation), "batch" (--batch) or "schedule" (--schedule),
+                 STATI is not compared in batch and scheduled modes
+        """
+        self.name = name
+        self.args = list(args)
+        self.source = source
+        self.stats = stats
+        self.kind = kind
+
+    def isAvailable(self):
+        """Returns bool whether mode can run in this environment."""
+        if self.kind == "batch":
+            try:
+                import numpy
+            except ImportError:
+                return False
+        return True
+
+    def run(self, case, workDir):
+        """Runs case program in this mode, returns standard output, exit code and STATI output
+        (None as exit code if interpret didn't end in time)."""
+        source = case.files[self.source]
+        if self.kind == "batch":
+            return self._runBatch(source, case, workDir)
+        elif self.kind == "schedule":
+            return self._runSchedule(source, case.files["input"], workDir)
+
+        args = [f"--source={source}", f"--input={case.files['input']}"]
+        if self.stats is None:
+            stdout, exitCode = self._interpret(args + self.args, workDir)
+            return stdout, exitCode, None
+
+        statsFile = os.path.join(workDir, "stats")
+        if os.path.exists(statsFile):
+            os.remove(statsFile) # STATI is not written when interpretation ends by error
+        stdout, exitCode = self._interpret(args + [f"--stats={statsFile}"] + self.stats + self.args, workDir)
+        try:
+            with open(statsFile) as f:
+                stats = f.read()
+        except OSError:
+            stats = None
+        return stdout, exitCode, stats
+
+    def _runBatch(self, source, case, workDir):
+        """Runs program over all inputs of case by lockstep batch interpretation. Returns result
+        of the program input, lane with result different from the reference interpretation
+        of its input is reported by description of the difference as exit code."""
+        inputFiles = case.files["lanes"]
+        listFile = os.path.join(workDir, "inputs")
+        with open(listFile, "w") as f:
+            f.write("".join(inputFile + "\n" for inputFile in inputFiles))
+        outputDir = os.path.join(workDir, "batch")
+        os.makedirs(outputDir, exist_ok = True)
+        _, exitCode = self._interpret([f"--source={source}", f"--batch={listFile}",
+                                       f"--batch-output={outputDir}"] + self.args, workDir)
+        results = [self._results(os.path.join(outputDir, os.path.splitext(os.path.basename(inputFile))[0]),
+                                 exitCode) for inputFile in inputFiles]
+        if exitCode != 0:
+            return results[0]
+
+        references = dict()
+        """Reference results by lane input, the program input is compared by the runner."""
+        for lane, (inputLines, result) in enumerate(zip(case.lanes, results)):
+            key = tuple(inputLines)
+            if key not in references:
+                references[key] = results[0] if lane == 0 else \
+                    self._interpret([f"--source={source}", f"--input={inputFiles[lane]}"], workDir)
+            expected = references[key]
+            if expected[1] is not None and result[:2] != expected[:2]:
+                return (result[0], f"lane {lane}: exit code {result[1]}, reference stdout {expected[0]!r} "
+                                   f"and exit code {expected[1]}", None)
+        return results[0]
+
+    def _runSchedule(self, source, inputFile, workDir):
+        """Runs program over its input as scheduled job."""
+        jobsFile = os.path.join(workDir, "jobs")
+        with open(jobsFile, "w") as f:
+            f.write(f"{source} {inputFile}\n")
+        outputDir = os.path.join(workDir, "schedule")
+        os.makedirs(outputDir, exist_ok = True)
+        _, exitCode = self._interpret([f"--schedule={jobsFile}", f"--schedule-output={outputDir}"]
+                                      + self.args, workDir)
+        name = "1_" + os.path.splitext(os.path.basename(source))[0]
+        return self._results(os.path.join(outputDir, name), exitCode)
+
+    @staticmethod
+    def _results(name, exitCode):
+        """Returns output and exit code written by batch or scheduled execution into NAME.out
+        and NAME.rc, exit code of interpret is returned if it failed."""
+        if exitCode != 0:
+            return b"", exitCode, None
+        with open(name + ".out", "rb") as f:
+            stdout = f.read()
+        with open(name + ".rc") as f:
+            return stdout, int(f.read()), None
+
+    @staticmethod
+    def _interpret(args, workDir):
+        """Runs interpret with given arguments, returns standard output and exit code
+        (UNHANDLED if interpret ended by unhandled exception)."""
+        try:
+            result = subprocess.run([sys.executable, INTERPRET] + args, cwd = workDir,
+                                    stdout = subprocess.PIPE, stderr = subprocess.PIPE,
+                                    timeout = TIMEOUT)
+        except subprocess.TimeoutExpired:
+            return b"", None
+        if result.returncode == 1 and b"Traceback (most recent call last)" in result.stderr:
+            return result.stdout, UNHANDLED
+        return result.stdout, result.returncode
+
+
+MODES = [
+    Mode("reference", stats = EXACT_STATS),
+    Mode("optimize1", ["--optimize=1"]),
+    Mode("optimize2", ["--optimize=2"]),
+    Mode("memoize", ["--memoize"]),
+    Mode("optimize2-memoize", ["--optimize=2", "--memoize"]),
+    Mode("compact", ["--store=compact"], stats = EXACT_STATS),
+    Mode("ippcode", ["--source-format=ippcode"], source = "ippcode", stats = EXACT_STATS),
+    Mode("ippcode-compact", ["--source-format=ippcode", "--store=compact"], source = "ippcode",
+         stats = EXACT_STATS),
+    Mode("quicken", ["--quicken"], stats = EXACT_STATS),
+    Mode("optimize2-quicken", ["--optimize=2", "--quicken"]),
+    Mode("inline", ["--inline=16"]),
+    Mode("optimize2-inline-tail-calls", ["--optimize=2", "--inline", "--tail-calls"]),
+    Mode("tail-calls", ["--tail-calls"]),
+    Mode("optimize2-memoize-tail-calls", ["--optimize=2", "--memoize", "--tail-calls"]),
+    Mode("debug", ["--debug=" + os.devnull], stats = EXACT_STATS),
+    Mode("tier", ["--tier=2"], stats = None),
+    Mode("optimize2-quicken-inline-tier", ["--optimize=2", "--quicken", "--inline", "--tier=2"], stats = None),
+    Mode("batch", kind = "batch"),
+    Mode("schedule", ["--quantum=7"], kind = "schedule"),
+]
+"""Compared execution modes, the first one is the reference interpretation."""
+
+
+class ProgramGenerator:
+    """Generator of random well-formed IPPcode22 programs.
+
+    Program is generated as list of instructions (opcode and list of arguments,
+    argument is pair of its type and text). Generator tracks types of variables,
+    so most instructions get operands of valid types, but some type errors are
+    generated on purpose. Loops are bounded by dedicated counters, all other
+    jumps are forward and subroutines call only subroutines completed before them,
+    so generated programs terminate.
+    """
+
+    VARIABLES = 6
+    MAX_DEPTH = 3
+    ERROR_RATE = 0.004
+    """Probability of operand causing runtime error on purpose."""
+    MAX_SUBROUTINES = 4
+    CHARS = "abcXYZ019_-<>&\"'čžŘ€"
+    ESCAPES = ["\\032", "\\035", "\\092", "\\010", "\\009"]
+    READ_TYPES = ("int", "string", "bool", "float")
+
+    def __init__(self, seed, size = 40):
+        self.random = random.Random(seed)
+        self.size = size
+        self.labelCount = 0
+        self.loopCount = 0
+        self.code = list()
+        """Code of generated subroutines."""
+        self.subroutines = list()
+        """Label, types of variables on entry and on exit of each generated subroutine."""
+        self.pureSubroutines = list()
+        """Labels of generated subroutines using only local frame."""
+
+    def generate(self):
+        """Returns generated program instructions and lines of its input."""
+        scope = {f"GF@v{i}": None for i in range(self.VARIABLES)}
+        code = list()
+        for var in scope:
+            code.append(("DEFVAR", [("var", var)]))
+            valueType = self.random.choice(("int", "int", "string", "bool", "float", "nil"))
+            code.append(("MOVE", [("var", var), self.const(valueType)]))
+            scope[var] = valueType
+        self.statements(code, scope, self.size, depth = 0, pure = False)
+        # every loop has its own counter, so loops in called subroutines don't interfere
+        code[:0] = [("DEFVAR", [("var", f"GF@c{i}")]) for i in range(self.loopCount)]
+
+        if self.random.random() < 0.5:
+            code.append(("EXIT", [("int", str(self.random.choice((0, 1, 7, 49, 50, -1))))]))
+        else:
+            code.append(("JUMP", [("label", "end")]))
+
+        code.extend(self.code)
+        code.append(("LABEL", [("label", "end")]))
+        return code, self.input()
+
+    def input(self):
+        """Returns random lines of program input."""
+        lines = list()
+        self.inputTypes = list()
+        for _ in range(self.random.randint(0, 8)):
+            lineType = self.random.choice(self.READ_TYPES + ("garbage",))
+            self.inputTypes.append(lineType)
+            if lineType == "garbage":
+                lines.append(self.random.choice(("", "x y", "0x", "nil", "True", "12a")))
+            else:
+                lines.append(self._inputValue(lineType))
+        return lines
+
+    def laneInputs(self, lines, count):
+        """Returns count inputs of batch mode, the first one is lines of input, others
+        are its copies (so lanes share control flow) and its variants with some values
+        replaced by other values of the same type."""
+        lanes = [lines]
+        for _ in range(count - 1):
+            lane = list(lines)
+            if self.random.random() < 0.5:
+                for i, lineType in enumerate(self.inputTypes):
+                    if lineType != "garbage" and self.random.random() < 0.3:
+                        lane[i] = self._inputValue(lineType)
+            lanes.append(lane)
+        return lanes
+
+    def _inputValue(self, valueType):
+        """Returns random input line of given type."""
+        if valueType == "int":
+            return str(self.random.randint(-20, 300))
+        elif valueType == "bool":
+            return self.random.choice(("true", "false", "TRUE"))
+        elif valueType == "float":
+            return float.hex(self.random.uniform(-50, 50))
+        return "".join(self.random.choice(self.CHARS + " #\\") for _ in range(self.random.randint(0, 6)))
+
+    def label(self, prefix):
+        """Returns new unique label name."""
+        self.labelCount += 1
+        return f"{prefix}{self.labelCount}"
+
+    def const(self, valueType, nonEmpty = False):
+        """Returns random literal argument of given type (with nonEmpty non-zero number
+        or non-empty string)."""
+        if nonEmpty and self.random.random() >= self.ERROR_RATE:
+            if valueType == "int":
+                return ("int", str(self.random.choice((1, 2, -3, 7, self.random.randint(1, 100)))))
+            elif valueType == "float":
+                return ("float", float.hex(self.random.choice((1.5, -0.25, self.random.uniform(1, 100)))))
+            elif valueType == "string":
+                return ("string", self.random.choice(self.CHARS) + self.const("string")[1])
+
+        if valueType == "int":
+            value = str(self.random.choice((0, 1, 2, -1, 5, 10, 65, 128, self.random.randint(-1000, 1000))))
+        elif valueType == "bool":
+            value = self.random.choice(("true", "false"))
+        elif valueType == "nil":
+            value = "nil"
+        elif valueType == "float":
+            value = float.hex(self.random.choice((0.0, 1.5, -2.25, self.random.uniform(-100, 100))))
+        else:
+            parts = list()
+            for _ in range(self.random.randint(0, 5)):
+                if self.random.random() < 0.2:
+                    parts.append(self.random.choice(self.ESCAPES))
+                else:
+                    parts.append(self.random.choice(self.CHARS))
+            value = "".join(parts)
+        return (valueType, value)
+
+    def symb(self, scope, valueType):
+        """Returns variable of given type from scope or literal of the type,
+        rarely operand of any type."""
+        if self.random.random() < self.ERROR_RATE:
+            valueType = self.random.choice(("int", "string", "bool", "float", "nil"))
+        candidates = [var for var, varType in scope.items() if varType == valueType]
+        if candidates and self.random.random() < 0.6:
+            return ("var", self.random.choice(candidates))
+        return self.const(valueType)
+
+    def anySymb(self, scope):
+        """Returns operand of any type."""
+        if self.random.random() < 0.6:
+            return ("var", self.random.choice(list(scope)))
+        return self.const(self.random.choice(("int", "string", "bool", "float", "nil")))
+
+    def dest(self, scope, valueType, depth):
+        """Returns variable result of given type is written into. Nested code keeps types
+        of variables (it may not be executed), variable of another type gets unknown type."""
+        candidates = [var for var, varType in scope.items() if varType == valueType]
+        if depth > 0 and candidates:
+            return ("var", self.random.choice(candidates))
+        var = self.random.choice(list(scope))
+        scope[var] = valueType if depth == 0 else None
+        return ("var", var)
+
+    def statements(self, code, scope, count, depth, pure):
+        """Appends count random statements into code. Pure code uses only local frame
+        and data stack (can be memoized)."""
+        for _ in range(count):
+            choice = self.random.random()
+            if choice < 0.08 and depth < self.MAX_DEPTH:
+                self.conditional(code, scope, depth, pure)
+            elif choice < 0.13 and depth < self.MAX_DEPTH and not pure:
+                self.loop(code, scope, depth)
+            elif choice < 0.19 and not pure:
+                self.call(code, scope, depth)
+            elif choice < 0.22 and not pure:
+                self.frameBlock(code, scope, depth)
+            elif choice < 0.28:
+                self.stackOperations(code, scope, depth)
+            elif choice < 0.36 and not pure:
+                self.inputOutput(code, scope, depth)
+            else:
+                self.operation(code, scope, depth)
+
+    def operation(self, code, scope, depth):
+        """Appends random data instruction. Operands are chosen before the result variable,
+        which can change type of variable."""
+        opcode = self.random.choice(("MOVE", "ADD", "SUB", "MUL", "IDIV", "DIV", "LT", "GT", "EQ",
+                                     "AND", "OR", "NOT", "INT2CHAR", "STRI2INT", "INT2FLOAT",
+                                     "FLOAT2INT", "CONCAT", "STRLEN", "GETCHAR", "SETCHAR", "TYPE"))
+        if opcode == "MOVE":
+            args = [self.anySymb(scope)]
+            resultType = scope.get(args[0][1]) if args[0][0] == "var" else args[0][0]
+        elif opcode in ("ADD", "SUB", "MUL"):
+            resultType = self.random.choice(("int", "int", "float"))
+            args = [self.symb(scope, resultType), self.symb(scope, resultType)]
+        elif opcode in ("IDIV", "DIV"):
+            resultType = "int" if opcode == "IDIV" else "float"
+            args = [self.symb(scope, resultType), self.const(resultType, nonEmpty = True)]
+        elif opcode in ("LT", "GT", "EQ"):
+            types = ("int", "string", "bool", "float") + (("nil",) if opcode == "EQ" else ())
+            valueType = self.random.choice(types)
+            args = [self.symb(scope, valueType), self.symb(scope, valueType)]
+            if opcode == "EQ" and self.random.random() < 0.2:
+                args[self.random.randint(0, 1)] = ("nil", "nil")
+            resultType = "bool"
+        elif opcode in ("AND", "OR"):
+            args = [self.symb(scope, "bool"), self.symb(scope, "bool")]
+            resultType = "bool"
+        elif opcode == "NOT":
+            args = [self.symb(scope, "bool")]
+            resultType = "bool"
+        elif opcode == "INT2CHAR":
+            codes = (1114112, -1) if self.random.random() < self.ERROR_RATE else (32, 65, 92, 269, 8364)
+            args = [("int", str(self.random.choice(codes)))]
+            resultType = "string"
+        elif opcode in ("STRI2INT", "GETCHAR"):
+            args = [self.const("string", nonEmpty = True), self.index()]
+            resultType = "int" if opcode == "STRI2INT" else "string"
+        elif opcode == "INT2FLOAT":
+            args = [self.symb(scope, "int")]
+            resultType = "float"
+        elif opcode == "FLOAT2INT":
+            args = [self.symb(scope, "float")]
+            resultType = "int"
+        elif opcode == "CONCAT":
+            args = [self.symb(scope, "string"), self.symb(scope, "string")]
+            resultType = "string"
+        elif opcode == "STRLEN":
+            args = [self.symb(scope, "string")]
+            resultType = "int"
+        elif opcode == "SETCHAR":
+            dest = self.dest(scope, "string", depth)
+            code.append(("MOVE", [dest, self.const("string", nonEmpty = True)]))
+            code.append((opcode, [dest, self.index(), self.const("string", nonEmpty = True)]))
+            return
+        else:
+            args = [self.anySymb(scope)]
+            resultType = "string"
+        code.append((opcode, [self.dest(scope, resultType, depth)] + args))
+
+    def index(self):
+        """Returns index into non-empty string (rarely out of its range)."""
+        return ("int", "-1" if self.random.random() < self.ERROR_RATE else "0")
+
+    def inputOutput(self, code, scope, depth):
+        """Appends READ, WRITE, DPRINT or BREAK instruction."""
+        choice = self.random.random()
+        if choice < 0.3:
+            readType = self.random.choice(self.READ_TYPES)
+            code.append(("READ", [self.dest(scope, None, depth), ("type", readType)]))
+        elif choice < 0.9:
+            code.append(("WRITE", [self.anySymb(scope)]))
+        elif choice < 0.95:
+            code.append(("DPRINT", [self.anySymb(scope)]))
+        else:
+            code.append(("BREAK", []))
+
+    def stackOperations(self, code, scope, depth):
+        """Appends pushes of values and pops of them."""
+        count = self.random.randint(1, 3)
+        for _ in range(count):
+            code.append(("PUSHS", [self.anySymb(scope)]))
+        for _ in range(count if self.random.random() >= self.ERROR_RATE else count + 1):
+            code.append(("POPS", [self.dest(scope, None, depth)]))
+
+    def conditional(self, code, scope, depth, pure):
+        """Appends conditional forward jump over nested statements."""
+        label = self.label("skip")
+        valueType = self.random.choice(("int", "string", "bool", "float", "nil"))
+        opcode = self.random.choice(("JUMPIFEQ", "JUMPIFNEQ"))
+        code.append((opcode, [("label", label), self.symb(scope, valueType), self.symb(scope, valueType)]))
+        self.statements(code, scope, self.random.randint(1, 4), depth + 1, pure)
+        if self.random.random() < 0.3:
+            end = self.label("endif")
+            code.append(("JUMP", [("label", end)]))
+            code.append(("LABEL", [("label", label)]))
+            self.statements(code, scope, self.random.randint(1, 3), depth + 1, pure)
+            code.append(("LABEL", [("label", end)]))
+        else:
+            code.append(("LABEL", [("label", label)]))
+
+    def loop(self, code, scope, depth):
+        """Appends loop executed up to 4 times controlled by its own counter."""
+        label = self.label("loop")
+        counter = ("var", f"GF@c{self.loopCount}")
+        self.loopCount += 1
+        code.append(("MOVE", [counter, ("int", "0")]))
+        code.append(("LABEL", [("label", label)]))
+        self.statements(code, scope, self.random.randint(1, 5), depth + 1, False)
+        code.append(("ADD", [counter, counter, ("int", "1")]))
+        code.append(("JUMPIFNEQ", [("label", label), counter, ("int", str(self.random.randint(1, 4)))]))
+
+    def frameBlock(self, code, scope, depth):
+        """Appends statements working with pushed local frame."""
+        code.append(("CREATEFRAME", []))
+        code.append(("DEFVAR", [("var", "TF@x")]))
+        code.append(("MOVE", [("var", "TF@x"), self.anySymb(scope)]))
+        code.append(("PUSHFRAME", []))
+        local = dict(scope)
+        local["LF@x"] = None
+        self.statements(code, local, self.random.randint(1, 3), max(depth, 1), False)
+        for var in scope:
+            scope[var] = local[var]
+        code.append(("POPFRAME", []))
+        code.append(("MOVE", [self.dest(scope, None, depth), ("var", "TF@x")]))
+
+    def call(self, code, scope, depth):
+        """Appends call of new or already generated subroutine. Subroutine is added
+        when its body is complete, so it can call only other subroutines (no recursion)."""
+        choice = self.random.random()
+        if choice < 0.4:
+            self.callPure(code, scope, depth)
+        elif choice < 0.55:
+            self.callRecursive(code, scope, depth)
+        else:
+            # subroutine expects types of variables it was generated for
+            callable = [(label, exitTypes) for label, entryTypes, exitTypes in self.subroutines
+                        if entryTypes == scope]
+            if callable and (len(self.subroutines) >= self.MAX_SUBROUTINES or choice < 0.75):
+                label, exitTypes = self.random.choice(callable)
+            elif len(self.subroutines) < self.MAX_SUBROUTINES:
+                label = self.label("sub")
+                body = [("LABEL", [("label", label)])]
+                exitTypes = dict(scope)
+                self.statements(body, exitTypes, self.random.randint(1, 5), 1, False)
+                tail = [(tailLabel, tailExitTypes) for tailLabel, entryTypes, tailExitTypes in self.subroutines
+                        if entryTypes == exitTypes]
+                if tail and self.random.random() < 0.5:
+                    tailLabel, tailExitTypes = self.random.choice(tail)
+                    body.append(("CALL", [("label", tailLabel)])) # tail call
+                    exitTypes.update(tailExitTypes)
+                body.append(("RETURN", []))
+                self.code.extend(body)
+                self.subroutines.append((label, dict(scope), exitTypes))
+            else:
+                return
+            code.append(("CALL", [("label", label)]))
+            scope.update(exitTypes)
+
+    def callPure(self, code, scope, depth):
+        """Appends call of subroutine using only its own frame and data stack."""
+        code.append(("CREATEFRAME", []))
+        code.append(("DEFVAR", [("var", "TF@a")]))
+        code.append(("MOVE", [("var", "TF@a"), self.symb(scope, "int")]))
+        code.append(("DEFVAR", [("var", "TF@r")]))
+        code.append(("MOVE", [("var", "TF@r"), ("int", "0")]))
+        if self.pureSubroutines and self.random.random() < 0.5:
+            label = self.random.choice(self.pureSubroutines)
+        else:
+            label = self.label("pure")
+            body = [("LABEL", [("label", label)]), ("PUSHFRAME", []),
+                    ("DEFVAR", [("var", "LF@t")]), ("MOVE", [("var", "LF@t"), self.const("string")])]
+            local = {"LF@a": "int", "LF@r": "int", "LF@t": "string"}
+            self.statements(body, local, self.random.randint(1, 6), 1, True)
+            if local["LF@r"] == "int" and local["LF@a"] == "int":
+                body.append(("ADD", [("var", "LF@r"), ("var", "LF@r"), ("var", "LF@a")]))
+            else:
+                body.append(("MOVE", [("var", "LF@r"), ("int", "1")]))
+            body.append(("POPFRAME", []))
+            body.append(("RETURN", []))
+            self.code.extend(body)
+            self.pureSubroutines.append(label)
+        code.append(("CALL", [("label", label)]))
+        code.append(("MOVE", [self.dest(scope, None, depth), ("var", "TF@r")]))
+
+    def callRecursive(self, code, scope, depth):
+        """Appends call of recursive subroutine summing numbers from its argument to 0."""
+        if self.random.random() < 0.5:
+            self.callTailRecursive(code, scope, depth)
+            return
+        label = self.label("rec")
+        base = self.label("base")
+        body = [
+            ("LABEL", [("label", label)]),
+            ("PUSHFRAME", []),
+            ("JUMPIFEQ", [("label", base), ("var", "LF@a"), ("int", "0")]),
+            ("CREATEFRAME", []),
+            ("DEFVAR", [("var", "TF@a")]),
+            ("SUB", [("var", "TF@a"), ("var", "LF@a"), ("int", "1")]),
+            ("DEFVAR", [("var", "TF@r")]),
+            ("MOVE", [("var", "TF@r"), ("int", "0")]),
+            ("CALL", [("label", label)]),
+            ("ADD", [("var", "LF@r"), ("var", "TF@r"), ("var", "LF@a")]),
+            ("LABEL", [("label", base)]),
+            ("POPFRAME", []),
+            ("RETURN", []),
+        ]
+        self.code.extend(body)
+        code.append(("CREATEFRAME", []))
+        code.append(("DEFVAR", [("var", "TF@a")]))
+        code.append(("MOVE", [("var", "TF@a"), ("int", str(self.random.randint(0, 40)))]))
+        code.append(("DEFVAR", [("var", "TF@r")]))
+        code.append(("MOVE", [("var", "TF@r"), ("int", "0")]))
+        code.append(("CALL", [("label", label)]))
+        code.append(("MOVE", [self.dest(scope, None, depth), ("var", "TF@r")]))
+
+    def callTailRecursive(self, code, scope, depth):
+        """Appends call of tail recursive subroutine summing numbers from its argument to 0
+        into accumulator, the sum is returned on data stack."""
+        label = self.label("tail")
+        base = self.label("base")
+        body = [
+            ("LABEL", [("label", label)]),
+            ("PUSHFRAME", []),
+            ("JUMPIFEQ", [("label", base), ("var", "LF@a"), ("int", "0")]),
+            ("CREATEFRAME", []),
+            ("DEFVAR", [("var", "TF@a")]),
+            ("SUB", [("var", "TF@a"), ("var", "LF@a"), ("int", "1")]),
+            ("DEFVAR", [("var", "TF@r")]),
+            ("ADD", [("var", "TF@r"), ("var", "LF@r"), ("var", "LF@a")]),
+            ("CALL", [("label", label)]),
+            ("POPFRAME", []),
+            ("RETURN", []),
+            ("LABEL", [("label", base)]),
+            ("PUSHS", [("var", "LF@r")]),
+            ("POPFRAME", []),
+            ("RETURN", []),
+        ]
+        self.code.extend(body)
+        code.append(("CREATEFRAME", []))
+        code.append(("DEFVAR", [("var", "TF@a")]))
+        code.append(("MOVE", [("var", "TF@a"), ("int", str(self.random.randint(0, 40)))]))
+        code.append(("DEFVAR", [("var", "TF@r")]))
+        code.append(("MOVE", [("var", "TF@r"), ("int", "0")]))
+        code.append(("CALL", [("label", label)]))
+        code.append(("POPS", [self.dest(scope, None, depth)]))
+
+    @classmethod
+    def generatedOpcodes(cls):
+        """Returns opcodes the generator can emit."""
+        return {"MOVE", "CREATEFRAME", "PUSHFRAME", "POPFRAME", "DEFVAR", "CALL", "RETURN", "PUSHS",
+                "POPS", "ADD", "SUB", "MUL", "IDIV", "DIV", "LT", "GT", "EQ", "AND", "OR", "NOT",
+                "INT2CHAR", "STRI2INT", "INT2FLOAT", "FLOAT2INT", "READ", "WRITE", "CONCAT", "STRLEN",
+                "GETCHAR", "SETCHAR", "TYPE", "LABEL", "JUMP", "JUMPIFEQ", "JUMPIFNEQ", "EXIT",
+                "DPRINT", "BREAK"}
+
+
+class Case:
+    """Generated program with its input saved in files of work directory."""
+
+    def __init__(self, seed, instructions, inputLines, workDir, otherLanes = ()):
+        """Creates case, otherLanes are inputs of batch mode other than inputLines."""
+        self.seed = seed
+        self.instructions = instructions
+        self.inputLines = inputLines
+        self.otherLanes = list(otherLanes)
+        self.workDir = workDir
+        os.makedirs(workDir, exist_ok = True)
+        self.files = self.fileNames(os.path.join(workDir, "prog"))
+        self.write(self.files)
+
+    @property
+    def lanes(self):
+        """Returns inputs of batch mode, the first one is the program input."""
+        return [self.inputLines] + self.otherLanes
+
+    def fileNames(self, name):
+        """Returns names of program, input and batch inputs files with given name."""
+        return {
+            "xml": name + ".xml",
+            "ippcode": name + ".src",
+            "input": name + ".in",
+            "lanes": [name + ".in"] + [f"{name}.lane{lane}.in" for lane in range(1, len(self.lanes))],
+        }
+
+    def write(self, files):
+        """Writes program XML, source code and inputs into given files."""
+        with open(files["xml"], "wb") as f:
+            f.write(self.toXml())
+        with open(files["ippcode"], "w", encoding = "utf-8") as f:
+            f.write(self.toSource())
+        for inputFile, inputLines in zip(files["lanes"], self.lanes):
+            with open(inputFile, "w", encoding = "utf-8") as f:
+                f.write("".join(line + "\n" for line in inputLines))
+
+    def toXml(self):
+        """Returns XML representation of program."""
+        root = ET.Element("program", language = "IPPcode22")
+        for order, (opcode, args) in enumerate(self.instructions, 1):
+            instrTag = ET.SubElement(root, "instruction", order = str(order), opcode = opcode)
+            for i, (argType, text) in enumerate(args, 1):
+                argTag = ET.SubElement(instrTag, f"arg{i}", type = argType)
+                argTag.text = text
+        return ET.tostring(root, encoding = "utf-8", xml_declaration = True)
+
+    def toSource(self):
+        """Returns IPPcode22 source code of program."""
+        lines = [".IPPcode22"]
+        for opcode, args in self.instructions:
+            operands = [text if argType in ("var", "label", "type") else f"{argType}@{text}"
+                        for argType, text in args]
+            lines.append(" ".join([opcode] + operands))
+        return "\n".join(lines) + "\n"
+
+
+class DifferentialRunner:
+    """Runs generated programs in all modes, compares them and shrinks mismatching programs."""
+
+    def __init__(self, modes, jobs, outputDir, shrink = True):
+        self.modes = modes
+        self.reference = modes[0]
+        self.jobs = jobs
+        self.outputDir = outputDir
+        self.shrink = shrink
+        self.workRoot = tempfile.mkdtemp(prefix = "ippfuzz")
+        self.pool = ThreadPoolExecutor(jobs)
+
+    def close(self):
+        """Removes work files."""
+        self.pool.shutdown()
+        shutil.rmtree(self.workRoot, ignore_errors = True)
+
+    def runModes(self, case, modes):
+        """Runs case in given modes in parallel, returns results by mode names."""
+        futures = dict()
+        for mode in modes:
+            workDir = os.path.join(case.workDir, mode.name)
+            os.makedirs(workDir, exist_ok = True)
+            futures[mode.name] = self.pool.submit(mode.run, case, workDir)
+        return {name: future.result() for name, future in futures.items()}
+
+    def mismatches(self, results):
+        """Returns names of modes with results different from the reference,
+        including the reference if it failed itself."""
+        expected = results[self.reference.name]
+        failed = [name for name, (_, exitCode, _) in results.items()
+                  if exitCode == UNHANDLED or (exitCode is None and expected[1] is not None)]
+        for name, result in results.items():
+            if name in failed or name == self.reference.name:
+                continue
+            if result[:2] != expected[:2] or self._statsDiffer(name, result[2], expected[2]):
+                failed.append(name)
+        return failed
+
+    def _statsDiffer(self, name, stats, expected):
+        """Returns bool whether STATI output of mode differs from the reference one,
+        only statistics compared in the mode are taken into account."""
+        if stats is None or expected is None:
+            return False
+        mode = next(mode for mode in self.modes if mode.name == name)
+        compared = len(mode.stats)
+        return stats.splitlines()[:compared] != expected.splitlines()[:compared]
+
+    def fuzz(self, seed, size):
+        """Generates and checks program of given seed, returns names of mismatching modes."""
+        generator = ProgramGenerator(seed, size)
+        instructions, inputLines = generator.generate()
+        otherLanes = generator.laneInputs(inputLines, BATCH_LANES)[1:]
+        case = Case(seed, instructions, inputLines, os.path.join(self.workRoot, str(seed)), otherLanes)
+        results = self.runModes(case, self.modes)
+        failed = self.mismatches(results)
+        if failed:
+            mode = next(mode for mode in self.modes if mode.name == failed[0])
+            if self.shrink:
+                case = self.shrinkCase(case, mode)
+                results = self.runModes(case, [self.reference, mode])
+            self.saveReproducer(case, mode, results)
+        shutil.rmtree(case.workDir, ignore_errors = True)
+        return failed
+
+    def _reproduces(self, case, mode):
+        """Returns bool whether case still mismatches in mode (without timeouts)."""
+        modes = [self.reference] if mode is self.reference else [self.reference, mode]
+        results = self.runModes(case, modes)
+        if any(exitCode is None for _, exitCode, _ in results.values()):
+            return False
+        return mode.name in self.mismatches(results)
+
+    def shrinkCase(self, case, mode):
+        """Returns minimal case still mismatching in mode, instructions and input lines
+        are removed by chunks of decreasing size (delta debugging)."""
+        for attribute in ("instructions", "inputLines"):
+            chunk = max(len(getattr(case, attribute)) // 2, 1)
+            while True:
+                start = 0
+                while start < len(getattr(case, attribute)):
+                    items = getattr(case, attribute)
+                    candidate = self._variant(case, attribute, items[:start] + items[start + chunk:])
+                    if self._reproduces(candidate, mode):
+                        case = candidate
+                    else:
+                        start += chunk
+                if chunk == 1:
+                    break
+                chunk //= 2
+        return case
+
+    def _variant(self, case, attribute, items):
+        """Returns copy of case with replaced instructions or input lines."""
+        instructions = items if attribute == "instructions" else case.instructions
+        inputLines = items if attribute == "inputLines" else case.inputLines
+        return Case(case.seed, instructions, inputLines, case.workDir + "s", case.otherLanes)
+
+    def saveReproducer(self, case, mode, results):
+        """Saves program, its input and description of mismatch into output directory."""
+        os.makedirs(self.outputDir, exist_ok = True)
+        name = os.path.join(self.outputDir, str(case.seed))
+        case.write(case.fileNames(name))
+        with open(name + ".txt", "w", encoding = "utf-8") as f:
+            f.write(f"mode: {mode.name}\n")
+            f.write(f"command: {INTERPRET} --source={name}.xml --input={name}.in {' '.join(mode.args)}\n")
+            for modeName, (stdout, exitCode, stats) in results.items():
+                f.write(f"{modeName}: exit code {exitCode}, stdout {stdout!r}, stats {stats!r}\n")
+
+
+def main():
+    seed, count, size, jobs = 1, 100, 40, os.cpu_count() or 1
+    modeNames = None
+    outputDir = "fuzz-failures"
+    shrink = True
+    for arg in sys.argv[1:]:
+        try:
+            if arg.startswith("--seed="):
+                seed = int(arg[7:])
+            elif arg.startswith("--count="):
+                count = int(arg[8:])
+            elif arg.startswith("--size="):
+                size = int(arg[7:])
+            elif arg.startswith("--jobs="):
+                jobs = int(arg[7:])
+            elif arg.startswith("--modes="):
+                modeNames = arg[8:].split(",")
+            elif arg.startswith("--output="):
+                outputDir = arg[9:]
+            elif arg == "--keep":
+                shrink = False
+            else:
+                raise ValueError
+        except ValueError:
+            print(__doc__.split("Author")[0].strip(), file=sys.stderr)
+            exit(10)
+
+    modes = [mode for mode in MODES if mode.isAvailable()]
+    if modeNames is not None:
+        modes = [modes[0]] + [mode for mode in modes[1:] if mode.name in modeNames]
+
+    from ippcode_parser import IppcodeParser
+    missing = set(IppcodeParser.opcodes()) - ProgramGenerator.generatedOpcodes()
+    if missing:
+        print("WARNING - opcodes not generated:", " ".join(sorted(missing)), file=sys.stderr)
+
+    runner = DifferentialRunner(modes, jobs, outputDir, shrink)
+    failures = 0
+    try:
+        for programSeed in range(seed, seed + count):
+            failed = runner.fuzz(programSeed, size)
+            if failed:
+                failures += 1
+                print(f"seed {programSeed}: mismatch in {', '.join(failed)}")
+    finally:
+        runner.close()
+
+    print(f"# {count} programs, {len(modes)} modes, {failures} mismatching programs")
+    exit(1 if failures else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""
+Module containing execution budget governor.
+
+Author: Vilém Gottwald (xgottw07)
+Project: IPP 2022 - IPPcode2022 interpret
+"""
+
+from time import monotonic
+
+from ret_codes import *
+from program import Program, PeriodicTask
+
+try:
+    import resource
+except ImportError: # not available outside of unix systems
+    resource = None
+
+
+class Governor(PeriodicTask):
+    """Execution budget governor enforcing instruction count, time and memory limits.
+
+    Program is executed in slices of at most CHECK_PERIOD instructions and limits
+    are checked only between slices, so the main loop stays unchanged.
+    """
+    CHECK_PERIOD = 4096
+
+    def __init__(self, maxSteps = None, maxMemory = None, timeout = None):
+        """Creates governor with given limits, None means unlimited.
+
+        maxSteps  - maximal number of executed instructions
+        maxMemory - maximal peak resident set size of interpret in MiB
+        timeout   - maximal wall-clock time of execution in seconds
+        """
+        if maxMemory is not None and not self.memorySupported():
+            exitWMsg(PARAMETER_ERR, "Memory limit is not supported on this system")
+
+        self.maxSteps = maxSteps
+        self.maxMemory = maxMemory
+        self.timeout = timeout
+        self.deadline = None
+
+    @staticmethod
+    def memorySupported():
+        """Returns bool whether memory limit can be checked on this system."""
+        return resource is not None
+
+    def start(self):
+        """Starts measuring of execution time and sets hard memory limit."""
+        if self.timeout is not None:
+            self.deadline = monotonic() + self.timeout
+        if self.maxMemory is not None:
+            self._limitAddressSpace()
+
+    def _limitAddressSpace(self):
+        """Limits address space of interpret to its current size plus memory limit.
+        Single instruction can allocate a lot of memory (e.g. CONCAT of long strings),
+        so the periodic check is backed by allocation failure."""
+        try:
+            with open("/proc/self/statm") as f:
+                pages = int(f.read().split()[0])
+        except (OSError, ValueError, IndexError):
+            return # address space size is unknown, only periodic check is used
+
+        limit = pages * resource.getpagesize() + self.maxMemory * 1024 * 1024
+        _, hardLimit = resource.getrlimit(resource.RLIMIT_AS)
+        if hardLimit != resource.RLIM_INFINITY:
+            limit = min(limit, hardLimit)
+        resource.setrlimit(resource.RLIMIT_AS, (limit, hardLimit))
+
+    def nextSlice(self, executed):
+        """Returns number of instructions to be executed before next check."""
+        if self.maxSteps is None:
+            return self.CHECK_PERIOD
+        return min(self.CHECK_PERIOD, self.maxSteps - executed)
+
+    def check(self, executed):
+        """Checks all limits, exits program if any of them is exceeded."""
+        if Program.isFinished():
+            return
+
+        if self.maxSteps is not None and executed >= self.maxSteps:
+            exitWMsg(RUN_LIMIT_ERR, "Instruction limit exceeded, limit:", self.maxSteps)
+
+        if self.deadline is not None and monotonic() >= self.deadline:
+            exitWMsg(RUN_LIMIT_ERR, "Time limit exceeded, limit:", self.timeout, "s")
+
+        if self.maxMemory is not None and self._peakMemory() > self.maxMemory:
+            self.outOfMemory()
+
+    def outOfMemory(self):
+        """Prints memory limit error and exits program."""
+        if self.maxMemory is None:
+            return
+        exitWMsg(RUN_LIMIT_ERR, "Memory limit exceeded, limit:", self.maxMemory, "MiB")
+
+    @staticmethod
+    def _peakMemory():
+        """Returns peak resident set size of interpret in MiB."""
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
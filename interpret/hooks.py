@@ -0,0 +1,153 @@
+"""
+Module containing registry of execution hooks.
+
+Hooks are functions called on execution events:
+    instruction - hook(instruction, index) after each executed instruction
+    block       - hook(first, last) with indexes of the first and the last instruction
+                  of each executed sequence of consecutive instructions, i.e. once
+                  per executed basic block instead of once per instruction
+                  (the last sequence includes instruction that ended interpretation)
+    call        - hook(instruction, target) after CALL, target is index jumped to
+    return      - hook(instruction, target) after RETURN, target is index returned to
+    framePush   - hook(instruction, frame) after PUSHFRAME with the pushed frame
+    framePop    - hook(instruction, frame) after POPFRAME with the popped frame
+    createFrame - hook(instruction, frame) after CREATEFRAME with the created frame
+    push        - hook(instruction, constant) after PUSHS with the pushed constant
+    read        - hook(instruction, constant) after READ with the read constant
+    write       - hook(instruction, constant) after WRITE with the written constant
+    branch      - hook(instruction, taken) after JUMPIFEQ and JUMPIFNEQ with bool
+                  whether the jump was taken
+    error       - hook(exitCode) when interpretation ends with error (code out of 0 - 49)
+
+Nothing is paid for events without hooks. Instruction and block hooks switch
+interpret to the observed main loop only when registered, other events switch
+only the instructions they concern to hooked variants of their classes.
+
+Hooks are registered by modules given to interpret (--hooks), each of them has
+to define function register(hooks) called with Hooks class.
+
+Author: Vilém Gottwald (xgottw07)
+Project: IPP 2022 - IPPcode2022 interpret
+"""
+
+import importlib
+import importlib.util
+import os
+
+from program import *
+
+
+class Hooks:
+    """Registry of execution hooks."""
+
+    EVENTS = ("instruction", "block", "call", "return", "framePush", "framePop",
+              "createFrame", "push", "read", "write", "branch", "error")
+
+    _INSTRUCTION_EVENTS = {
+        "call": (Call, lambda instr: Program.counter.getIndex()),
+        "return": (Return, lambda instr: Program.counter.getIndex()),
+        "framePush": (Pushframe, lambda instr: LocFrame._vars),
+        "framePop": (Popframe, lambda instr: TempFrame._vars),
+        "createFrame": (Createframe, lambda instr: TempFrame._vars),
+        "push": (Pushs, lambda instr: Program.dataStack.top()),
+        "read": (Read, lambda instr: instr.args[0].getValueUninit()),
+        "write": (Write, lambda instr: instr.args[0].getConst()),
+        "branch": ((Jumpifeq, Jumpifneq), lambda instr: Program.counter.jump),
+    }
+    """Instruction class (or tuple of classes) of each instruction event
+    and function returning hook argument."""
+
+    _hooks = {event: list() for event in EVENTS if event not in ("instruction", "block")}
+    _hookedClasses = dict()
+    _installed = set()
+
+    @classmethod
+    def register(cls, event, hook):
+        """Registers hook of given event."""
+        cls._hooksOf(event).append(hook)
+
+    @classmethod
+    def unregister(cls, event, hook):
+        """Removes registered hook of given event."""
+        hooks = cls._hooksOf(event)
+        if hook in hooks:
+            hooks.remove(hook)
+
+    @classmethod
+    def _hooksOf(cls, event):
+        """Returns list of hooks of given event."""
+        if event == "instruction":
+            return Program.observers
+        elif event == "block":
+            return Program.blockObservers
+        elif event in cls._hooks:
+            return cls._hooks[event]
+        raise ValueError(f"Unknown hook event: {event}")
+
+    @classmethod
+    def loadModules(cls, modules):
+        """Imports hook modules (module names or .py files) and lets them register their hooks."""
+        for name in modules:
+            try:
+                if name.endswith(".py"):
+                    moduleName = os.path.splitext(os.path.basename(name))[0]
+                    spec = importlib.util.spec_from_file_location(moduleName, name)
+                    module = importlib.util.module_from_spec(spec)
+                    spec.loader.exec_module(module)
+                else:
+                    module = importlib.import_module(name)
+            except (ImportError, OSError, ValueError, TypeError): # e.g. relative module name
+                exitWMsg(INPUT_FILE_ERR, "Couldn't load hooks module:", name)
+
+            if not hasattr(module, "register"):
+                exitWMsg(INPUT_FILE_ERR, "Hooks module doesn't define register function:", name)
+            module.register(cls)
+
+    @classmethod
+    def install(cls):
+        """Switches loaded instructions of events with registered hooks to hooked variants.
+        Has to be called after program is loaded and hooks are registered."""
+        for event, (instrClass, _) in cls._INSTRUCTION_EVENTS.items():
+            if not cls._hooks[event] or event in cls._installed:
+                continue
+            cls._installed.add(event)
+            for instruction in Program.instructions:
+                if isinstance(instruction, instrClass) \
+                        and event not in getattr(instruction, "hookedEvents", ()):
+                    instruction.__class__ = cls._hookedClass(instruction.__class__, event)
+
+        if cls._hooks["error"] and "error" not in cls._installed:
+            cls._installed.add("error")
+            Program.finalizers.append(cls._onExit)
+
+    @classmethod
+    def _hookedClass(cls, instrClass, event):
+        """Returns subclass of instruction class calling hooks of event after execution.
+        Subclass has the same name, so it is reported as the original opcode.
+        Instruction of compact store (flyweight) may be visited repeatedly, so classes
+        remember events they are hooked for."""
+        key = (instrClass, event)
+        hooked = cls._hookedClasses.get(key)
+        if hooked is None:
+            hooks = cls._hooks[event]
+            argument = cls._INSTRUCTION_EVENTS[event][1]
+            execute = instrClass.exec
+
+            def exec(self):
+                execute(self)
+                value = argument(self)
+                for hook in hooks:
+                    hook(self, value)
+
+            events = getattr(instrClass, "hookedEvents", frozenset()) | {event}
+            hooked = type(instrClass.__name__, (instrClass,), {"exec": exec, "hookedEvents": events})
+            cls._hookedClasses[key] = hooked
+        return hooked
+
+    @classmethod
+    def _onExit(cls, exitCode):
+        """Calls error hooks if interpretation ended with error."""
+        if isinstance(exitCode, int) and 0 <= exitCode <= 49:
+            return
+        for hook in cls._hooks["error"]:
+            hook(exitCode)
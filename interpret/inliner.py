@@ -0,0 +1,96 @@
+"""
+Module containing load-time inlining of small leaf subroutines.
+
+Subroutine is inlined if it is a leaf (calls no subroutine, so it is not
+recursive), its body is a sequence of at most size instructions (labels not
+counted) between its entry label and its only RETURN, and jumps inside of it
+lead only to labels of the body. Each CALL of such subroutine is replaced
+by a copy of the body, labels of the copy are renamed to names which
+can't occur in source program. Copies keep orders of the original instructions,
+so errors and hot instruction are reported for the subroutine body.
+
+Inlined call is counted when the first instruction of its copy starts executed
+sequence of instructions. If the body starts with a label (it can be a loop),
+copy starts with renamed entry label, which is never a jump target, so loop
+iterations are not counted as inlined calls.
+
+Inlined call doesn't execute CALL, entry label and RETURN, STATI insts then
+counts only executed instructions and --inlined counts executed inlined calls.
+
+Author: Vilém Gottwald (xgottw07)
+Project: IPP 2022 - IPPcode2022 interpret
+"""
+
+from program import *
+from analysis import ControlFlow, Subroutines
+
+
+class Inliner:
+    """Replaces calls of small leaf subroutines by copies of their bodies."""
+
+    DEFAULT_SIZE = 8
+
+    sites = list()
+    """Sorted indexes of the first instructions of inlined bodies in the loaded program."""
+
+    @classmethod
+    def inline(cls, instructions, size = None):
+        """Returns copy of instructions with calls of small leaf subroutines inlined."""
+        size = size or cls.DEFAULT_SIZE
+        labels = ControlFlow.labelIndexes(instructions)
+        bodies = {entry: cls._body(instructions, sub, size)
+                  for entry, sub in Subroutines.find(instructions).items()}
+
+        inlined = list()
+        cls.sites = list()
+        for instruction in instructions:
+            body = None
+            if isinstance(instruction, Call):
+                body = bodies.get(labels.get(instruction.args[0].name))
+            if body is None:
+                inlined.append(instruction)
+                continue
+
+            entry = instructions[labels[instruction.args[0].name]]
+            if isinstance(body[0], Label):
+                body = [entry] + body
+            cls.sites.append(len(inlined))
+            inlined.extend(cls._copy(body, len(cls.sites)))
+        return inlined
+
+    @staticmethod
+    def _body(instructions, sub, size):
+        """Returns instructions of subroutine body (without entry label and RETURN),
+        None if the subroutine can't be inlined."""
+        if sub.calls or len(sub.returns) != 1:
+            return None
+        last = max(sub.body)
+        if min(sub.body) != sub.entry or last not in sub.returns:
+            return None
+
+        body = instructions[sub.entry + 1:last]
+        count = 0
+        internal = {instruction.args[0].name for instruction in body
+                    if isinstance(instruction, Label)}
+        for instruction in body:
+            if isinstance(instruction, (Call, Return)):
+                return None
+            if isinstance(instruction, (Jump, Jumpifeq, Jumpifneq)) and instruction.args[0].name not in internal:
+                return None
+            if not isinstance(instruction, Label):
+                count += 1
+        return body if 0 < count <= size else None
+
+    @staticmethod
+    def _copy(body, site):
+        """Returns copy of subroutine body with labels renamed for given inlined call site."""
+        copies = list()
+        for instruction in body:
+            args = list(instruction.args)
+            if isinstance(instruction, (Label, Jump, Jumpifeq, Jumpifneq)):
+                args[0] = LabelNT(f"{args[0].name}@{site}")
+            copy = instruction.__class__.fromArgs(instruction.order, args)
+            if isinstance(copy, Label):
+                Label.declare(args[0].name)
+            copies.append(copy)
+        return copies
@@ -9,5 +9,16 @@ from program import Program
 from arg_processor import ArgumentProcessor
 
 cla = ArgumentProcessor()
-Program.load(cla.source)
-Program.interpret(cla.input, cla.stats, cla.statiFile)
+if cla.timings is not None:
+    from timings import Timings
+    Timings.enable(cla.timings)
+
+if cla.schedule is not None:
+    from scheduler import Scheduler
+    Scheduler.interpretJobs(cla.schedule, cla.scheduleOutput, **cla.scheduleOptions, **cla.loadOptions)
+elif cla.batch is not None:
+    Program.load(cla.source, **cla.loadOptions)
+    Program.interpretBatch(cla.batch, cla.batchOutput)
+else:
+    Program.load(cla.source, **cla.loadOptions)
+    Program.interpret(cla.input, cla.stats, cla.statiFile, **cla.options)
@@ -0,0 +1,136 @@
+"""
+Module containing parser of IPPcode22 source code.
+
+Program can be loaded directly from its source code instead of XML representation.
+Parser produces the same instructions as XML loading, literals are decoded
+by Constant.parseFromStrXml. Equal operands of different instructions are
+shared by them. Errors are reported with the codes of IPPcode22
+source parser (21 - header, 22 - opcode, 23 - other lexical or syntax error).
+
+Author: Vilém Gottwald (xgottw07)
+Project: IPP 2022 - IPPcode2022 interpret
+"""
+
+import re
+
+import program
+from program import *
+
+
+class IppcodeParser:
+    """Hand-written parser of IPPcode22 source code."""
+
+    HEADER = ".ippcode22"
+
+    _IDENT = r"[a-zA-Z_\-$&%*!?][a-zA-Z0-9_\-$&%*!?]*"
+    _LABEL = re.compile(_IDENT)
+    _VAR_NAME = re.compile(_IDENT)
+    _FRAMES = {"GF", "LF", "TF"}
+    _TYPES = {"int", "string", "bool", "float"}
+    _LITERALS = {
+        "int": re.compile(r"[+-]?[0-9]+"),
+        "bool": re.compile(r"true|false"),
+        "nil": re.compile(r"nil"),
+        "string": re.compile(r"(?:[^\s#\\]|\\[0-9]{3})*"),
+        "float": re.compile(r"\S+"),
+    }
+    """Lexical form of literal of each type (float is then checked by conversion)."""
+
+    _opcodes = None
+
+    @classmethod
+    def opcodes(cls):
+        """Returns instruction classes by their upper case opcodes."""
+        if cls._opcodes is None:
+            cls._opcodes = dict()
+            for name, value in vars(program).items():
+                if isinstance(value, type) and issubclass(value, Instruction) \
+                        and value is not Instruction and name == name.capitalize():
+                    cls._opcodes[name.upper()] = value
+        return cls._opcodes
+
+    @classmethod
+    def parse(cls, source):
+        """Parses source code file (or opened file) into list of instructions."""
+        instructions = list()
+        for instrClass, order, args in cls.rows(source):
+            if instrClass is Label:
+                Label.declare(args[0].name)
+            instructions.append(instrClass.fromArgs(order, args))
+        return instructions
+
+    @classmethod
+    def rows(cls, source):
+        """Yields instruction class, order and arguments of each instruction of source code."""
+        try:
+            file = source if hasattr(source, "read") else open(source, encoding = "utf-8")
+        except OSError:
+            exitWMsg(INPUT_FILE_ERR, "Couldn't open IPPcode22 program source file")
+
+        opcodes = cls.opcodes()
+        parsed = dict() # equal operands are shared, operands are never modified
+        header = False
+        order = 0
+        with file:
+            for number, line in enumerate(file, 1):
+                tokens = line.split("#", 1)[0].split()
+                if not tokens:
+                    continue
+                if not header:
+                    if len(tokens) != 1 or tokens[0].lower() != cls.HEADER:
+                        exitWMsg(SOURCE_HEADER_ERR, "Missing or wrong IPPcode22 header on line", number)
+                    header = True
+                    continue
+
+                instrClass = opcodes.get(tokens[0].upper())
+                if instrClass is None:
+                    exitWMsg(SOURCE_OPCODE_ERR, "Unknown opcode on line", number, "-", tokens[0])
+                operands = instrClass.operands
+                if len(tokens) - 1 != len(operands):
+                    exitWMsg(SOURCE_SYNTAX_ERR, "Wrong number of operands on line", number)
+
+                args = list()
+                for kind, token in zip(operands, tokens[1:]):
+                    arg = parsed.get((kind, token))
+                    if arg is None:
+                        arg = parsed[(kind, token)] = cls._parseOperand(kind, token, number)
+                    args.append(arg)
+                order += 1
+                yield instrClass, order, args
+
+        if not header:
+            exitWMsg(SOURCE_HEADER_ERR, "Missing IPPcode22 header")
+
+    @classmethod
+    def _parseOperand(cls, kind, token, number):
+        """Parses operand token of given kind ("var", "symb", "label" or "type")."""
+        if kind == "label":
+            if cls._LABEL.fullmatch(token):
+                return LabelNT(token)
+        elif kind == "type":
+            if token in cls._TYPES:
+                return ConstantType.parse(token)
+        else:
+            prefix, at, value = token.partition("@")
+            if at and prefix in cls._FRAMES:
+                if cls._VAR_NAME.fullmatch(value):
+                    return Variable(token)
+            elif at and kind == "symb" and prefix in cls._LITERALS:
+                if cls._LITERALS[prefix].fullmatch(value) and cls._validLiteral(prefix, value):
+                    return Constant.parseFromStrXml(prefix, value)
+
+        exitWMsg(SOURCE_SYNTAX_ERR, "Invalid operand on line", number, "-", token)
+
+    @staticmethod
+    def _validLiteral(typeString, value):
+        """Returns bool whether literal value can be converted (checks floats)."""
+        if typeString != "float":
+            return True
+        try:
+            float(value)
+        except ValueError:
+            try:
+                float.fromhex(value)
+            except ValueError:
+                return False
+        return True
@@ -0,0 +1,611 @@
+"""
+Module containing lockstep execution of one program over many inputs.
+
+Lanes (one per input file) are executed together in groups sharing program
+counter, frames structure, call stack and data stack depth. Value of symbol
+in all lanes of a group is a column of two NumPy arrays - value types and
+values. Values have object dtype, so integers keep arbitrary precision and
+every operation gives exactly the same result as scalar interpretation.
+
+Conditional jump that is decided differently in lanes of a group splits
+the group, lanes ending with error (operand types, values) leave their group.
+Errors depending only on control flow (undefined frame, variable or label,
+empty stack) end the whole group. Groups smaller than SCALAR_LANES continue
+lane by lane in the ordinary scalar interpret.
+
+NumPy is needed only by this mode.
+
+Author: Vilém Gottwald (xgottw07)
+Project: IPP 2022 - IPPcode2022 interpret
+"""
+
+import os
+import io
+from contextlib import redirect_stdout, redirect_stderr
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from program import *
+
+_INT = ConstantType.INT.value
+_STRING = ConstantType.STRING.value
+_BOOL = ConstantType.BOOL.value
+_NIL = ConstantType.NIL.value
+_FLOAT = ConstantType.FLOAT.value
+
+UNHANDLED_ERR = 1
+"""Exit code of lane ended by unhandled exception (the code Python exits with)."""
+
+
+class LaneError(Exception):
+    """Error ending all lanes of executed group."""
+    def __init__(self, code):
+        super().__init__(code)
+        self.code = code
+
+
+class Column:
+    """Values of one symbol in all lanes of a group. Columns are never modified."""
+    __slots__ = ("types", "values")
+
+    def __init__(self, types, values):
+        self.types = types
+        self.values = values
+
+    @staticmethod
+    def full(constType, value, size):
+        """Creates column with the same constant in all lanes."""
+        values = np.empty(size, dtype = object)
+        values.fill(value)
+        return Column(np.full(size, constType.value, dtype = np.int8), values)
+
+    @staticmethod
+    def fromConsts(consts):
+        """Creates column from list of constants (one for each lane)."""
+        types = np.fromiter((const.type.value for const in consts), dtype = np.int8,
+                            count = len(consts))
+        values = np.empty(len(consts), dtype = object)
+        values[:] = [const.value for const in consts]
+        return Column(types, values)
+
+    def take(self, mask):
+        """Returns column of lanes selected by mask."""
+        return Column(self.types[mask], self.values[mask])
+
+    def getConst(self, lane):
+        """Returns constant of lane on given position."""
+        return Constant(ConstantType(int(self.types[lane])), self.values[lane])
+
+
+class Group:
+    """Lanes executed together with their shared control state."""
+    def __init__(self, lanes):
+        self.lanes = lanes
+        """Indexes of group lanes."""
+        self.idx = 0
+        self.globFrame = dict()
+        self.locFrames = list()
+        self.tempFrame = None
+        self.callStack = list()
+        self.dataStack = list()
+        self.position = 0
+        """Number of input lines already read by each lane."""
+
+    @staticmethod
+    def _takeFrame(frame, mask):
+        """Returns frame with columns of lanes selected by mask."""
+        if frame is None:
+            return None
+        return {name: None if col is None else col.take(mask) for name, col in frame.items()}
+
+    def keep(self, mask):
+        """Keeps only lanes selected by mask."""
+        self.lanes = self.lanes[mask]
+        self.globFrame = self._takeFrame(self.globFrame, mask)
+        self.locFrames = [self._takeFrame(frame, mask) for frame in self.locFrames]
+        self.tempFrame = self._takeFrame(self.tempFrame, mask)
+        self.dataStack = [col.take(mask) for col in self.dataStack]
+
+    def split(self, mask):
+        """Moves lanes selected by mask into new group and returns it."""
+        other = Group(self.lanes[mask])
+        other.idx = self.idx
+        other.globFrame = self._takeFrame(self.globFrame, mask)
+        other.locFrames = [self._takeFrame(frame, mask) for frame in self.locFrames]
+        other.tempFrame = self._takeFrame(self.tempFrame, mask)
+        other.callStack = list(self.callStack)
+        other.dataStack = [col.take(mask) for col in self.dataStack]
+        other.position = self.position
+        self.keep(~mask)
+        return other
+
+
+class Lockstep:
+    """Lockstep execution of loaded program over many input files."""
+
+    SCALAR_LANES = 8
+    """Groups with less lanes are interpreted lane by lane."""
+
+    _TYPE_NAMES = None
+
+    def __init__(self, inputs):
+        """Creates execution of loaded program over given input files."""
+        if np is None:
+            exitWMsg(INTERNAL_ERR, "Batch interpretation requires NumPy")
+
+        self.inputs = inputs
+        self.lines = list()
+        self.outputs = [list() for _ in inputs]
+        self.exitCodes = [None] * len(inputs)
+        self._handlers = dict()
+        self._constants = dict()
+
+        if Lockstep._TYPE_NAMES is None:
+            Lockstep._TYPE_NAMES = np.array(["int", "string", "bool", "nil", "float"], dtype = object)
+
+    def run(self):
+        """Executes program in all lanes."""
+        lanes = list()
+        for lane, file in enumerate(self.inputs):
+            try:
+                with open(file) as f:
+                    self.lines.append(f.readlines())
+                lanes.append(lane)
+            except OSError:
+                self.lines.append(None)
+                self.exitCodes[lane] = INPUT_FILE_ERR
+
+        groups = [Group(np.array(lanes, dtype = np.intp))]
+        while groups:
+            group = groups.pop()
+            if group.lanes.size >= self.SCALAR_LANES:
+                groups.extend(self._runGroup(group))
+            else:
+                for lane in range(group.lanes.size):
+                    self._runScalar(group, lane)
+
+    def writeResults(self, outputDir):
+        """Writes output (NAME.out) and exit code (NAME.rc) of each lane into directory."""
+        try:
+            os.makedirs(outputDir, exist_ok = True)
+            for file, output, exitCode in zip(self.inputs, self.outputs, self.exitCodes):
+                name = os.path.join(outputDir, os.path.splitext(os.path.basename(file))[0])
+                with open(name + ".out", "w") as f:
+                    f.write("".join(output))
+                with open(name + ".rc", "w") as f:
+                    f.write(str(exitCode))
+        except OSError:
+            exitWMsg(OUTPUT_FILE_ERR, "Could not write batch results into directory:", outputDir)
+
+    def _finish(self, lanes, exitCode):
+        """Ends given lanes with exit code."""
+        for lane in lanes:
+            self.exitCodes[lane] = exitCode
+
+    def _runGroup(self, group):
+        """Executes group until it ends, leaves its control flow or splits.
+        Returns list of groups to be continued."""
+        instructions = Program.instructions
+        while group.lanes.size:
+            instr = instructions[group.idx]
+            if instr is None:
+                self._finish(group.lanes, SUCCES)
+                return []
+
+            handler = self._handler(type(instr))
+            try:
+                groups = handler(self, group, instr)
+            except LaneError as err:
+                self._finish(group.lanes, err.code)
+                return []
+
+            if groups is not None:
+                return groups
+            group.idx += 1
+
+        return []
+
+    def _handler(self, instrClass):
+        """Returns handler of instruction class (specialised classes use handler of their opcode)."""
+        handler = self._handlers.get(instrClass)
+        if handler is None:
+            for cls in instrClass.__mro__:
+                if cls in self._HANDLERS:
+                    handler = self._HANDLERS[cls]
+                    break
+            self._handlers[instrClass] = handler
+        return handler
+
+    def _runScalar(self, group, position):
+        """Interprets lane on given group position by scalar interpret."""
+        lane = group.lanes[position]
+        const = lambda col: None if col is None else col.getConst(position)
+        frame = lambda frame: None if frame is None else \
+            {name: const(col) for name, col in frame.items()}
+
+        GlobFrame._vars = frame(group.globFrame)
+        LocFrame._stack.stack = [frame(locFrame) for locFrame in group.locFrames]
+        LocFrame._vars = LocFrame._stack.stack[-1] if group.locFrames else None
+        TempFrame._vars = frame(group.tempFrame)
+        Frame.newGeneration()
+        Program.callStack.stack = list(group.callStack)
+        Program.dataStack.stack = [const(col) for col in group.dataStack]
+        Program.counter.idx = group.idx
+        Program.counter.jump = False
+        Program.readInput = ReadInput(None)
+        Program.readInput.lines = self.lines[lane]
+        Program.readInput.position = group.position
+
+        output = io.StringIO()
+        exitCode = SUCCES
+        with redirect_stdout(output), redirect_stderr(io.StringIO()):
+            try:
+                Program.run()
+            except SystemExit as exitErr:
+                exitCode = exitErr.code
+            except Exception:
+                exitCode = UNHANDLED_ERR
+        self.outputs[lane].append(output.getvalue())
+        self.exitCodes[lane] = exitCode
+
+    # --- Operands -----
+
+    @staticmethod
+    def _frame(group, var):
+        """Returns group frame of variable."""
+        if var.frame is GlobFrame:
+            frame = group.globFrame
+        elif var.frame is LocFrame:
+            frame = group.locFrames[-1] if group.locFrames else None
+        else:
+            frame = group.tempFrame
+        if frame is None:
+            raise LaneError(RUN_FRAME_EXIST_ERR)
+        return frame
+
+    def _readUninit(self, group, symb):
+        """Returns column of symbol, None for uninitialised variable."""
+        if isinstance(symb, Constant):
+            size = group.lanes.size
+            cached = self._constants.get(symb)
+            if cached is None or cached.types.size != size:
+                cached = Column.full(symb.type, symb.value, size)
+                self._constants[symb] = cached
+            return cached
+
+        frame = self._frame(group, symb)
+        if symb.name not in frame:
+            raise LaneError(RUN_VAR_EXIST_ERR)
+        return frame[symb.name]
+
+    def _read(self, group, symb):
+        """Returns column of initialised symbol."""
+        col = self._readUninit(group, symb)
+        if col is None:
+            raise LaneError(RUN_VAL_MISSING_ERR)
+        return col
+
+    def _write(self, group, var, col):
+        """Writes column into variable."""
+        frame = self._frame(group, var)
+        if var.name not in frame:
+            raise LaneError(RUN_VAR_EXIST_ERR)
+        frame[var.name] = col
+
+    @staticmethod
+    def _label(labelNT):
+        """Returns instruction index of label."""
+        if labelNT.name not in Label._definedLabels:
+            raise LaneError(RUN_SEMANTIC_ERR)
+        return Label._definedLabels[labelNT.name]
+
+    def _keep(self, group, ok, exitCode, *cols):
+        """Ends lanes not marked in ok with exit code. Returns given columns of remaining lanes."""
+        if ok.all():
+            return cols
+        self._finish(group.lanes[~ok], exitCode)
+        group.keep(ok)
+        return tuple(col.take(ok) for col in cols)
+
+    def _mapLanes(self, group, operation, cols, errorCode = None):
+        """Applies operation on values of each lane and returns (values, cols).
+        Lanes where operation raises ValueError end with errorCode (if given),
+        any other exception ends lane as unhandled exception would."""
+        size = group.lanes.size
+        results = np.empty(size, dtype = object)
+        codes = np.zeros(size, dtype = np.int8)
+        for position, values in enumerate(zip(*(col.values for col in cols))):
+            try:
+                results[position] = operation(*values)
+            except ValueError:
+                codes[position] = errorCode or UNHANDLED_ERR
+            except Exception:
+                codes[position] = UNHANDLED_ERR
+
+        for exitCode in np.unique(codes[codes != 0]):
+            ok = codes != exitCode
+            cols = self._keep(group, ok, int(exitCode), *cols)
+            results, codes = results[ok], codes[ok]
+        return results, cols
+
+    @staticmethod
+    def _result(resType, values):
+        """Returns column of values of given type."""
+        return Column(np.full(values.size, resType.value, dtype = np.int8), values)
+
+    def _equal(self, group, col1, col2):
+        """Returns bool array of EQ results, lanes with incomparable operands end with error."""
+        nil1 = col1.types == _NIL
+        nil2 = col2.types == _NIL
+        anyNil = nil1 | nil2
+        ok = anyNil | (col1.types == col2.types)
+        if not ok.all():
+            col1, col2 = self._keep(group, ok, RUN_OPERANDS_ERR, col1, col2)
+            nil1, nil2, anyNil = nil1[ok], nil2[ok], anyNil[ok]
+        return np.where(anyNil, nil1 & nil2, np.equal(col1.values, col2.values).astype(bool))
+
+    # --- Instruction handlers -----
+    # handler returns None to continue with next instruction,
+    # or list of groups (with set instruction index) to be continued
+
+    def _noop(self, group, instr):
+        pass
+
+    def _dprint(self, group, instr):
+        self._read(group, instr.args[0]) # error output of lanes is not kept
+
+    def _move(self, group, instr):
+        self._write(group, instr.args[0], self._read(group, instr.args[1]))
+
+    def _createframe(self, group, instr):
+        group.tempFrame = dict() if instr.layout is None else dict(instr.layout)
+
+    def _pushframe(self, group, instr):
+        if group.tempFrame is None:
+            raise LaneError(RUN_FRAME_EXIST_ERR)
+        group.locFrames.append(group.tempFrame)
+        group.tempFrame = None
+
+    def _popframe(self, group, instr):
+        if not group.locFrames:
+            raise LaneError(RUN_FRAME_EXIST_ERR)
+        group.tempFrame = group.locFrames.pop()
+
+    def _defvar(self, group, instr):
+        var = instr.args[0]
+        frame = self._frame(group, var)
+        if var.name in frame:
+            raise LaneError(RUN_SEMANTIC_ERR)
+        frame[var.name] = None
+
+    def _call(self, group, instr):
+        group.callStack.append(group.idx + 1)
+        group.idx = instr.target if instr.target is not None else self._label(instr.args[0])
+        return [group]
+
+    def _return(self, group, instr):
+        if not group.callStack:
+            raise LaneError(RUN_VAL_MISSING_ERR)
+        group.idx = group.callStack.pop()
+        return [group]
+
+    def _pushs(self, group, instr):
+        group.dataStack.append(self._read(group, instr.args[0]))
+
+    def _pops(self, group, instr):
+        if not group.dataStack:
+            raise LaneError(RUN_VAL_MISSING_ERR)
+        self._write(group, instr.args[0], group.dataStack.pop())
+
+    @staticmethod
+    def _numeric(operation):
+        """Returns handler of ADD, SUB or MUL."""
+        def handler(self, group, instr):
+            col1 = self._read(group, instr.args[1])
+            col2 = self._read(group, instr.args[2])
+            types = col1.types
+            ok = (types == col2.types) & ((types == _INT) | (types == _FLOAT))
+            col1, col2 = self._keep(group, ok, RUN_OPERANDS_ERR, col1, col2)
+            self._write(group, instr.args[0], Column(col1.types, operation(col1.values, col2.values)))
+        return handler
+
+    @staticmethod
+    def _division(resType, operation):
+        """Returns handler of IDIV or DIV."""
+        def handler(self, group, instr):
+            col1 = self._read(group, instr.args[1])
+            col2 = self._read(group, instr.args[2])
+            zero = np.equal(col2.values, 0).astype(bool)
+            col1, col2 = self._keep(group, ~zero, RUN_VAL_WORNG_ERR, col1, col2)
+            ok = (col1.types == resType.value) & (col2.types == resType.value)
+            col1, col2 = self._keep(group, ok, RUN_OPERANDS_ERR, col1, col2)
+            self._write(group, instr.args[0], Column(col1.types, operation(col1.values, col2.values)))
+        return handler
+
+    @staticmethod
+    def _relational(operation):
+        """Returns handler of LT or GT."""
+        def handler(self, group, instr):
+            col1 = self._read(group, instr.args[1])
+            col2 = self._read(group, instr.args[2])
+            ok = (col1.types != _NIL) & (col2.types != _NIL)
+            col1, col2 = self._keep(group, ok, RUN_OPERANDS_ERR, col1, col2)
+            col1, col2 = self._keep(group, col1.types == col2.types, RUN_OPERANDS_ERR, col1, col2)
+            result = operation(col1.values, col2.values).astype(bool).astype(object)
+            self._write(group, instr.args[0], self._result(ConstantType.BOOL, result))
+        return handler
+
+    def _eq(self, group, instr):
+        col1 = self._read(group, instr.args[1])
+        col2 = self._read(group, instr.args[2])
+        result = self._equal(group, col1, col2).astype(object)
+        self._write(group, instr.args[0], self._result(ConstantType.BOOL, result))
+
+    @staticmethod
+    def _typed(srcTypes, resType, operation, perLane = False, errorCode = None):
+        """Returns handler of instruction with operands of given types.
+        Operation gets values arrays, or values of each lane if perLane is set."""
+        def handler(self, group, instr):
+            cols = tuple(self._read(group, arg) for arg in instr.args[1:])
+            ok = np.ones(group.lanes.size, dtype = bool)
+            for col, srcType in zip(cols, srcTypes):
+                ok &= col.types == srcType.value
+            cols = self._keep(group, ok, RUN_OPERANDS_ERR, *cols)
+            if perLane:
+                values, cols = self._mapLanes(group, operation, cols, errorCode)
+            else:
+                values = operation(*(col.values for col in cols))
+            self._write(group, instr.args[0], self._result(resType, values))
+        return handler
+
+    def _setchar(self, group, instr):
+        dest = self._read(group, instr.args[0])
+        index = self._read(group, instr.args[1])
+        src = self._read(group, instr.args[2])
+        dest, index, src = self._keep(group, index.types == _INT, RUN_OPERANDS_ERR, dest, index, src)
+        ok = (dest.types == _STRING) & (src.types == _STRING)
+        cols = self._keep(group, ok, RUN_OPERANDS_ERR, dest, index, src)
+        values, cols = self._mapLanes(group, _replaceChar, cols, RUN_STR_ERR)
+        self._write(group, instr.args[0], self._result(ConstantType.STRING, values))
+
+    def _type(self, group, instr):
+        col = self._readUninit(group, instr.args[1])
+        if col is None:
+            result = Column.full(ConstantType.STRING, "", group.lanes.size)
+        else:
+            result = self._result(ConstantType.STRING, self._TYPE_NAMES[col.types])
+        self._write(group, instr.args[0], result)
+
+    def _readInput(self, group, instr):
+        constType = instr.args[1]
+        position = group.position
+        group.position += 1
+        consts = list()
+        for lane in group.lanes:
+            lines = self.lines[lane]
+            string = lines[position] if position < len(lines) else ""
+            if len(string) != 0 and string[-1] == '\n':
+                string = string[:-1]
+            consts.append(Constant.parseFromStrInput(constType, string))
+        self._write(group, instr.args[0], Column.fromConsts(consts))
+
+    def _writeOutput(self, group, instr):
+        col = self._read(group, instr.args[0])
+        outputs = self.outputs
+        for lane, valueType, value in zip(group.lanes, col.types, col.values):
+            outputs[lane].append(_TO_STRING[valueType](value))
+
+    def _jump(self, group, instr):
+        group.idx = self._label(instr.args[0])
+        return [group]
+
+    @staticmethod
+    def _conditional(jumpIfEqual):
+        """Returns handler of JUMPIFEQ or JUMPIFNEQ."""
+        def handler(self, group, instr):
+            col1 = self._read(group, instr.args[1])
+            col2 = self._read(group, instr.args[2])
+            target = self._label(instr.args[0])
+            jump = self._equal(group, col1, col2)
+            if not jumpIfEqual:
+                jump = ~jump
+
+            if not jump.any():
+                return None
+            if jump.all():
+                group.idx = target
+                return [group]
+
+            jumped = group.split(jump)
+            jumped.idx = target
+            group.idx += 1
+            return [group, jumped]
+        return handler
+
+    def _exit(self, group, instr):
+        col = self._read(group, instr.args[0])
+        col, = self._keep(group, col.types == _INT, RUN_OPERANDS_ERR, col)
+        valid = np.fromiter((0 <= value <= 49 for value in col.values), dtype = bool,
+                            count = col.values.size)
+        col, = self._keep(group, valid, RUN_VAL_WORNG_ERR, col)
+        for lane, value in zip(group.lanes, col.values):
+            self.exitCodes[lane] = value
+        return []
+
+
+def _charAt(string, index):
+    """Returns character on index, ValueError if it is out of range."""
+    if index >= len(string) or index < 0:
+        raise ValueError
+    return string[index]
+
+def _replaceChar(string, index, src):
+    """Returns string with character on index replaced by first character of src."""
+    if index >= len(string) or index < 0 or len(src) <= 0:
+        raise ValueError
+    return string[:index] + src[0] + string[index + 1:]
+
+_TO_STRING = {
+    _INT: str,
+    _STRING: lambda value: value,
+    _FLOAT: float.hex,
+    _BOOL: lambda value: "true" if value is True else "false",
+    _NIL: lambda value: "",
+}
+"""Conversions of values of each type to string printed by WRITE."""
+
+_BOOL_ARRAY = lambda values: values.astype(bool)
+
+Lockstep._HANDLERS = {
+    Move: Lockstep._move,
+    Createframe: Lockstep._createframe,
+    Pushframe: Lockstep._pushframe,
+    Popframe: Lockstep._popframe,
+    Defvar: Lockstep._defvar,
+    PresetDefvar: Lockstep._noop,
+    Call: Lockstep._call,
+    Return: Lockstep._return,
+    Pushs: Lockstep._pushs,
+    Pops: Lockstep._pops,
+    Add: Lockstep._numeric(lambda a, b: a + b),
+    Sub: Lockstep._numeric(lambda a, b: a - b),
+    Mul: Lockstep._numeric(lambda a, b: a * b),
+    Idiv: Lockstep._division(ConstantType.INT, lambda a, b: a // b),
+    Div: Lockstep._division(ConstantType.FLOAT, lambda a, b: a / b),
+    Lt: Lockstep._relational(lambda a, b: a < b),
+    Gt: Lockstep._relational(lambda a, b: a > b),
+    Eq: Lockstep._eq,
+    And: Lockstep._typed((ConstantType.BOOL, ConstantType.BOOL), ConstantType.BOOL,
+                         lambda a, b: (_BOOL_ARRAY(a) & _BOOL_ARRAY(b)).astype(object)),
+    Or: Lockstep._typed((ConstantType.BOOL, ConstantType.BOOL), ConstantType.BOOL,
+                        lambda a, b: (_BOOL_ARRAY(a) | _BOOL_ARRAY(b)).astype(object)),
+    Not: Lockstep._typed((ConstantType.BOOL,), ConstantType.BOOL,
+                         lambda a: (~_BOOL_ARRAY(a)).astype(object)),
+    Int2char: Lockstep._typed((ConstantType.INT,), ConstantType.STRING, chr,
+                              perLane = True, errorCode = RUN_STR_ERR),
+    Stri2int: Lockstep._typed((ConstantType.STRING, ConstantType.INT), ConstantType.INT,
+                              lambda string, index: ord(_charAt(string, index)),
+                              perLane = True, errorCode = RUN_STR_ERR),
+    Int2float: Lockstep._typed((ConstantType.INT,), ConstantType.FLOAT, float, perLane = True),
+    Float2int: Lockstep._typed((ConstantType.FLOAT,), ConstantType.INT, int, perLane = True),
+    Read: Lockstep._readInput,
+    Write: Lockstep._writeOutput,
+    Concat: Lockstep._typed((ConstantType.STRING, ConstantType.STRING), ConstantType.STRING,
+                            lambda a, b: a + b),
+    Strlen: Lockstep._typed((ConstantType.STRING,), ConstantType.INT, len, perLane = True),
+    Getchar: Lockstep._typed((ConstantType.STRING, ConstantType.INT), ConstantType.STRING,
+                             _charAt, perLane = True, errorCode = RUN_STR_ERR),
+    Setchar: Lockstep._setchar,
+    Type: Lockstep._type,
+    Label: Lockstep._noop,
+    Jump: Lockstep._jump,
+    Jumpifeq: Lockstep._conditional(True),
+    Jumpifneq: Lockstep._conditional(False),
+    Exit: Lockstep._exit,
+    Dprint: Lockstep._dprint,
+    Break: Lockstep._noop,
+}
+"""Handlers of instructions executed over all lanes of a group."""
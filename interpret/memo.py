@@ -0,0 +1,114 @@
+"""
+Module containing memoization of pure subroutines calls.
+
+Calls of pure subroutines (see analysis.Subroutines.pure) are cached by
+values of the called frame (temporary frame at the time of call, unless
+the subroutine creates its own) and of data stack items taken by the
+subroutine. Cached result is the frame the subroutine leaves in temporary
+frame and data stack items it leaves to its caller. Cache hit skips the
+subroutine execution, so STATI counts only executed instructions.
+
+Author: Vilém Gottwald (xgottw07)
+Project: IPP 2022 - IPPcode2022 interpret
+"""
+
+from collections import OrderedDict
+
+from program import *
+from analysis import Subroutines
+
+
+class Memoizer:
+    """Bounded LRU cache of pure subroutines results."""
+
+    DEFAULT_SIZE = 4096
+
+    cache = OrderedDict()
+    size = DEFAULT_SIZE
+
+    @classmethod
+    def install(cls, size = None):
+        """Switches calls of pure subroutines in loaded program to memoized calls."""
+        cls.size = size or cls.DEFAULT_SIZE
+        subroutines = Subroutines.pure(Program.instructions)
+        for instruction in Program.instructions:
+            if type(instruction) is Call and instruction.target in subroutines:
+                instruction.__class__ = MemoCall
+                instruction.subroutine = subroutines[instruction.target]
+
+    @staticmethod
+    def constKey(const):
+        """Returns hashable key of constant (None for uninitialised variable)."""
+        if const is None:
+            return None
+        if const.type is ConstantType.FLOAT:
+            return (const.type, float.hex(const.value))
+        return (const.type, const.value)
+
+    @classmethod
+    def lookup(cls, key):
+        """Returns cached result for given key or None."""
+        result = cls.cache.get(key)
+        if result is not None:
+            cls.cache.move_to_end(key)
+        return result
+
+    @classmethod
+    def store(cls, key, result):
+        """Stores result of subroutine call, evicts least recently used one if full."""
+        cls.cache[key] = result
+        cls.cache.move_to_end(key)
+        if len(cls.cache) > cls.size:
+            cls.cache.popitem(last = False)
+
+
+class MemoCall(Call):
+    """CALL of pure subroutine with cached results."""
+    subroutine = None
+
+    def exec(self):
+        frame = TempFrame._vars
+        stack = Program.dataStack.stack
+        consumed = self.subroutine.consumed
+        ownFrame = self.subroutine.ownFrame
+        if (frame is None and not ownFrame) or len(stack) < consumed:
+            super().exec() # ends with the same error as without memoization
+            return
+
+        constKey = Memoizer.constKey
+        if ownFrame:
+            frameKey = None
+        else:
+            frameKey = tuple((name, constKey(value)) for name, value in frame.items())
+        args = stack[len(stack) - consumed:]
+        key = (self.target, frameKey, tuple(constKey(const) for const in args))
+
+        result = Memoizer.lookup(key)
+        if result is None:
+            Program.stats.memoMisses += 1
+            Program.callStack.push(PendingCall(self.returnIdx, key, self.subroutine.produced))
+            Program.counter.jumpTo(self.target)
+            return
+
+        Program.stats.memoHits += 1
+        resultFrame, produced = result
+        TempFrame._vars = dict(resultFrame)
+        Frame.newGeneration()
+        del stack[len(stack) - consumed:]
+        stack.extend(produced)
+        Program.counter.jumpTo(self.returnIdx)
+
+
+class PendingCall:
+    """Return address of memoized call, storing the call result when it returns."""
+    def __init__(self, returnIdx, key, produced):
+        self.returnIdx = returnIdx
+        self.key = key
+        self.produced = produced
+
+    def complete(self):
+        """Stores result of returning subroutine and returns return index."""
+        stack = Program.dataStack.stack
+        produced = tuple(stack[len(stack) - self.produced:]) if self.produced else ()
+        Memoizer.store(self.key, (tuple(TempFrame._vars.items()), produced))
+        return self.returnIdx
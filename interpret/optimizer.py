@@ -0,0 +1,330 @@
+"""
+Module containing load-time optimizer of IPPcode2022 programs.
+
+Optimization levels:
+    0 - no optimization
+    1 - removal of unreachable instructions and jumps to the next instruction
+    2 - level 1 + constant folding, constant and copy propagation
+        and removal of redundant moves inside basic blocks
+
+Optimized program has the same output, exit code and runtime errors
+as the original one, only the instructions that have no observable
+effect are not executed (STATI insts counts executed instructions
+of the optimized program).
+
+Author: Vilém Gottwald (xgottw07)
+Project: IPP 2022 - IPPcode2022 interpret
+"""
+
+from math import isfinite
+
+from program import *
+from analysis import ControlFlow
+
+
+class Optimizer:
+    """Load-time optimizer working on list of program instructions."""
+
+    MAX_LEVEL = 2
+
+    @classmethod
+    def optimize(cls, instructions, level):
+        """Returns optimized copy of instructions list for given optimization level."""
+        instructions = list(instructions)
+        if level <= 0:
+            return instructions
+
+        changed = True
+        while changed:
+            changed = False
+            if level >= 2:
+                changed |= cls._propagateConstants(instructions)
+            changed |= cls._removeUnreachable(instructions)
+            changed |= cls._removeNextJumps(instructions)
+
+        return instructions
+
+    # --- Level 1 -----
+
+    @staticmethod
+    def _removeUnreachable(instructions):
+        """Removes instructions following JUMP, RETURN or EXIT up to next label."""
+        changed = False
+        idx = 0
+        while idx < len(instructions):
+            if ControlFlow.isTerminating(instructions[idx]):
+                end = idx + 1
+                while end < len(instructions) and not isinstance(instructions[end], Label):
+                    end += 1
+                if end > idx + 1:
+                    del instructions[idx + 1:end]
+                    changed = True
+            idx += 1
+
+        return changed
+
+    @staticmethod
+    def _removeNextJumps(instructions):
+        """Removes JUMP instructions jumping to label following them."""
+        changed = False
+        labels = ControlFlow.labelIndexes(instructions)
+        idx = 0
+        while idx < len(instructions):
+            instruction = instructions[idx]
+            if isinstance(instruction, Jump):
+                target = labels.get(instruction.args[0].name)
+                between = instructions[idx + 1:target] if target is not None else None
+                if between is not None and target > idx \
+                        and all(isinstance(instr, Label) for instr in between):
+                    del instructions[idx]
+                    labels = ControlFlow.labelIndexes(instructions)
+                    changed = True
+                    continue
+            idx += 1
+
+        return changed
+
+    # --- Level 2 -----
+
+    @classmethod
+    def _propagateConstants(cls, instructions):
+        """Propagates constants and copies inside basic blocks and folds constant expressions."""
+        changed = False
+        labels = ControlFlow.labelIndexes(instructions)
+        for start, end in ControlFlow.blocks(instructions):
+            known = dict()
+            for idx in range(start, end):
+                instruction = instructions[idx]
+                changed |= cls._substitute(instruction, known)
+
+                replacement = cls._fold(instruction, labels)
+                if replacement is not instruction:
+                    instructions[idx] = replacement
+                    instruction = replacement
+                    changed = True
+
+                if instruction is None or cls._isRedundantMove(instruction, known):
+                    instructions[idx] = None
+                    changed = True
+                    continue
+
+                cls._updateKnown(instruction, known)
+
+        # removed instructions are marked by None until the end of the pass,
+        # so the basic block bounds stay valid during it
+        kept = [instr for instr in instructions if instr is not None]
+        if len(kept) != len(instructions):
+            instructions[:] = kept
+        return changed
+
+    @staticmethod
+    def _key(var):
+        """Returns key identifying variable inside a basic block."""
+        return (var.frame, var.name)
+
+    @staticmethod
+    def _readPositions(instruction):
+        """Returns indexes of arguments that are read as symbols."""
+        return [pos for pos, kind in enumerate(instruction.operands) if kind == "symb"]
+
+    @staticmethod
+    def _writesFirst(instruction):
+        """Returns bool whether instruction writes into variable given as first argument."""
+        return instruction.operands[:1] == ("var",)
+
+    @classmethod
+    def _substitute(cls, instruction, known):
+        """Replaces read variables by their known constant or copied variable."""
+        changed = False
+        for pos in cls._readPositions(instruction):
+            arg = instruction.args[pos]
+            if isinstance(arg, Variable):
+                value = known.get(cls._key(arg))
+                if value is not None:
+                    instruction.args[pos] = value
+                    changed = True
+        return changed
+
+    @classmethod
+    def _isRedundantMove(cls, instruction, known):
+        """Returns bool whether MOVE doesn't change destination variable value."""
+        if not isinstance(instruction, Move):
+            return False
+        dest, src = instruction.args
+        current = known.get(cls._key(dest))
+        if isinstance(src, Variable):
+            if cls._key(dest) == cls._key(src):
+                return current is not None
+            return isinstance(current, Variable) and cls._key(current) == cls._key(src)
+        return isinstance(current, Constant) and cls._sameConstant(current, src)
+
+    @staticmethod
+    def _sameConstant(const1, const2):
+        """Returns bool whether constants have the same type and value."""
+        if const1.type is not const2.type:
+            return False
+        if const1.type is ConstantType.FLOAT:
+            return float.hex(const1.value) == float.hex(const2.value)
+        return const1.value == const2.value
+
+    @classmethod
+    def _updateKnown(cls, instruction, known):
+        """Updates known variable values after instruction."""
+        if isinstance(instruction, (Createframe, Pushframe, Popframe)):
+            for key in list(known):
+                value = known[key]
+                if key[0] is not GlobFrame \
+                        or (isinstance(value, Variable) and value.frame is not GlobFrame):
+                    del known[key]
+            return
+
+        if cls._writesFirst(instruction):
+            destKey = cls._key(instruction.args[0])
+            for key in list(known):
+                value = known[key]
+                if isinstance(value, Variable) and cls._key(value) == destKey:
+                    del known[key]
+            known.pop(destKey, None)
+
+            if isinstance(instruction, Move):
+                src = instruction.args[1]
+                if not (isinstance(src, Variable) and cls._key(src) == destKey):
+                    known[destKey] = src
+
+    # --- Constant folding -----
+
+    @classmethod
+    def _fold(cls, instruction, labels):
+        """Returns instruction replacing given one if it has only constant operands.
+        None is returned for instruction that can be removed."""
+        readPositions = cls._readPositions(instruction)
+        if not readPositions:
+            return instruction
+        if not all(isinstance(instruction.args[pos], Constant) for pos in readPositions):
+            return instruction
+
+        if isinstance(instruction, (Jumpifeq, Jumpifneq)):
+            if instruction.args[0].name not in labels:
+                return instruction # undefined label error has to be kept
+            const1, const2 = instruction.args[1:]
+            equal = cls._equal(const1, const2)
+            if equal is None:
+                return instruction
+            if equal == isinstance(instruction, Jumpifeq):
+                return Jump.fromArgs(instruction.order, instruction.args[:1])
+            return None
+
+        folder = cls._FOLDERS.get(type(instruction))
+        if folder is None:
+            return instruction
+        try:
+            result = folder(*instruction.args[1:])
+        except (ValueError, OverflowError, TypeError, IndexError):
+            result = None
+        if result is None:
+            return instruction
+
+        return Move.fromArgs(instruction.order, [instruction.args[0], result])
+
+    @staticmethod
+    def _equal(const1, const2):
+        """Evaluates EQ on constants, returns None if it would end with error."""
+        if const1.type is ConstantType.NIL or const2.type is ConstantType.NIL:
+            return const1.type is const2.type
+        if const1.type is not const2.type:
+            return None
+        return const1.value == const2.value
+
+    @staticmethod
+    def _numeric(operation):
+        """Returns folder of numeric binary operation."""
+        def folder(const1, const2):
+            if const1.type is not const2.type \
+                    or const1.type not in (ConstantType.INT, ConstantType.FLOAT):
+                return None
+            return Constant(const1.type, operation(const1.value, const2.value))
+        return folder
+
+    @staticmethod
+    def _typed(srcType, resType, operation):
+        """Returns folder of operation on operands of given type."""
+        def folder(*consts):
+            if any(const.type is not srcType for const in consts):
+                return None
+            return Constant(resType, operation(*(const.value for const in consts)))
+        return folder
+
+    @staticmethod
+    def _relational(operation):
+        """Returns folder of LT or GT."""
+        def folder(const1, const2):
+            if const1.type is not const2.type or const1.type is ConstantType.NIL:
+                return None
+            return Constant(ConstantType.BOOL, operation(const1.value, const2.value))
+        return folder
+
+    @staticmethod
+    def _foldDivision(resType):
+        """Returns folder of IDIV or DIV."""
+        def folder(const1, const2):
+            if const2.value == 0 or const1.type is not resType or const2.type is not resType:
+                return None
+            if resType is ConstantType.INT:
+                return Constant(resType, const1.value // const2.value)
+            return Constant(resType, const1.value / const2.value)
+        return folder
+
+    @staticmethod
+    def _foldEq(const1, const2):
+        """Folds EQ instruction."""
+        equal = Optimizer._equal(const1, const2)
+        if equal is None:
+            return None
+        return Constant(ConstantType.BOOL, equal)
+
+    @staticmethod
+    def _foldIndexed(resType, operation):
+        """Returns folder of STRI2INT or GETCHAR."""
+        def folder(string, index):
+            if string.type is not ConstantType.STRING or index.type is not ConstantType.INT:
+                return None
+            if index.value >= len(string.value) or index.value < 0:
+                return None
+            return Constant(resType, operation(string.value[index.value]))
+        return folder
+
+    @staticmethod
+    def _foldFloat2int(const):
+        """Folds FLOAT2INT instruction, infinite values are left to runtime."""
+        if const.type is not ConstantType.FLOAT or not isfinite(const.value):
+            return None
+        return Constant(ConstantType.INT, int(const.value))
+
+    @staticmethod
+    def _foldType(const):
+        """Folds TYPE instruction."""
+        return Constant(ConstantType.STRING, const.getTypeString())
+
+
+Optimizer._FOLDERS = {
+    Add: Optimizer._numeric(lambda a, b: a + b),
+    Sub: Optimizer._numeric(lambda a, b: a - b),
+    Mul: Optimizer._numeric(lambda a, b: a * b),
+    Idiv: Optimizer._foldDivision(ConstantType.INT),
+    Div: Optimizer._foldDivision(ConstantType.FLOAT),
+    Lt: Optimizer._relational(lambda a, b: a < b),
+    Gt: Optimizer._relational(lambda a, b: a > b),
+    Eq: Optimizer._foldEq,
+    And: Optimizer._typed(ConstantType.BOOL, ConstantType.BOOL, lambda a, b: a and b),
+    Or: Optimizer._typed(ConstantType.BOOL, ConstantType.BOOL, lambda a, b: a or b),
+    Not: Optimizer._typed(ConstantType.BOOL, ConstantType.BOOL, lambda a: not a),
+    Concat: Optimizer._typed(ConstantType.STRING, ConstantType.STRING, lambda a, b: a + b),
+    Strlen: Optimizer._typed(ConstantType.STRING, ConstantType.INT, len),
+    Int2char: Optimizer._typed(ConstantType.INT, ConstantType.STRING, chr),
+    Int2float: Optimizer._typed(ConstantType.INT, ConstantType.FLOAT, float),
+    Float2int: Optimizer._foldFloat2int,
+    Stri2int: Optimizer._foldIndexed(ConstantType.INT, ord),
+    Getchar: Optimizer._foldIndexed(ConstantType.STRING, lambda char: char),
+    Type: Optimizer._foldType,
+}
+"""Constant folders of instructions writing result into their first argument."""
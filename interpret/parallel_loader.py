@@ -0,0 +1,205 @@
+"""
+Module containing parallel loading of large XML program sources.
+
+Source is split at starts of instruction tags into chunks, each chunk is parsed
+and built in a process pool into compact serialisable form: classes and operands
+tables (equal operands are shared, operands are never modified) and arrays
+of opcodes, orders and operand indexes. Built chunks are merged in document
+order, merge checks duplicate orders across chunks and the loading program
+declares labels, so errors are the same as of sequential loading.
+
+Source is loaded sequentially when it is smaller than MIN_SIZE, when processes
+can't be forked or when anything unusual is found (document type declaration,
+other encoding than UTF-8, error in any chunk). Sequential loading then
+reports the error, if there is any.
+
+Author: Vilém Gottwald (xgottw07)
+Project: IPP 2022 - IPPcode2022 interpret
+"""
+
+import gc
+import io
+import os
+import re
+import sys
+import multiprocessing
+import xml.etree.ElementTree as ET
+from array import array
+
+from program import *
+
+
+class ParallelLoader:
+    """Loads XML program source in chunks built by pool of processes."""
+
+    MIN_SIZE = 1 << 20
+    """Size of source (in bytes) from which it is loaded in parallel."""
+
+    CHUNKS_PER_JOB = 4
+
+    _INSTRUCTION = re.compile(rb"<instruction[\s/>]")
+    _ENCODING = re.compile(rb"\s*<\?xml[^>]*encoding\s*=\s*[\"'](?!utf-?8[\"'])", re.IGNORECASE)
+
+    @classmethod
+    def parse(cls, source, jobs):
+        """Parses XML file into list of instructions using given number of processes."""
+        data = cls._read(source)
+        chunks = cls._build(data, jobs)
+        if chunks is None:
+            Program._getXmlTree(io.BytesIO(data))
+            Program._xmlTreeParse()
+            return Program.instructions
+
+        enabled = gc.isenabled()
+        gc.disable() # merged instructions create no cycles, collections would only traverse them
+        try:
+            instructions = list()
+            for instrClass, order, args in cls._merge(chunks):
+                if instrClass is Label:
+                    Label.declare(args[0].name)
+                instructions.append(instrClass.fromArgs(order, args))
+        finally:
+            if enabled:
+                gc.enable()
+        return instructions
+
+    @classmethod
+    def rows(cls, source, jobs):
+        """Yields instruction class, order and arguments of each instruction of XML file
+        using given number of processes."""
+        data = cls._read(source)
+        chunks = cls._build(data, jobs)
+        if chunks is None:
+            from compact import CompactProgram
+            return CompactProgram._xmlRows(io.BytesIO(data))
+        return cls._merge(chunks)
+
+    @staticmethod
+    def _read(source):
+        """Returns content of source file (or standard input)."""
+        if hasattr(source, "buffer"):
+            return source.buffer.read()
+        try:
+            with open(source, "rb") as file:
+                return file.read()
+        except OSError:
+            exitWMsg(INPUT_FILE_ERR, "Couldn't open XML program source file")
+
+    @classmethod
+    def _build(cls, data, jobs):
+        """Returns built chunks of source, None if it has to be loaded sequentially."""
+        if len(data) < cls.MIN_SIZE or "fork" not in multiprocessing.get_all_start_methods():
+            return None
+        chunks = cls._split(data, jobs * cls.CHUNKS_PER_JOB)
+        if chunks is None:
+            return None
+
+        with multiprocessing.get_context("fork").Pool(jobs, _initWorker) as pool:
+            built = pool.map(_buildChunk, chunks)
+        return None if None in built else built
+
+    @classmethod
+    def _split(cls, data, count):
+        """Returns instruction tags of source split into at most count chunks,
+        None if the rest of source isn't a plain program tag."""
+        first = cls._INSTRUCTION.search(data)
+        end = data.rfind(b"</program>")
+        if first is None or end < first.start():
+            return None
+
+        header = data[:first.start()]
+        if b"<!DOCTYPE" in header or cls._ENCODING.match(header.removeprefix(b"\xef\xbb\xbf")):
+            return None
+        parser = ET.XMLPullParser(("start",))
+        try:
+            parser.feed(header)
+            parser.feed(data[end:])
+            parser.close()
+        except ET.ParseError:
+            return None
+        tags = [element for _, element in parser.read_events()]
+        if len(tags) != 1 or tags[0].tag != "program" or tags[0].attrib.get("language") != "IPPcode22":
+            return None
+
+        bounds = [first.start()]
+        step = (end - first.start()) // count + 1
+        for target in range(first.start() + step, end, step):
+            match = cls._INSTRUCTION.search(data, max(target, bounds[-1] + 1), end)
+            if match is None:
+                break
+            bounds.append(match.start())
+        bounds.append(end)
+        return [data[start:stop] for start, stop in zip(bounds, bounds[1:])]
+
+    @staticmethod
+    def _merge(chunks):
+        """Yields instruction class, order and arguments of each instruction of built chunks.
+        Orders are checked one by one only if some of them are duplicate."""
+        orders = set(Instruction.orders)
+        for chunk in chunks:
+            orders.update(chunk[3])
+        unique = len(orders) == len(Instruction.orders) + sum(len(chunk[3]) for chunk in chunks)
+        if unique:
+            Instruction.orders.update(orders)
+
+        for classes, operands, opcodes, orders, argIndex, argStart in chunks:
+            operand = operands.__getitem__
+            start = 0
+            for opcode, order, stop in zip(opcodes, orders, argStart):
+                if not unique:
+                    Instruction.registerOrder(order)
+                yield classes[opcode], order, list(map(operand, argIndex[start:stop]))
+                start = stop
+
+
+def _initWorker():
+    """Discards error messages of worker process (errors are reported by sequential loading)
+    and disables its garbage collection, built chunks create no cycles."""
+    sys.stderr = open(os.devnull, "w")
+    gc.disable()
+
+
+def _buildChunk(chunk):
+    """Parses chunk of instruction tags, returns it in compact form (None on error)."""
+    Instruction.orders = set()
+    classes, classIds = list(), dict()
+    operands, operandIds = list(), dict()
+    opcodes, orders, argIndex, argStart = array("H"), array("q"), array("L"), array("L")
+    try:
+        for instrTag in ET.fromstring(b"<program>" + chunk + b"</program>"):
+            instrClass = Program._instructionClass(instrTag)
+            order = Instruction._parseOrder(instrTag)
+            args = Instruction._parseArgTags(instrTag)
+            instrClass._checkOperands(order, args)
+
+            if instrClass not in classIds:
+                classIds[instrClass] = len(classes)
+                classes.append(instrClass)
+            opcodes.append(classIds[instrClass])
+            try:
+                orders.append(order)
+            except OverflowError: # order out of array range, orders are kept in list
+                orders = list(orders)
+                orders.append(order)
+            for arg in args:
+                key = _operandKey(arg)
+                if key not in operandIds:
+                    operandIds[key] = len(operands)
+                    operands.append(arg)
+                argIndex.append(operandIds[key])
+            argStart.append(len(argIndex))
+    except (ET.ParseError, SystemExit):
+        return None
+    return classes, operands, opcodes, orders, argIndex, argStart
+
+
+def _operandKey(arg):
+    """Returns key of operand, equal operands have equal keys."""
+    if isinstance(arg, Variable):
+        return Variable, arg.frame, arg.name
+    if isinstance(arg, Constant):
+        value = float.hex(arg.value) if arg.type is ConstantType.FLOAT else arg.value
+        return Constant, arg.type, value
+    if isinstance(arg, LabelNT):
+        return LabelNT, arg.name
+    return ConstantType, arg
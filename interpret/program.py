@@ -8,24 +8,73 @@ Project: IPP 2022 - IPPcode2022 interpret
 
 import xml.etree.ElementTree as ET
 import importlib
+from bisect import bisect_left, bisect_right
 from re import match
 import sys
 
 from frames import *
 from data_types import *
 from stack import Stack
+from timings import Timings
 
 
 class Stats:
     """Stati extension stats counter."""
+
+    COUNTERS = ("insts", "hot", "vars", "memoHits", "memoMisses", "opcodes", "callDepth",
+                "stackDepth", "frameDepth", "frames", "written", "reads", "quickened", "deopts",
+                "inlined")
+    """Attributes with collected statistics."""
+
     def __init__(self):
         self.insts = 0
         self.hot = dict()
         self.vars = 0
+        self.memoHits = 0
+        self.memoMisses = 0
+        self.opcodes = None
+        """Number of executed instructions of each opcode (None if not collected)."""
+        self.callDepth = 0
+        self.stackDepth = 0
+        self.frameDepth = 0
+        self.frames = 0
+        self.written = 0
+        self.reads = 0
+        self.quickened = 0
+        self.deopts = 0
+        self.inlined = 0
+        self._inlinedSites = ()
         self.config = None
         self.file = None
+        self.format = "lines"
+
+    def register(self):
+        """Registers counting of configured statistics into program execution.
+        Statistics other than insts, hot and vars are updated only on events changing them."""
+        from hooks import Hooks
+        Hooks.register("instruction", self.countIn)
+        config = set(self.config)
+        if "opcodes" in config:
+            self.opcodes = dict()
+        if "calldepth" in config:
+            Hooks.register("call", self._onCall)
+        if "stackdepth" in config:
+            Hooks.register("push", self._onStackGrowth)
+            Hooks.register("call", self._onStackGrowth) # memoized call can leave items on stack
+        if "framedepth" in config:
+            Hooks.register("framePush", self._onFramePush)
+        if "frames" in config:
+            Hooks.register("createFrame", self._onCreateFrame)
+        if "written" in config:
+            Hooks.register("write", self._onWrite)
+        if "reads" in config:
+            Hooks.register("read", self._onRead)
+        if "inlined" in config:
+            from inliner import Inliner
+            self._inlinedSites = Inliner.sites
+            Hooks.register("block", self._onBlock)
     
-    def countIn(self, instruction):
+    def countIn(self, instruction, idx = None):
         """ Count instruction into statistics."""
         if not self.isActivated():
             return
@@ -36,6 +85,49 @@ class Stats:
         self.addExecInst()
         self.addHot(instruction.order)
         self.assignVars()
+        if self.opcodes is not None:
+            self.addOpcode(instruction)
+
+    def countExit(self, instruction):
+        """Counts in EXIT instruction, it ends interpretation before observers are called."""
+        self.insts += 1
+        if self.opcodes is not None:
+            self.addOpcode(instruction)
+
+    def addOpcode(self, instruction):
+        """Counts instruction into histogram of executed opcodes."""
+        opcode = _OPCODE_NAMES.get(instruction.__class__)
+        if opcode is None:
+            opcode = _opcodeName(instruction.__class__)
+        self.opcodes[opcode] = self.opcodes.get(opcode, 0) + 1
+
+    def _onCall(self, instruction, target):
+        depth = len(Program.callStack.stack)
+        if depth > self.callDepth:
+            self.callDepth = depth
+
+    def _onStackGrowth(self, instruction, value):
+        depth = len(Program.dataStack.stack)
+        if depth > self.stackDepth:
+            self.stackDepth = depth
+
+    def _onFramePush(self, instruction, frame):
+        depth = len(LocFrame._stack.stack)
+        if depth > self.frameDepth:
+            self.frameDepth = depth
+
+    def _onCreateFrame(self, instruction, frame):
+        self.frames += 1
+
+    def _onWrite(self, instruction, const):
+        self.written += len(const.toString().encode())
+
+    def _onRead(self, instruction, const):
+        self.reads += 1
+
+    def _onBlock(self, first, last):
+        sites = self._inlinedSites
+        self.inlined += bisect_right(sites, last) - bisect_left(sites, first)
 
     def addExecInst(self):
         """Counts in executed instruction."""
@@ -67,24 +159,63 @@ class Stats:
         """Adds new tests output file."""
         self.file = file
 
+    def addFormat(self, format):
+        """Sets format of output file ("lines" or "json")."""
+        self.format = format
+
     def isActivated(self):
         """Returns bool whether stats are activated"""
         return self.file is not None
 
+    def getValue(self, statName):
+        """Returns value of statistic with given name."""
+        if statName == "insts":
+            return self.insts
+        elif statName == "hot":
+            return self.getHottest()
+        elif statName == "vars":
+            return self.vars
+        elif statName == "memohits":
+            return self.memoHits
+        elif statName == "memomisses":
+            return self.memoMisses
+        elif statName == "opcodes":
+            return self.opcodes
+        elif statName == "calldepth":
+            return self.callDepth
+        elif statName == "stackdepth":
+            return self.stackDepth
+        elif statName == "framedepth":
+            return self.frameDepth
+        elif statName == "frames":
+            return self.frames
+        elif statName == "written":
+            return self.written
+        elif statName == "reads":
+            return self.reads
+        elif statName == "quickened":
+            return self.quickened
+        elif statName == "deopts":
+            return self.deopts
+        elif statName == "inlined":
+            return self.inlined
+
     def printStats(self):
         """Prints stats into output file given in config."""
         if not self.isActivated():
             return
 
-        output = ""
-        for statName in self.config:
-            if statName == "insts":
-                output += str(self.insts)
-            elif statName == "hot":
-                output += str(self.getHottest()) 
-            elif statName == "vars":
-                output += str(self.vars)
-            output += "\n"
+        if self.format == "json":
+            import json
+            output = json.dumps({statName: self.getValue(statName) for statName in self.config}) + "\n"
+        else:
+            output = ""
+            for statName in self.config:
+                value = self.getValue(statName)
+                if isinstance(value, dict):
+                    value = " ".join(f"{key}:{count}" for key, count in sorted(value.items()))
+                output += str(value)
+                output += "\n"
 
         try:
              f = open(self.file, "w")
@@ -93,6 +224,16 @@ class Stats:
         f.write(output)
         f.close()
         
+_OPCODE_NAMES = dict()
+"""Opcodes of instruction classes (specialised classes have opcode of their base)."""
+
+def _opcodeName(instrClass):
+    """Returns opcode of instruction class."""
+    for cls in instrClass.__mro__:
+        if cls.__name__ == cls.__name__.capitalize():
+            _OPCODE_NAMES[instrClass] = cls.__name__.upper()
+            return _OPCODE_NAMES[instrClass]
+
 class ProgramCounter:
     """Program counter marking current instruction index"""
     def __init__(self):
@@ -119,6 +260,7 @@ class ReadInput:
         
         If no file - input is read from standard input,
         otherwise input is read from given file"""
+        self.position = 0
         if file is None:
             self.lines = None
         else:
@@ -137,12 +279,36 @@ class ReadInput:
                 string = ""
         else:
             try:
-                string = self.lines.pop(0)
+                string = self.lines[self.position]
             except IndexError:
                 string = ""
 
+        self.position += 1
         return string
 
+    def skipTo(self, position):
+        """Skips input lines up to given position (number of already read lines)."""
+        while self.position < position:
+            self.getLine()
+
+class PeriodicTask:
+    """Task run between slices of executed instructions, for further inheritance."""
+    def start(self):
+        """Called before the first slice is executed."""
+        pass
+
+    def nextSlice(self, executed):
+        """Returns maximal number of instructions to be executed before next check."""
+        return None
+
+    def check(self, executed):
+        """Called after each slice with number of all executed instructions."""
+        pass
+
+    def outOfMemory(self):
+        """Called when execution of slice failed on memory allocation."""
+        pass
+
 class Program:
     """Class representing IPPcode22 program."""
     counter = ProgramCounter()
@@ -152,16 +318,96 @@ class Program:
 
     stats = Stats()
 
+    observers = list()
+    """Functions called after each executed instruction with the instruction and its index."""
+
+    blockObservers = list()
+    """Functions called with indexes of the first and the last instruction of each executed
+    sequence of consecutive instructions (ended by a jump, slice end or program end)."""
+
+    blockStart = None
+    """Index of the first instruction of the currently executed sequence of instructions."""
+
+    finalizers = list()
+    """Functions called with exit code when interpretation ends (normally or by exit)."""
+
+    periodic = list()
+    """Periodic tasks run between slices of executed instructions."""
+
+    executed = 0
+    """Number of instructions executed by main loop."""
+
     @classmethod
-    def load(cls, source):
-        """Loads program from given input XML file."""
+    def load(cls, source, optimize = 0, memoize = None, store = "objects", footprint = False,
+             sourceFormat = "xml", tailCalls = False, inline = None, jobs = 1):
+        """Loads program from given input XML file.
+
+        sourceFormat - format of source file, "xml" (XML representation)
+                       or "ippcode" (IPPcode22 source code, see ippcode_parser module)
+        optimize  - optimization level of loaded program
+        memoize   - size of pure subroutines results cache, None disables memoization
+        inline    - maximal size of inlined subroutines, None disables inlining (see inliner module)
+        store     - representation of loaded program, "objects" (instruction objects)
+                    or "compact" (struct of arrays, see compact module)
+        footprint - report size of loaded program to standard error output
+        tailCalls - execute tail calls as jumps (see tailcalls module)
+        jobs      - number of processes loading XML source (see parallel_loader module)
+        """
         if source is None:
             source = sys.stdin
-        cls._getXmlTree(source)
-        cls._xmlTreeParse()
-        cls._sortInstructions()
-        cls._setLabels()
+        if store == "compact":
+            from compact import CompactProgram
+            with Timings.phase("load compact"):
+                cls.instructions = CompactProgram.load(source, sourceFormat, jobs)
+        else:
+            cls._loadObjects(source, optimize, memoize, sourceFormat, tailCalls, inline, jobs)
+        if footprint:
+            cls._reportFootprint()
+
+    @classmethod
+    def _loadObjects(cls, source, optimize, memoize, sourceFormat, tailCalls, inline, jobs):
+        """Loads program as list of instruction objects."""
+        if sourceFormat == "ippcode":
+            from ippcode_parser import IppcodeParser
+            with Timings.phase("parse source"):
+                cls.instructions = IppcodeParser.parse(source)
+        elif jobs > 1:
+            from parallel_loader import ParallelLoader
+            with Timings.phase("parallel load"):
+                cls.instructions = ParallelLoader.parse(source, jobs)
+        else:
+            with Timings.phase("parse xml"):
+                cls._getXmlTree(source)
+            with Timings.phase("build program"):
+                cls._xmlTreeParse()
+        with Timings.phase("sort"):
+            cls._sortInstructions()
+        with Timings.phase("set labels"):
+            cls._setLabels()
+        if optimize:
+            with Timings.phase("optimize"):
+                cls._optimize(optimize)
+        if inline is not None:
+            with Timings.phase("inline"):
+                cls._inline(inline)
+        with Timings.phase("prepare calls"):
+            cls._prepareCalls()
+        if memoize is not None:
+            from memo import Memoizer
+            with Timings.phase("memoize"):
+                Memoizer.install(memoize)
         cls._addTerminatingInstruction()
+        if tailCalls:
+            from tailcalls import TailCalls
+            with Timings.phase("tail calls"):
+                TailCalls.install()
+
+    @classmethod
+    def _reportFootprint(cls):
+        """Prints number of loaded instructions and their size in memory to standard error output."""
+        from compact import deepSize
+        count = len(cls.instructions) - 1
+        print("Loaded program:", count, "instructions,", deepSize(cls.instructions), "bytes", file = sys.stderr)
 
     @classmethod
     def _getXmlTree(cls, sourceFile):
@@ -178,7 +424,16 @@ class Program:
         """Parses XML tree into instructions and their arguments"""
         cls.instructions = list()
         root = cls.xmlTree.getroot()
+        cls._checkRoot(root)
 
+        for instrTag in root:
+            instrClass = cls._instructionClass(instrTag)
+            instruction = instrClass(instrTag)
+            cls.instructions.append(instruction)
+
+    @staticmethod
+    def _checkRoot(root):
+        """Checks program tag of source XML."""
         if root.tag != "program":
             exitWMsg(XML_STRUCTURE_ERR, "Missing program tag in source XML")
         
@@ -188,21 +443,19 @@ class Program:
         if language != "IPPcode22":
             exitWMsg(XML_STRUCTURE_ERR, "Unsupported language in source XML program tag")
 
-        for instrTag in root:
-            if instrTag.tag != "instruction":
-                exitWMsg(XML_STRUCTURE_ERR, "Unexpected tag in source XML:", instrTag.tag)
-
-            opcode = instrTag.attrib.get("opcode")
-            if opcode is None:
-                exitWMsg(XML_STRUCTURE_ERR, "Missing opcode attribute in source XML instruction tag")
-            try:
-                instrClass = getattr(importlib.import_module("program"), opcode.capitalize())
-            except AttributeError:
-                exitWMsg(XML_STRUCTURE_ERR, "Unsuported opcode in source XML instruction tag:", opcode)
-
-
-            instruction = instrClass(instrTag)
-            cls.instructions.append(instruction)
+    @staticmethod
+    def _instructionClass(instrTag):
+        """Returns instruction class of XML instruction tag opcode."""
+        if instrTag.tag != "instruction":
+            exitWMsg(XML_STRUCTURE_ERR, "Unexpected tag in source XML:", instrTag.tag)
+
+        opcode = instrTag.attrib.get("opcode")
+        if opcode is None:
+            exitWMsg(XML_STRUCTURE_ERR, "Missing opcode attribute in source XML instruction tag")
+        try:
+            return getattr(importlib.import_module("program"), opcode.capitalize())
+        except AttributeError:
+            exitWMsg(XML_STRUCTURE_ERR, "Unsuported opcode in source XML instruction tag:", opcode)
 
     @classmethod
     def _sortInstructions(cls):
@@ -218,40 +471,306 @@ class Program:
                 labelNT = instruction.getNT()
                 Label.updateInstrIdx(labelNT, i)
 
+    @classmethod
+    def _optimize(cls, level):
+        """Optimizes loaded instructions and reassigns labels jump indexes."""
+        from optimizer import Optimizer
+        cls.instructions = Optimizer.optimize(cls.instructions, level)
+        cls._setLabels()
+
+    @classmethod
+    def _inline(cls, size):
+        """Inlines calls of small leaf subroutines and reassigns labels jump indexes."""
+        from inliner import Inliner
+        cls.instructions = Inliner.inline(cls.instructions, size)
+        cls._setLabels()
+
+    @classmethod
+    def _prepareCalls(cls):
+        """Links call sites to their labels and presets layouts of created frames."""
+        for idx, instruction in enumerate(cls.instructions):
+            if isinstance(instruction, Call):
+                instruction.link(idx)
+            elif isinstance(instruction, Createframe):
+                instruction.shape(cls.instructions, idx)
+
     @classmethod
     def _addTerminatingInstruction(cls):
         """Adds program end marking instruction."""
         cls.instructions.append(None)
 
     @classmethod
-    def interpret(cls, source, statsConf, statFile):
-        """Interprets program instructions loaded in class."""
+    def interpret(cls, source, statsConf, statFile, limits = None, traceFile = None, traceSize = None,
+                  checkpointFile = None, checkpointEvery = None, resumeFile = None, hooks = None,
+                  statsFormat = "lines", coverageFile = None, quicken = False, debug = False,
+                  tier = None, tierLog = None, expectOutput = None, expectRc = None):
+        """Interprets program instructions loaded in class.
+
+        statsFormat     - format of STATI output file ("lines" or "json")
+        coverageFile    - file coverage of executed instructions is merged into
+        quicken         - rewrite instructions to variants specialised for observed operand types
+        tier            - number of label executions after which region starting with it
+                          is compiled to Python (0 for default), None disables tiering
+        tierLog         - file tier-up events are written into (see tiering module)
+        expectOutput    - file with expected output, execution ends at the first difference
+        expectRc        - file with expected exit code compared when program ends (see expect module)
+        debug           - execute in debugger reading commands from given file
+                          (standard input if True), see debugger module
+        hooks           - modules registering execution hooks, see hooks module
+        limits          - execution budget enforced by Governor
+        traceFile       - file with trace of last traceSize executed instructions
+        checkpointFile  - file with interpret state saved every checkpointEvery instructions
+        resumeFile      - file with saved interpret state execution continues from
+        """
         cls.readInput = ReadInput(source)
         cls.stats.addConfig(statsConf)
         cls.stats.addFile(statFile)
+        cls.stats.addFormat(statsFormat)
+        if cls.stats.isActivated():
+            cls.stats.register()
+
+        if resumeFile is not None:
+            from checkpoint import Checkpoint
+            Checkpoint.resume(resumeFile)
+
+        if quicken:
+            from quicken import Quickener
+            Quickener.install()
+
+        if tier is not None:
+            from tiering import Tiering
+            Tiering(tier, tierLog).install()
+
+        if coverageFile is not None:
+            from coverage_map import CoverageRecorder
+            CoverageRecorder(coverageFile).register()
+
+        if hooks or cls.stats.isActivated() or coverageFile is not None:
+            from hooks import Hooks
+            Hooks.loadModules(hooks or ())
+            Hooks.install()
+
+        if traceFile is not None:
+            from tracer import Tracer
+            Tracer(traceFile, traceSize).register()
+
+        if limits:
+            from governor import Governor
+            cls.periodic.append(Governor(**limits))
+
+        if checkpointFile is not None:
+            from checkpoint import Checkpoint
+            cls.periodic.append(Checkpoint(checkpointFile, checkpointEvery))
+
+        if expectOutput is not None:
+            from expect import ExpectedOutput
+            ExpectedOutput(expectOutput, expectRc).install() # the last finalizer, it may end with error
+
+        exitCode = SUCCES
+        try:
+            with Timings.phase("execute"):
+                if debug:
+                    from debugger import Debugger
+                    Debugger(None if debug is True else debug).run()
+                elif cls.periodic:
+                    cls._runPeriodic()
+                else:
+                    cls.run()
+        except SystemExit as exitErr:
+            exitCode = exitErr.code
+            raise
+        finally:
+            with Timings.phase("finalize"):
+                for finalizer in cls.finalizers:
+                    finalizer(exitCode)
+
+        with Timings.phase("output"):
+            cls.stats.printStats()
+            sys.stdout.flush()
+
+    @classmethod
+    def interpretBatch(cls, inputList, outputDir):
+        """Interprets loaded program over all input files listed in inputList file
+        (one per line) at once, see lockstep module. Output and exit code
+        of each input file are written into outputDir."""
+        from lockstep import Lockstep
+        try:
+            with open(inputList) as f:
+                inputs = [line.rstrip("\n") for line in f if line.strip()]
+        except OSError:
+            exitWMsg(INPUT_FILE_ERR, "Couldn't open batch input files list")
+
+        lockstep = Lockstep(inputs)
+        lockstep.run()
+        lockstep.writeResults(outputDir)
+
+    @classmethod
+    def _runPeriodic(cls):
+        """Executes program in slices, periodic tasks are run between them."""
+        for task in cls.periodic:
+            task.start()
+
+        executed = 0
+        while not cls.isFinished():
+            steps = None
+            for task in cls.periodic:
+                taskSteps = task.nextSlice(executed)
+                if taskSteps is not None and (steps is None or taskSteps < steps):
+                    steps = taskSteps
 
-        while cls.instructions[cls.counter.getIndex()] is not None:
-            instr = cls.instructions[cls.counter.getIndex()]
             try:
+                executed += cls.run(steps)
+            except MemoryError:
+                for task in cls.periodic:
+                    task.outOfMemory()
+                raise
+
+            for task in cls.periodic:
+                task.check(executed)
+
+    @classmethod
+    def run(cls, steps = None):
+        """Executes instructions from current one until program end,
+        or until given number of instructions is executed.
+        Returns number of executed instructions."""
+        if cls.observers or cls.blockObservers:
+            return cls._runObserved(steps)
+
+        instructions = cls.instructions
+        counter = cls.counter
+        executed = 0
+
+        try:
+            while instructions[counter.idx] is not None:
+                if executed == steps:
+                    break
+                instr = instructions[counter.idx]
                 instr.exec()
-            except IndexError:
-                exitWMsg(XML_STRUCTURE_ERR, "Missinng arg tag in source XML instruction tag")
 
-            cls.stats.countIn(instr)
+                if counter.jump:
+                    counter.jump = False
+                else:
+                    counter.next()
+                executed += 1
+        finally:
+            cls.executed += executed
+
+        return executed
+
+    @classmethod
+    def _runObserved(cls, steps):
+        """Same as run, but every executed instruction is passed to observers
+        together with its index (before the program counter moves)
+        and every executed sequence of consecutive instructions to block observers."""
+        instructions = cls.instructions
+        counter = cls.counter
+        observers = cls.observers
+        executed = 0
+        idx = None
+
+        try:
+            while instructions[counter.idx] is not None:
+                if executed == steps:
+                    break
+                idx = counter.idx
+                if cls.blockStart is None:
+                    cls.blockStart = idx
+                instr = instructions[idx]
+                instr.exec()
+
+                for observer in observers:
+                    observer(instr, idx)
+
+                if counter.jump:
+                    counter.jump = False
+                    cls.finishBlock(idx)
+                else:
+                    counter.next()
+                executed += 1
+        finally:
+            cls.executed += executed
+            cls.finishBlock(idx)
+
+        return executed
+
+    @classmethod
+    def finishBlock(cls, last):
+        """Passes the currently executed sequence of instructions ending
+        with instruction at index last to block observers."""
+        start = cls.blockStart
+        if start is not None:
+            cls.blockStart = None
+            for observer in cls.blockObservers:
+                observer(start, last)
+
+    @classmethod
+    def isFinished(cls):
+        """Returns bool whether program execution reached its end."""
+        return cls.instructions[cls.counter.getIndex()] is None
+
+    @classmethod
+    def stateDump(cls, instruction = None):
+        """Returns description of interpret state: position, frames and stacks.
+        Current instruction is given if it isn't in its slot (replaced by debugger)."""
+        returns = list()
+        for returnIdx in cls.callStack.stack:
+            while type(returnIdx) is not int: # return address with deferred work
+                returnIdx = returnIdx.returnIdx
+            returns.append(str(returnIdx))
+
+        lines = [
+            f"counter: {cls.positionDump(instruction)}",
+            f"GF: {cls._frameDump(GlobFrame._vars)}",
+            f"LF: {cls._frameDump(LocFrame._vars)} ({len(LocFrame._stack.stack)} frames on frame stack)",
+            f"TF: {cls._frameDump(TempFrame._vars)}",
+            "data stack (bottom first): " + " ".join(const.toDebugString() for const in cls.dataStack.stack),
+            "call stack (return indexes): " + " ".join(returns),
+        ]
+        return "\n".join(line.rstrip() for line in lines) + "\n"
+
+    @classmethod
+    def positionDump(cls, instruction = None):
+        """Returns description of program counter position."""
+        idx = cls.counter.getIndex()
+        if instruction is None:
+            instruction = cls.instructions[idx]
+        if instruction is None:
+            return f"index {idx}, end of program"
+        return f"index {idx}, order {instruction.order}, {_opcodeName(instruction.__class__)}"
+
+    @staticmethod
+    def _frameDump(frame):
+        """Returns description of frame variables."""
+        if frame is None:
+            return "undefined"
+        return " ".join(f"{name}={'uninitialised' if const is None else const.toDebugString()}"
+                        for name, const in frame.items())
 
-            if cls.counter.jump:
-                cls.counter.jump = False
-            else:
-                cls.counter.next()
-            
-        cls.stats.printStats()
-        
 class Instruction:
     """General IPPcode22 instruction for further inheritance."""
     orders = set()
 
+    operands = ()
+    """Kinds of instruction arguments ("var", "symb", "label" or "type")."""
+
+    _OPERAND_TYPES = {
+        "var": (Variable,),
+        "symb": (Variable, Constant),
+        "label": (LabelNT,),
+        "type": (ConstantType,),
+    }
+
+    _CONSTANT_TYPES = {"int", "bool", "string", "nil", "float"}
+
     def __init__(self, instrTag):
         """Create new instuction based on given XML instruction tag"""
+        self.order = self._parseOrder(instrTag)
+        self.args = self._parseArgTags(instrTag)
+        self._checkOperands(self.order, self.args)
+
+    @staticmethod
+    def _parseOrder(instrTag):
+        """Parses and registers order of XML instruction tag"""
         order = instrTag.attrib.get("order")
         if order is None:
             exitWMsg(XML_STRUCTURE_ERR, "Missinng order attribute in source XML instruction tag")
@@ -263,18 +782,27 @@ class Instruction:
         except ValueError:
             exitWMsg(XML_STRUCTURE_ERR, "Instruction order in input XML has unsupported value:", order)
 
+        Instruction.registerOrder(order)
+        return order
+
+    @staticmethod
+    def registerOrder(order):
+        """Registers instruction order, exits with error if it is already registered."""
         if order in Instruction.orders:
             exitWMsg(XML_STRUCTURE_ERR, "Duplicit instruction order in input XML instruction tags, value:", order)
-        
-        self.order = order
+
         Instruction.orders.add(order)
 
-        self.args = list()
+    @classmethod
+    def _parseArgTags(cls, instrTag):
+        """Parses arguments of XML instruction tag"""
+        args = list()
         index = 1
         for argTag in instrTag:
-            arg = self._parseArgTag(argTag, index)
-            self.args.append(arg)
+            arg = cls._parseArgTag(argTag, index)
+            args.append(arg)
             index += 1
+        return args
 
     @staticmethod         
     def _parseArgTag(argTag, index):
@@ -283,24 +811,65 @@ class Instruction:
             exitWMsg(XML_STRUCTURE_ERR, "Unexpected tag in source XML, value:", argTag.tag)
 
         argType = argTag.attrib.get("type")
+        text = argTag.text
         if argType == "label":
-            return LabelNT(argTag.text)
+            if not text:
+                exitWMsg(XML_STRUCTURE_ERR, "Missing label name in source XML argument tag")
+            return LabelNT(text)
         elif argType == "var":
-            return Variable(argTag.text)
+            if text is None or text[2:3] != "@" or Frame.parse(text) is None:
+                exitWMsg(XML_STRUCTURE_ERR, "Invalid variable in source XML argument tag, value:", text)
+            return Variable(text)
         elif argType == "type":
-            return ConstantType.parse(argTag.text)
-        else:
-            return Constant.parseFromStrXml(argType, argTag.text)
+            if text not in Instruction._CONSTANT_TYPES:
+                exitWMsg(XML_STRUCTURE_ERR, "Invalid type in source XML argument tag, value:", text)
+            return ConstantType.parse(text)
+        elif argType not in Instruction._CONSTANT_TYPES:
+            exitWMsg(XML_STRUCTURE_ERR, "Unsupported argument type in source XML argument tag, value:", argType)
+
+        try:
+            return Constant.parseFromStrXml(argType, text)
+        except (ValueError, TypeError):
+            exitWMsg(XML_STRUCTURE_ERR, "Invalid constant in source XML argument tag, value:", text)
+
+    @classmethod
+    def _checkOperands(cls, order, args):
+        """Exits with error if arguments don't match instruction operands (number and kinds)."""
+        if not cls._validOperands(args):
+            exitWMsg(XML_STRUCTURE_ERR, "Wrong arguments of instruction in source XML, order:", order)
+
+    @classmethod
+    def fromArgs(cls, order, args):
+        """Create new instruction with given order and arguments without XML instruction tag.
+        Used for instructions created by program transformations."""
+        instruction = cls.__new__(cls)
+        instruction.order = order
+        instruction.args = list(args)
+        return instruction
 
     def isType(self, InstructionType):
         return isinstance(self, InstructionType)
 
+    @classmethod
+    def _validOperands(cls, args):
+        """Returns bool whether arguments match operands kinds of instruction class."""
+        if len(args) != len(cls.operands):
+            return False
+
+        for arg, kind in zip(args, cls.operands):
+            if not isinstance(arg, cls._OPERAND_TYPES[kind]):
+                return False
+        return True
+
 
 # --- Classes for each instruction -----
 # Class names are equivalent to instructions opcodes
+# - operands: kinds of instruction arguments
 # - exec: method simulating instruction execution - interprets it
 
 class Move(Instruction):
+    operands = ("var", "symb")
+
     def exec(self):
         destVar = self.args[0]
         srcSymb = self.args[1]
@@ -310,24 +879,65 @@ class Move(Instruction):
         destVar.updateValue(value)
 
 class Createframe(Instruction):
+    operands = ()
+    layout = None
+    """Template of created frame with variables defined right after creation."""
+
     def exec(self):
-        TempFrame.createFrame()
+        TempFrame.createFrame(self.layout)
+
+    def shape(self, instructions, idx):
+        """Presets frame layout from DEFVAR TF@ instructions directly following this one.
+        These DEFVAR instructions are switched to already defined ones."""
+        names = list()
+        for instruction in instructions[idx + 1:]:
+            if type(instruction) is not Defvar:
+                break
+            var = instruction.args[0]
+            if var.frame is not TempFrame or var.name in names:
+                break
+            names.append(var.name)
+            instruction.__class__ = PresetDefvar
+
+        if names:
+            self.layout = dict.fromkeys(names)
 
 class Pushframe(Instruction):
+    operands = ()
+
     def exec(self):
         LocFrame.pushFrame()
 
 class Popframe(Instruction):
+    operands = ()
+
     def exec(self):
         LocFrame.popFrame()
 
 class Defvar(Instruction):
+    operands = ("var",)
+
     def exec(self):
         var = self.args[0]
         var.define()
 
+class PresetDefvar(Defvar):
+    """DEFVAR of variable already defined by layout of previous CREATEFRAME."""
+    def exec(self):
+        pass
+
 class Call(Instruction):
+    operands = ("label",)
+    target = None
+    """Jump index of called label linked at load time (None if label is undefined)."""
+    returnIdx = None
+
     def exec(self):
+        if self.target is not None:
+            Program.callStack.push(self.returnIdx)
+            Program.counter.jumpTo(self.target)
+            return
+
         labelNT = self.args[0]
 
         nextInstrIdx = Program.counter.getIndex() + 1
@@ -336,21 +946,34 @@ class Call(Instruction):
         jumpIndex = Label.getInstrIdx(labelNT)
         Program.counter.jumpTo(jumpIndex)
 
+    def link(self, idx):
+        """Links call site at given index to its called label and return index."""
+        self.returnIdx = idx + 1
+        self.target = Label._definedLabels.get(self.args[0].name)
+
 class Return(Instruction):
+    operands = ()
+
     def exec(self):        
         if Program.callStack.isEmpty():
             exitWMsg(RUN_VAL_MISSING_ERR, "'RETURN' instruction without previous 'CALL' instruction")
 
         idx = Program.callStack.pop()
+        if type(idx) is not int: # return address completing deferred work of the call
+            idx = idx.complete()
         Program.counter.jumpTo(idx)
 
 class Pushs(Instruction):
+    operands = ("symb",)
+
     def exec(self):
         symb = self.args[0]
         const = symb.getConst()
         Program.dataStack.push(const)
 
 class Pops(Instruction):
+    operands = ("var",)
+
     def exec(self):
         destVar = self.args[0]
 
@@ -361,6 +984,8 @@ class Pops(Instruction):
         destVar.updateValue(const)
 
 class Add(Instruction):
+    operands = ("var", "symb", "symb")
+
     def exec(self):
         destVar = self.args[0]
         const1 = self.args[1].getConst()
@@ -371,6 +996,8 @@ class Add(Instruction):
         destVar.updateValue(Constant(ConType, result))
 
 class Sub(Instruction):
+    operands = ("var", "symb", "symb")
+
     def exec(self):
         destVar = self.args[0]
         const1 = self.args[1].getConst()
@@ -381,6 +1008,8 @@ class Sub(Instruction):
         destVar.updateValue(Constant(ConType, result))
 
 class Mul(Instruction):
+    operands = ("var", "symb", "symb")
+
     def exec(self):
         destVar = self.args[0]
         const1 = self.args[1].getConst()
@@ -391,6 +1020,8 @@ class Mul(Instruction):
         destVar.updateValue(Constant(ConType, result))
 
 class Idiv(Instruction):
+    operands = ("var", "symb", "symb")
+
     def exec(self):
         destVar = self.args[0]
         const1 = self.args[1].getConst()
@@ -404,6 +1035,8 @@ class Idiv(Instruction):
         destVar.updateValue(Constant(ConstantType.INT, result))
 
 class Div(Instruction):
+    operands = ("var", "symb", "symb")
+
     def exec(self):
         destVar = self.args[0]
         const1 = self.args[1].getConst()
@@ -417,6 +1050,8 @@ class Div(Instruction):
         destVar.updateValue(Constant(ConstantType.FLOAT, result))
 
 class Lt(Instruction):
+    operands = ("var", "symb", "symb")
+
     def exec(self):
         destVar = self.args[0]
         const1 = self.args[1].getConst()
@@ -430,6 +1065,8 @@ class Lt(Instruction):
         destVar.updateValue(Constant(ConstantType.BOOL, result))
 
 class Gt(Instruction):
+    operands = ("var", "symb", "symb")
+
     def exec(self):
         destVar = self.args[0]
         const1 = self.args[1].getConst()
@@ -443,6 +1080,8 @@ class Gt(Instruction):
         destVar.updateValue(Constant(ConstantType.BOOL, result))
 
 class Eq(Instruction):
+    operands = ("var", "symb", "symb")
+
     def exec(self):
         destVar = self.args[0]
         const1 = self.args[1].getConst()
@@ -459,6 +1098,8 @@ class Eq(Instruction):
         destVar.updateValue(Constant(ConstantType.BOOL, result))
 
 class And(Instruction):
+    operands = ("var", "symb", "symb")
+
     def exec(self):
         destVar = self.args[0]
         const1 = self.args[1].getConst()
@@ -469,6 +1110,8 @@ class And(Instruction):
         destVar.updateValue(Constant(ConstantType.BOOL, result))
 
 class Or(Instruction):
+    operands = ("var", "symb", "symb")
+
     def exec(self):
         destVar = self.args[0]
         const1 = self.args[1].getConst()
@@ -479,6 +1122,8 @@ class Or(Instruction):
         destVar.updateValue(Constant(ConstantType.BOOL, result))
 
 class Not(Instruction):
+    operands = ("var", "symb")
+
     def exec(self):
         destVar = self.args[0]
         const1 = self.args[1].getConst()
@@ -489,6 +1134,8 @@ class Not(Instruction):
         destVar.updateValue(Constant(ConstantType.BOOL, result))
 
 class Int2char(Instruction):
+    operands = ("var", "symb")
+
     def exec(self):
         destVar = self.args[0]
         const1 = self.args[1].getConst()
@@ -503,6 +1150,8 @@ class Int2char(Instruction):
         destVar.updateValue(Constant(ConstantType.STRING, result))
 
 class Stri2int(Instruction):
+    operands = ("var", "symb", "symb")
+
     def exec(self):
         destVar = self.args[0]
         string = self.args[1].getConst()
@@ -518,6 +1167,8 @@ class Stri2int(Instruction):
         destVar.updateValue(Constant(ConstantType.INT, result))
 
 class Int2float(Instruction):
+    operands = ("var", "symb")
+
     def exec(self):
         destVar = self.args[0]
         const = self.args[1].getConst()
@@ -529,6 +1180,8 @@ class Int2float(Instruction):
         destVar.updateValue(Constant(ConstantType.FLOAT, result))
 
 class Float2int(Instruction):
+    operands = ("var", "symb")
+
     def exec(self):
         destVar = self.args[0]
         const = self.args[1].getConst()
@@ -540,6 +1193,8 @@ class Float2int(Instruction):
         destVar.updateValue(Constant(ConstantType.INT, result))
 
 class Read(Instruction):
+    operands = ("var", "type")
+
     def exec(self):
         destVar = self.args[0]
         constType = self.args[1]
@@ -551,6 +1206,8 @@ class Read(Instruction):
         destVar.updateValue(constant)
 
 class Write(Instruction):
+    operands = ("symb",)
+
     def exec(self):
         symb = self.args[0]
         const = symb.getConst()
@@ -560,6 +1217,8 @@ class Write(Instruction):
         print(valueString, end='')
 
 class Concat(Instruction):
+    operands = ("var", "symb", "symb")
+
     def exec(self):
         destVar = self.args[0]
         str1 = self.args[1].getConst()
@@ -571,6 +1230,8 @@ class Concat(Instruction):
         destVar.updateValue(Constant(ConstantType.STRING, result))
 
 class Strlen(Instruction):
+    operands = ("var", "symb")
+
     def exec(self):
         destVar = self.args[0]
         str1 = self.args[1].getConst()
@@ -582,6 +1243,8 @@ class Strlen(Instruction):
         destVar.updateValue(Constant(ConstantType.INT, result))
 
 class Getchar(Instruction):
+    operands = ("var", "symb", "symb")
+
     def exec(self):
         destVar = self.args[0]
         string = self.args[1].getConst()
@@ -597,6 +1260,8 @@ class Getchar(Instruction):
         destVar.updateValue(Constant(ConstantType.STRING, result))
 
 class Setchar(Instruction):
+    operands = ("var", "symb", "symb")
+
     def exec(self):
         destVar = self.args[0]
         destString = destVar.getConst()
@@ -619,6 +1284,8 @@ class Setchar(Instruction):
         destVar.updateValue(Constant(ConstantType.STRING, result))
 
 class Type(Instruction):
+    operands = ("var", "symb")
+
     def exec(self):
         destVar = self.args[0]
         symbTypeStr = self.args[1].getTypeString()
@@ -627,16 +1294,21 @@ class Type(Instruction):
 
 class Label(Instruction):
     """Label instruction class containing labels jump indexes."""
+    operands = ("label",)
     _definedLabels = dict()
 
     def __init__(self, instrTag):
         """"""
         super().__init__(instrTag)
-        labelName = self.args[0].name
-        if  labelName in Label._definedLabels:
+        Label.declare(self.args[0].name)
+
+    @classmethod
+    def declare(cls, labelName):
+        """Declares label with given name, its jump index is set later."""
+        if  labelName in cls._definedLabels:
             exitWMsg(RUN_SEMANTIC_ERR, "Label redefinition, name:", labelName)
 
-        Label._definedLabels[labelName] = None
+        cls._definedLabels[labelName] = None
 
     def exec(self):
         pass
@@ -660,6 +1332,8 @@ class Label(Instruction):
         cls._definedLabels[labelNT.name] = index
     
 class Jump(Instruction):
+    operands = ("label",)
+
     def exec(self):
         labelName = self.args[0]
 
@@ -668,6 +1342,8 @@ class Jump(Instruction):
 
 
 class Jumpifeq(Instruction):
+    operands = ("label", "symb", "symb")
+
     def exec(self):
         labelName = self.args[0]
         const1 = self.args[1].getConst()
@@ -688,6 +1364,8 @@ class Jumpifeq(Instruction):
 
 
 class Jumpifneq(Instruction):
+    operands = ("label", "symb", "symb")
+
     def exec(self):
         labelName = self.args[0]
         const1 = self.args[1].getConst()
@@ -707,6 +1385,8 @@ class Jumpifneq(Instruction):
 
 
 class Exit(Instruction):
+    operands = ("symb",)
+
     def exec(self):
         symbol = self.args[0]
 
@@ -716,7 +1396,8 @@ class Exit(Instruction):
         if not self._isValid(exitCode):
             exitWMsg(RUN_VAL_WORNG_ERR, "EXIT: Wrong exit code value (valid: 0 - 49)")
         
-        Program.stats.insts += 1
+        Program.finishBlock(Program.counter.idx) # statistics are printed before the run ends
+        Program.stats.countExit(self)
         Program.stats.printStats()
         exit(exitCode.value)
 
@@ -726,9 +1407,15 @@ class Exit(Instruction):
         return (exitCode.value >= 0 and exitCode.value <= 49)
 
 class Dprint(Instruction):
+    operands = ("symb",)
+
     def exec(self):
-        pass
+        symb = self.args[0]
+        const = symb.getConst()
+        print(const.toString(), end = "", file = sys.stderr)
 
 class Break(Instruction):
+    operands = ()
+
     def exec(self):
-        pass
\ No newline at end of file
+        print("BREAK", Program.stateDump(), sep = "\n", end = "", file = sys.stderr)
\ No newline at end of file
@@ -0,0 +1,148 @@
+"""
+Module containing runtime quickening of instructions.
+
+Arithmetic, relational, CONCAT and conditional jump instructions start
+as quickening variants of their classes, which execute generically and watch
+types of their operands. Instruction which saw the same operand type
+WARMUP times in a row rewrites itself (switches its class) to variant
+specialised for the type: operands are read by prepared getters, the type
+check is reduced to a guard and the jump index is resolved once. When the guard
+fails, instruction is deoptimised to its generic class for good and executed
+generically, so errors and results are always the same as without quickening.
+
+Specialised classes have the same names as their generic classes, so they are
+reported as the original opcodes. Instructions switched to other classes
+by hooks are not rewritten. Numbers of rewrites and deoptimisations are counted
+into STATI (--quickened, --deopts).
+
+Author: Vilém Gottwald (xgottw07)
+Project: IPP 2022 - IPPcode2022 interpret
+"""
+
+import operator
+
+from program import *
+
+
+class Quickener:
+    """Installs quickening variants of instructions and creates their specialisations."""
+
+    WARMUP = 2
+    """Number of executions with the same operand type before instruction is rewritten."""
+
+    _OPERATIONS = {
+        Add: (operator.add, (ConstantType.INT, ConstantType.FLOAT), None),
+        Sub: (operator.sub, (ConstantType.INT, ConstantType.FLOAT), None),
+        Mul: (operator.mul, (ConstantType.INT, ConstantType.FLOAT), None),
+        Lt: (operator.lt, (ConstantType.INT, ConstantType.FLOAT, ConstantType.STRING, ConstantType.BOOL),
+             ConstantType.BOOL),
+        Gt: (operator.gt, (ConstantType.INT, ConstantType.FLOAT, ConstantType.STRING, ConstantType.BOOL),
+             ConstantType.BOOL),
+        Eq: (operator.eq, (ConstantType.INT, ConstantType.FLOAT, ConstantType.STRING, ConstantType.BOOL),
+             ConstantType.BOOL),
+        Concat: (operator.add, (ConstantType.STRING,), None),
+        Jumpifeq: (operator.eq, (ConstantType.INT, ConstantType.FLOAT, ConstantType.STRING, ConstantType.BOOL),
+                   None),
+        Jumpifneq: (operator.ne, (ConstantType.INT, ConstantType.FLOAT, ConstantType.STRING, ConstantType.BOOL),
+                    None),
+    }
+    """Operation, specialisable operand types and result type (None for operand type)
+    of each quickened instruction class."""
+
+    _quickening = dict()
+    _specialised = dict()
+
+    @classmethod
+    def install(cls):
+        """Switches quickened instructions of loaded program to their quickening variants."""
+        for instruction in Program.instructions:
+            if type(instruction) in cls._OPERATIONS:
+                instruction.__class__ = cls.quickeningClass(type(instruction))
+                instruction.seenType = None
+                instruction.seenCount = 0
+
+    @classmethod
+    def quickeningClass(cls, generic):
+        """Returns quickening variant of generic instruction class."""
+        quickening = cls._quickening.get(generic)
+        if quickening is None:
+            _, types, _ = cls._OPERATIONS[generic]
+
+            def exec(self):
+                const1 = self.args[1].getConst()
+                const2 = self.args[2].getConst()
+                generic.exec(self)
+                if type(self) is not quickening:
+                    return # switched by hooks or by exec itself
+                if const1.type is const2.type and const1.type in types:
+                    if const1.type is self.seenType:
+                        self.seenCount += 1
+                    else:
+                        self.seenType = const1.type
+                        self.seenCount = 1
+                    if self.seenCount >= cls.WARMUP:
+                        cls.specialise(self, generic, const1.type)
+                else:
+                    self.seenType = None
+
+            quickening = type(generic.__name__, (generic,), {"exec": exec, "generic": generic})
+            cls._quickening[generic] = quickening
+        return quickening
+
+    @classmethod
+    def specialise(cls, instruction, generic, operandType):
+        """Rewrites instruction into its variant specialised for operand type."""
+        instruction.__class__ = cls.specialisedClass(generic, operandType)
+        instruction.operand1 = cls._getter(instruction.args[1])
+        instruction.operand2 = cls._getter(instruction.args[2])
+        if issubclass(generic, (Jumpifeq, Jumpifneq)):
+            instruction.jumpIndex = Label.getInstrIdx(instruction.args[0])
+        Program.stats.quickened += 1
+
+    @staticmethod
+    def _getter(symb):
+        """Returns function returning constant of operand."""
+        if isinstance(symb, Variable):
+            return symb.getValue
+        return lambda: symb
+
+    @staticmethod
+    def deoptimise(instruction):
+        """Returns instruction to its generic class after failed guard."""
+        instruction.__class__ = instruction.generic
+        Program.stats.deopts += 1
+
+    @classmethod
+    def specialisedClass(cls, generic, operandType):
+        """Returns variant of generic instruction class specialised for operand type."""
+        key = (generic, operandType)
+        specialised = cls._specialised.get(key)
+        if specialised is not None:
+            return specialised
+
+        operation, _, resultType = cls._OPERATIONS[generic]
+        resultType = resultType or operandType
+        deoptimise = cls.deoptimise
+
+        if issubclass(generic, (Jumpifeq, Jumpifneq)):
+            def exec(self):
+                const1 = self.operand1()
+                const2 = self.operand2()
+                if const1.type is not operandType or const2.type is not operandType:
+                    deoptimise(self)
+                    generic.exec(self)
+                elif operation(const1.value, const2.value):
+                    Program.counter.jumpTo(self.jumpIndex)
+        else:
+            def exec(self):
+                const1 = self.operand1()
+                const2 = self.operand2()
+                if const1.type is not operandType or const2.type is not operandType:
+                    deoptimise(self)
+                    generic.exec(self)
+                else:
+                    self.args[0].updateValue(Constant(resultType, operation(const1.value, const2.value)))
+
+        specialised = type(generic.__name__, (generic,), {"exec": exec, "generic": generic})
+        cls._specialised[key] = specialised
+        return specialised
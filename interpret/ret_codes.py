@@ -5,7 +5,7 @@ Author: Vilém Gottwald (xgottw07)
 Project: IPP 2022 - IPPcode2022 interpret
 """
 
-from sys import stderr
+import sys
 
 # -- general -- 
 SUCCES = 0
@@ -22,6 +22,16 @@ INTERNAL_ERR = 99
 """Internal error (e.g. memmory error)"""
 
 # -- interpret specific -- 
+# source code (--source-format=ippcode)
+SOURCE_HEADER_ERR = 21
+"""Missing or wrong header in IPPcode22 source code"""
+
+SOURCE_OPCODE_ERR = 22
+"""Unknown or wrong opcode in IPPcode22 source code"""
+
+SOURCE_SYNTAX_ERR = 23
+"""Other lexical or syntax error in IPPcode22 source code"""
+
 # input xml
 XML_FORMAT_ERR = 31
 """Input XML isn't well formed"""
@@ -51,7 +61,14 @@ RUN_VAL_WORNG_ERR = 57
 RUN_STR_ERR = 58 
 """Invalid string operation"""
 
+RUN_LIMIT_ERR = 59
+"""Execution budget exceeded (instruction count, time or memory limit)"""
+
+# testing (--expect-output)
+OUTPUT_MISMATCH_ERR = 60
+"""Output or exit code of program differs from expected one"""
+
 def exitWMsg(exitCode, *message):
         """Print message to stderr and exit program with given code."""
-        print("ERROR -", *message, file = stderr)
+        print("ERROR -", *message, file = sys.stderr)
         exit(exitCode)
\ No newline at end of file
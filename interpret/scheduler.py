@@ -0,0 +1,351 @@
+"""
+Module containing cooperative scheduler running many interpret instances in one thread.
+
+Interpret state lives in class attributes of Program and frame classes, so only
+one instance can be executed at a time. Scheduler switches the state of the
+instance it runs in and out of these attributes and executes the instance for
+a slice of instructions. Instance also gives up its slice when READ has to wait
+for input that did not arrive yet, and is scheduled again once input comes.
+
+Scheduling policies:
+    fair     - round robin over ready instances, instance gets slice
+               of quantum * priority instructions
+    priority - ready instance with the highest priority always runs first
+               (round robin among equal priorities), slice of quantum instructions
+
+Author: Vilém Gottwald (xgottw07)
+Project: IPP 2022 - IPPcode2022 interpret
+"""
+
+import asyncio
+import heapq
+import io
+import os
+import stat
+from collections import deque
+from contextlib import redirect_stdout, redirect_stderr
+from itertools import count
+
+from program import *
+
+UNHANDLED_ERR = 1
+"""Exit code of instance ended by unhandled exception (the code Python exits with)."""
+
+
+class InputPending(Exception):
+    """READ of input line that did not arrive yet."""
+
+
+class ScheduledInput(ReadInput):
+    """Input for READ instructions of scheduled instance, filled while the instance runs.
+
+    Missing line ends the slice of the instance (InputPending), READ is then
+    executed again when the line arrives or the input is closed.
+    """
+    def __init__(self):
+        self.position = 0
+        self.lines = deque()
+        self.closed = False
+        self._partial = ""
+        self._onData = None
+
+    def getLine(self):
+        """Get next input line, raises InputPending if it has not arrived yet."""
+        if self.lines:
+            string = self.lines.popleft()
+        elif self.closed:
+            string = ""
+        else:
+            raise InputPending()
+
+        self.position += 1
+        return string
+
+    def feed(self, text):
+        """Adds text to the input, only complete lines are available to READ."""
+        lines = (self._partial + text).split("\n")
+        self._partial = lines.pop()
+        if lines:
+            self.lines.extend(line + "\n" for line in lines)
+            self._notify()
+
+    def close(self):
+        """Ends the input, READ of further lines gets empty line."""
+        if self._partial:
+            self.lines.append(self._partial)
+            self._partial = ""
+        self.closed = True
+        self._notify()
+
+    def isReady(self):
+        """Returns bool whether READ can continue without waiting."""
+        return bool(self.lines) or self.closed
+
+    def onData(self, callback):
+        """Calls callback (once) when input becomes ready."""
+        self._onData = callback
+        if self.isReady():
+            self._notify()
+
+    def _notify(self):
+        callback, self._onData = self._onData, None
+        if callback is not None:
+            callback()
+
+
+class _PipeProtocol(asyncio.Protocol):
+    """Feeds data read from pipe into scheduled input."""
+    def __init__(self, input):
+        self.input = input
+
+    def data_received(self, data):
+        self.input.feed(data.decode(errors = "replace"))
+
+    def eof_received(self):
+        self.input.close()
+
+    def connection_lost(self, exc):
+        self.input.close()
+
+
+class Instance:
+    """Independent interpret instance with its loaded program and captured state."""
+    def __init__(self, source, input = None, priority = 1, name = None, **loadOptions):
+        """Loads program from source XML file for interpretation with given input file.
+
+        input    - input file for READ instructions (regular file or pipe),
+                   None for input fed by feed/close
+        priority - priority (weight) of instance in scheduling
+        """
+        self.name = name
+        self.priority = priority
+        self.inputFile = input
+        self.input = ScheduledInput()
+        self.output = io.StringIO()
+        self.errors = io.StringIO()
+        self.exitCode = None
+        self.executed = 0
+
+        self.instructions = [None]
+        self.labels = dict()
+        self.state = {
+            "counter": 0,
+            "globFrame": dict(),
+            "locFrames": list(),
+            "tempFrame": None,
+            "callStack": list(),
+            "dataStack": list(),
+        }
+        self._load(source, loadOptions)
+
+    def _load(self, source, loadOptions):
+        """Loads program, loading error ends the instance with its exit code."""
+        Instruction.orders = set()
+        Label._definedLabels = dict()
+        with redirect_stdout(self.output), redirect_stderr(self.errors):
+            try:
+                Program.load(source, **loadOptions)
+            except SystemExit as exitErr:
+                self.exitCode = exitErr.code
+                return
+        self.instructions = Program.instructions
+        self.labels = Label._definedLabels
+
+    def feed(self, text):
+        """Adds text to the instance input."""
+        self.input.feed(text)
+
+    def close(self):
+        """Ends the instance input."""
+        self.input.close()
+
+    def isFinished(self):
+        """Returns bool whether the instance ended."""
+        return self.exitCode is not None
+
+    async def openInput(self):
+        """Starts reading of input file, pipes are read asynchronously as data arrive."""
+        if self.inputFile is None or self.isFinished():
+            return
+        try:
+            if not stat.S_ISFIFO(os.stat(self.inputFile).st_mode):
+                with open(self.inputFile) as f:
+                    self.input.feed(f.read())
+                self.input.close()
+                return
+
+            loop = asyncio.get_running_loop()
+            pipe = await loop.run_in_executor(None, open, self.inputFile, "rb", 0)
+            await loop.connect_read_pipe(lambda: _PipeProtocol(self.input), pipe)
+        except OSError:
+            self.errors.write("ERROR - Couldn't open input file for READ instructions\n")
+            self.exitCode = INPUT_FILE_ERR
+
+    def runSlice(self, steps):
+        """Executes at most given number of instructions of the instance.
+        Returns False if the instance has to wait for input."""
+        self._enter()
+        waiting = False
+        with redirect_stdout(self.output), redirect_stderr(self.errors):
+            try:
+                self.executed += Program.run(steps)
+                if Program.isFinished():
+                    self.exitCode = SUCCES
+            except InputPending:
+                waiting = True
+            except SystemExit as exitErr:
+                self.exitCode = exitErr.code
+            except Exception:
+                self.exitCode = UNHANDLED_ERR
+        self._leave()
+        return not waiting
+
+    def _enter(self):
+        """Switches interpret state to this instance."""
+        state = self.state
+        Program.instructions = self.instructions
+        Label._definedLabels = self.labels
+        Program.counter.idx = state["counter"]
+        Program.counter.jump = False
+        Program.callStack.stack = state["callStack"]
+        Program.dataStack.stack = state["dataStack"]
+        Program.readInput = self.input
+
+        GlobFrame._vars = state["globFrame"]
+        LocFrame._stack.stack = state["locFrames"]
+        LocFrame._vars = None if LocFrame._stack.isEmpty() else LocFrame._stack.top()
+        TempFrame._vars = state["tempFrame"]
+        Frame.newGeneration()
+
+    def _leave(self):
+        """Saves interpret state of this instance."""
+        self.state = {
+            "counter": Program.counter.getIndex(),
+            "globFrame": GlobFrame._vars,
+            "locFrames": LocFrame._stack.stack,
+            "tempFrame": TempFrame._vars,
+            "callStack": Program.callStack.stack,
+            "dataStack": Program.dataStack.stack,
+        }
+
+
+class Scheduler:
+    """Cooperative scheduler of interpret instances on asyncio event loop."""
+
+    DEFAULT_QUANTUM = 1000
+    POLICIES = ("fair", "priority")
+
+    def __init__(self, quantum = None, policy = "fair"):
+        """Creates scheduler giving instances slices of quantum instructions."""
+        self.quantum = quantum or self.DEFAULT_QUANTUM
+        self.policy = policy
+        self.instances = list()
+        self._ready = list() if policy == "priority" else deque()
+        self._order = count()
+        self._wakeup = None
+        self._waiting = 0
+
+    def add(self, instance):
+        """Adds instance to be run by scheduler."""
+        self.instances.append(instance)
+        return instance
+
+    def run(self):
+        """Runs all instances until they end."""
+        asyncio.run(self.runAsync())
+
+    async def runAsync(self):
+        """Runs all instances until they end, inside of running event loop."""
+        self._wakeup = asyncio.Event()
+        await asyncio.gather(*(instance.openInput() for instance in self.instances))
+        for instance in self.instances:
+            if not instance.isFinished():
+                self._push(instance)
+
+        while self._ready or self._waiting:
+            if not self._ready:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+
+            instance = self._pop()
+            steps = self.quantum
+            if self.policy == "fair":
+                steps *= instance.priority
+
+            if not instance.runSlice(steps):
+                self._wait(instance)
+            elif not instance.isFinished():
+                self._push(instance)
+            await asyncio.sleep(0) # lets input arrive
+
+    def _push(self, instance):
+        """Adds instance into ready queue."""
+        if self.policy == "priority":
+            heapq.heappush(self._ready, (-instance.priority, next(self._order), instance))
+        else:
+            self._ready.append(instance)
+
+    def _pop(self):
+        """Removes next instance to be run from ready queue."""
+        if self.policy == "priority":
+            return heapq.heappop(self._ready)[2]
+        return self._ready.popleft()
+
+    def _wait(self, instance):
+        """Parks instance until its input is ready."""
+        self._waiting += 1
+
+        def ready():
+            self._waiting -= 1
+            self._push(instance)
+            self._wakeup.set()
+
+        instance.input.onData(ready)
+
+    @classmethod
+    def interpretJobs(cls, jobsFile, outputDir, quantum = None, policy = "fair", **loadOptions):
+        """Runs jobs listed in jobsFile, line "source [input [priority]]" per job
+        ("-" as input for no input). Output (NAME.out), error output (NAME.err)
+        and exit code (NAME.rc) of each job are written into outputDir."""
+        scheduler = cls(quantum, policy)
+        try:
+            with open(jobsFile) as f:
+                jobs = [line.split() for line in f if line.strip()]
+        except OSError:
+            exitWMsg(INPUT_FILE_ERR, "Couldn't open scheduled jobs file")
+
+        for number, job in enumerate(jobs, 1):
+            if len(job) > 3:
+                exitWMsg(INPUT_FILE_ERR, "Invalid job on line", number, "of scheduled jobs file")
+            source = job[0]
+            input = job[1] if len(job) > 1 and job[1] != "-" else None
+            try:
+                priority = int(job[2]) if len(job) > 2 else 1
+                if priority <= 0:
+                    raise ValueError
+            except ValueError:
+                exitWMsg(INPUT_FILE_ERR, "Invalid job priority on line", number, "of scheduled jobs file")
+
+            name = f"{number}_{os.path.splitext(os.path.basename(source))[0]}"
+            instance = scheduler.add(Instance(source, input, priority, name, **loadOptions))
+            if input is None:
+                instance.close()
+
+        scheduler.run()
+        scheduler.writeResults(outputDir)
+
+    def writeResults(self, outputDir):
+        """Writes output, error output and exit code of each instance into directory."""
+        try:
+            os.makedirs(outputDir, exist_ok = True)
+            for instance in self.instances:
+                name = os.path.join(outputDir, instance.name)
+                with open(name + ".out", "w") as f:
+                    f.write(instance.output.getvalue())
+                with open(name + ".err", "w") as f:
+                    f.write(instance.errors.getvalue())
+                with open(name + ".rc", "w") as f:
+                    f.write(str(instance.exitCode))
+        except OSError:
+            exitWMsg(OUTPUT_FILE_ERR, "Could not write scheduled jobs results into directory:", outputDir)
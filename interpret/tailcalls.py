@@ -0,0 +1,88 @@
+"""
+Module containing tail calls elimination.
+
+CALL directly followed by RETURN (labels between them are skipped) is a tail
+call: the called subroutine can return straight to the return address of the
+calling one, so the call is executed as a jump and the call stack doesn't grow.
+CALL followed by POPFRAME and RETURN is a tail call too, but the POPFRAME
+still has to be executed when the called subroutine returns. The call is
+executed as a jump as well and the return address of the calling subroutine
+is replaced by a return address remembering the number of pending POPFRAMEs,
+which are executed by the RETURN of the called subroutine. Frames popped
+by them stay on the frame stack until then, so only the call stack is bounded.
+
+Skipped RETURN and POPFRAME instructions are not executed, STATI insts then
+counts only executed instructions.
+
+Author: Vilém Gottwald (xgottw07)
+Project: IPP 2022 - IPPcode2022 interpret
+"""
+
+from program import *
+
+
+class TailCalls:
+    """Detects tail calls of loaded program."""
+
+    @classmethod
+    def install(cls):
+        """Switches tail calls in loaded program to their jump variants."""
+        instructions = Program.instructions
+        for idx, instruction in enumerate(instructions):
+            if type(instruction) is not Call or instruction.target is None:
+                continue
+            following = cls._following(instructions, idx + 1)
+            if isinstance(instructions[following], Return):
+                instruction.__class__ = TailCall
+            elif isinstance(instructions[following], Popframe) \
+                    and isinstance(instructions[cls._following(instructions, following + 1)], Return):
+                instruction.__class__ = PoppingTailCall
+
+    @staticmethod
+    def _following(instructions, idx):
+        """Returns index of first instruction other than label starting at index
+        (terminating None at the end of program)."""
+        while isinstance(instructions[idx], Label):
+            idx += 1
+        return idx
+
+
+class TailCall(Call):
+    """CALL followed by RETURN, called subroutine returns instead of the caller."""
+
+    def exec(self):
+        Program.counter.jumpTo(self.target)
+
+
+class PoppingTailCall(Call):
+    """CALL followed by POPFRAME and RETURN, POPFRAME is left to the return of called subroutine."""
+
+    def exec(self):
+        stack = Program.callStack.stack
+        if not stack:
+            super().exec() # RETURN of the caller ends with error after POPFRAME
+            return
+
+        returnIdx = stack[-1]
+        if type(returnIdx) is PendingPops:
+            returnIdx.pops += 1
+        else:
+            stack[-1] = PendingPops(returnIdx)
+        Program.counter.jumpTo(self.target)
+
+
+class PendingPops:
+    """Return address of subroutine with POPFRAMEs left by its tail calls."""
+
+    def __init__(self, returnIdx):
+        self.returnIdx = returnIdx
+        self.pops = 1
+
+    def complete(self):
+        """Executes pending POPFRAMEs and returns return index."""
+        for _ in range(self.pops):
+            LocFrame.popFrame()
+        returnIdx = self.returnIdx
+        if type(returnIdx) is not int: # return address of memoized call
+            returnIdx = returnIdx.complete()
+        return returnIdx
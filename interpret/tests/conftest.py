@@ -0,0 +1,51 @@
+"""
+Shared fixtures of interpret tests, programs are interpreted by interpret.py
+in separate process.
+
+Author: Vilém Gottwald (xgottw07)
+Project: IPP 2022 - IPPcode2022 interpret
+"""
+
+import os
+import subprocess
+import sys
+
+import pytest
+
+INTERPRET_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, INTERPRET_DIR)
+
+
+@pytest.fixture
+def run(tmp_path):
+    """Returns function interpreting program with given options in tmp_path. Program
+    is XML representation or IPPcode22 source code (loaded by --source-format=ippcode).
+    Function returns completed process with text standard and error output."""
+    def run(program, *options, input = ""):
+        options = list(options)
+        if not program.startswith("<?xml"):
+            options.append("--source-format=ippcode")
+        sourceFile = tmp_path / "program.src"
+        sourceFile.write_text(program)
+        inputFile = tmp_path / "program.in"
+        inputFile.write_text(input)
+        return subprocess.run([sys.executable, os.path.join(INTERPRET_DIR, "interpret.py"),
+                               f"--source={sourceFile}", f"--input={inputFile}", *options],
+                              capture_output = True, text = True, cwd = tmp_path)
+    return run
+
+
+@pytest.fixture
+def xml():
+    """Returns function creating XML representation of program from instructions
+    given as tuples (order, opcode, (type, value) of each argument)."""
+    def xml(*instructions):
+        lines = ['<?xml version="1.0" encoding="UTF-8"?>', '<program language="IPPcode22">']
+        for order, opcode, *args in instructions:
+            lines.append(f'  <instruction order="{order}" opcode="{opcode}">')
+            for i, (argType, value) in enumerate(args, 1):
+                lines.append(f'    <arg{i} type="{argType}">{value}</arg{i}>')
+            lines.append('  </instruction>')
+        lines.append('</program>')
+        return "\n".join(lines) + "\n"
+    return xml
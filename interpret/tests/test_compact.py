@@ -0,0 +1,23 @@
+"""
+Tests of compact store of loaded program (--store=compact).
+
+Author: Vilém Gottwald (xgottw07)
+Project: IPP 2022 - IPPcode2022 interpret
+"""
+
+import pytest
+
+
+@pytest.mark.parametrize("options", [(), ("--load-jobs=3",)])
+def test_large_orders_are_loaded(run, xml, options):
+    instructions = [(2 ** 70, "WRITE", ("var", "GF@x")),
+                    (2 ** 63, "MOVE", ("var", "GF@x"), ("int", "7")),
+                    (1, "DEFVAR", ("var", "GF@x"))]
+    # source larger than 1 MiB is loaded by parallel loader with --load-jobs
+    instructions += [(order, "LABEL", ("label", f"l{order}")) for order in range(2, 20000)]
+    program = xml(*instructions)
+
+    for store in ("--store=objects", "--store=compact"):
+        result = run(program, store, *options)
+        assert result.returncode == 0, result.stderr
+        assert result.stdout == "7"
@@ -0,0 +1,38 @@
+"""
+Tests of coverage bitmaps (--coverage).
+
+Author: Vilém Gottwald (xgottw07)
+Project: IPP 2022 - IPPcode2022 interpret
+"""
+
+from coverage_map import CoverageMap
+
+
+def test_large_orders_are_recorded(run, xml, tmp_path):
+    program = xml((1, "DEFVAR", ("var", "GF@x")),
+                  (5000000000, "MOVE", ("var", "GF@x"), ("int", "1")),
+                  (5000000001, "JUMPIFEQ", ("label", "end"), ("var", "GF@x"), ("int", "1")),
+                  (5000000002, "WRITE", ("var", "GF@x")),
+                  (2 ** 70, "LABEL", ("label", "end")))
+
+    for _ in range(2): # the second run is merged into existing coverage file
+        result = run(program, "--coverage=coverage.bin")
+        assert result.returncode == 0, result.stderr
+
+    coverage = CoverageMap.read(str(tmp_path / "coverage.bin"))
+    assert coverage.runs == 2
+    assert coverage.orders == [1, 5000000000, 5000000001, 5000000002, 2 ** 64 - 1]
+    executed = [coverage.isSet(coverage.executed, idx) for idx in range(5)]
+    assert executed == [True, True, True, False, True]
+    assert coverage.isSet(coverage.taken, 2) and not coverage.isSet(coverage.notTaken, 2)
+
+
+def test_coverage_rejects_options_changing_instructions(run, tmp_path):
+    program = ".IPPcode22\nWRITE int@1\n"
+    for option in ("--optimize=1", "--optimize=2", "--inline"):
+        result = run(program, "--coverage=coverage.bin", option)
+        assert result.returncode == 10, option
+    assert not (tmp_path / "coverage.bin").exists()
+
+    result = run(program, "--coverage=coverage.bin", "--optimize=0")
+    assert result.returncode == 0, result.stderr
@@ -0,0 +1,24 @@
+"""
+Tests of execution hooks modules (--hooks).
+
+Author: Vilém Gottwald (xgottw07)
+Project: IPP 2022 - IPPcode2022 interpret
+"""
+
+import pytest
+
+PROGRAM = ".IPPcode22\nWRITE int@1\n"
+
+
+@pytest.mark.parametrize("modules", ["", "a,,b", "a,"])
+def test_empty_module_name_is_parameter_error(run, modules):
+    result = run(PROGRAM, f"--hooks={modules}")
+    assert result.returncode == 10
+    assert "Traceback" not in result.stderr
+
+
+@pytest.mark.parametrize("modules", [".x", "x.", "missing_hooks_module", "missing_hooks.py"])
+def test_module_which_can_not_be_loaded_is_input_error(run, modules):
+    result = run(PROGRAM, f"--hooks={modules}")
+    assert result.returncode == 11
+    assert "Couldn't load hooks module" in result.stderr
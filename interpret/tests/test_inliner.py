@@ -0,0 +1,38 @@
+"""
+Tests of inlining of small leaf subroutines (--inline).
+
+Author: Vilém Gottwald (xgottw07)
+Project: IPP 2022 - IPPcode2022 interpret
+"""
+
+LOOP_SUBROUTINE = """.IPPcode22
+DEFVAR GF@i
+DEFVAR GF@n
+MOVE GF@i int@0
+MOVE GF@n int@5
+CALL f
+WRITE GF@i
+EXIT int@0
+LABEL f
+LABEL again
+ADD GF@i GF@i int@1
+JUMPIFNEQ again GF@i GF@n
+RETURN
+"""
+
+
+def test_call_with_loop_in_body_is_counted_once(run, tmp_path):
+    result = run(LOOP_SUBROUTINE, "--inline", "--stats=stats", "--inlined")
+
+    assert result.returncode == 0, result.stderr
+    assert result.stdout == "5"
+    assert (tmp_path / "stats").read_text().split() == ["1"]
+
+
+def test_each_inlined_call_is_counted(run, tmp_path):
+    program = LOOP_SUBROUTINE.replace("CALL f\n", "CALL f\nMOVE GF@n int@8\nCALL f\nMOVE GF@n int@9\nCALL f\n")
+    result = run(program, "--inline", "--stats=stats", "--inlined")
+
+    assert result.returncode == 0, result.stderr
+    assert result.stdout == "9"
+    assert (tmp_path / "stats").read_text().split() == ["3"]
@@ -0,0 +1,31 @@
+"""
+Tests of binary execution trace (--trace).
+
+Author: Vilém Gottwald (xgottw07)
+Project: IPP 2022 - IPPcode2022 interpret
+"""
+
+from trace_decode import readTrace
+
+
+def test_large_orders_are_recorded(run, xml, tmp_path):
+    program = xml((1, "DEFVAR", ("var", "GF@x")),
+                  (5000000000, "MOVE", ("var", "GF@x"), ("int", "7")),
+                  (2 ** 70, "WRITE", ("var", "GF@x")))
+    result = run(program, "--trace=trace.bin")
+
+    assert result.returncode == 0, result.stderr
+    assert result.stdout == "7"
+    opcodes, total, records = readTrace((tmp_path / "trace.bin").read_bytes())
+    assert total == 3
+    assert [record[1] for record in records] == [1, 5000000000, 2 ** 64 - 1]
+    assert [opcodes[record[2]] for record in records] == ["DEFVAR", "MOVE", "WRITE"]
+
+
+def test_error_with_large_order_is_traced(run, xml, tmp_path):
+    program = xml((5000000000, "EXIT", ("int", "7")))
+    result = run(program, "--trace=trace.bin")
+
+    assert result.returncode == 7
+    _, _, records = readTrace((tmp_path / "trace.bin").read_bytes())
+    assert records[-1][1] == 5000000000
@@ -0,0 +1,428 @@
+"""
+Module containing tiered execution of hot regions by generated Python code.
+
+Labels count how many times they are executed. Label executed THRESHOLD times
+compiles region of instructions starting with it into Python function and
+switches itself to variant executing the region by this function. Region ends
+with the first JUMP, before the first CALL, RETURN, EXIT or BREAK or after
+MAX_REGION instructions. Jump to the region start is compiled as loop, so hot
+loop runs inside of the function until it jumps out of the region.
+
+Compiled instructions read variables directly from frame storages, keep values
+of variables in Python locals and check types only by guards. Guard fails
+on every unusual path (undefined frame or variable, uninitialised variable,
+wrong operand types or values): function then returns to the interpreter
+before the instruction, which is executed generically, so errors and results
+are always the same as without tiering. Other instructions (READ, WRITE,
+frame instructions, ...) are executed generically from the compiled code.
+
+Tier-up events (label, region size, whether it loops, compile time) and side
+exits of each region can be written into log file. Compiled regions are not
+observed by hooks, so tiering can't be combined with options using them.
+
+Author: Vilém Gottwald (xgottw07)
+Project: IPP 2022 - IPPcode2022 interpret
+"""
+
+from time import perf_counter
+
+from program import *
+
+
+class Tiering:
+    """Counts entries of labels and promotes hot regions to compiled code."""
+
+    THRESHOLD = 100
+    """Default number of label executions after which its region is compiled."""
+
+    MAX_REGION = 256
+
+    active = None
+    """Tiering promoting regions of the interpreted program."""
+
+    def __init__(self, threshold = None, logFile = None):
+        self.threshold = threshold or self.THRESHOLD
+        self.logFile = logFile
+        self.events = list()
+        """Compiled label, region size, whether region loops and compile time of each tier-up."""
+        self.compileTime = 0.0
+
+    def install(self):
+        """Switches labels of loaded program to their counting variant."""
+        Tiering.active = self
+        for idx, instruction in enumerate(Program.instructions):
+            if type(instruction) is Label:
+                instruction.__class__ = CountingLabel
+                instruction.index = idx
+                instruction.entries = 0
+        if self.logFile is not None:
+            Program.finalizers.append(self.finish)
+
+    def tierUp(self, label):
+        """Compiles region starting with label, label then executes the region."""
+        start = perf_counter()
+        compiler = RegionCompiler(Program.instructions, label.index)
+        region = compiler.compile()
+        elapsed = perf_counter() - start
+        self.compileTime += elapsed
+
+        if region is None:
+            label.__class__ = Label
+            return
+        label.region = region
+        label.sideExits = 0
+        label.__class__ = CompiledLabel
+        self.events.append((label, compiler.size, compiler.loops, elapsed))
+
+    def finish(self, exitCode):
+        """Writes tier-up events, compile time and side exits into log file."""
+        lines = list()
+        for label, size, loops, elapsed in self.events:
+            lines.append(f"tier-up label={label.args[0].name} order={label.order} index={label.index} "
+                         f"instructions={size} loop={'yes' if loops else 'no'} "
+                         f"compile={elapsed * 1000:.3f} ms")
+        lines.append(f"compiled regions: {len(self.events)}, compile time: {self.compileTime * 1000:.3f} ms, "
+                     f"side exits: {sum(event[0].sideExits for event in self.events)}")
+        try:
+            with open(self.logFile, "w") as f:
+                f.write("\n".join(lines) + "\n")
+        except OSError:
+            exitWMsg(OUTPUT_FILE_ERR, "Could not create tiering log file.")
+
+
+class CountingLabel(Label):
+    """Label counting its executions until its region is compiled."""
+
+    def exec(self):
+        self.entries += 1
+        if self.entries == Tiering.active.threshold:
+            Tiering.active.tierUp(self)
+
+
+class CompiledLabel(Label):
+    """Label executing its region by compiled function."""
+
+    def exec(self):
+        idx, sideExit = self.region()
+        if sideExit: # instruction the guard failed for is executed generically
+            self.sideExits += 1
+            Program.counter.idx = idx
+            Program.instructions[idx].exec()
+        else:
+            Program.counter.jumpTo(idx)
+
+
+class RegionCompiler:
+    """Generates Python function executing region of instructions starting with label.
+
+    Function returns index of instruction execution continues with and bool whether
+    it is a side exit (the instruction still has to be executed). Executed instructions
+    are added to Program.executed, the main loop counts the label itself."""
+
+    _FRAMES = {GlobFrame: "gf", LocFrame: "lf", TempFrame: "tf"}
+    _NUMERIC = (ConstantType.INT, ConstantType.FLOAT)
+    _COMPARABLE = (ConstantType.INT, ConstantType.FLOAT, ConstantType.STRING, ConstantType.BOOL)
+
+    def __init__(self, instructions, start):
+        self.instructions = instructions
+        self.start = start
+        self.size = 0
+        self.loops = False
+        self.namespace = {"Constant": Constant, "Program": Program, "counter": Program.counter,
+                          "GlobFrame": GlobFrame, "LocFrame": LocFrame, "TempFrame": TempFrame}
+        self.namespace.update((constType.name, constType) for constType in ConstantType)
+        self._lines = list()
+        self._temps = 0
+        self._values = dict()
+        """Locals holding current values of variables (and their types if known) by frame and name."""
+        self._defined = set()
+        """Variables known to be defined and initialised (by frame and name)."""
+        self._idx = start
+        self._rel = 0
+        """Index of compiled instruction and its index relative to region start."""
+
+    def compile(self):
+        """Returns compiled function of region, None if region is too small to be compiled."""
+        idx = self.start
+        compiled = 0
+        while idx - self.start < Tiering.MAX_REGION:
+            instruction = self.instructions[idx]
+            if not self._isSupported(instruction):
+                break
+            self._rel = idx - self.start
+            self._idx = idx
+            if not isinstance(instruction, Label):
+                self._instruction(instruction)
+                compiled += 1
+            idx += 1
+            if isinstance(instruction, Jump):
+                break
+        self.size = idx - self.start
+        if compiled < 2:
+            return None
+
+        if not isinstance(self.instructions[idx - 1], Jump):
+            self._emit(f"n += {self.size - 1}; return {idx}, False")
+        source = "\n".join(["def region():",
+                            "    n = 0",
+                            "    gf = GlobFrame._vars",
+                            "    lf = LocFrame._vars",
+                            "    tf = TempFrame._vars",
+                            "    stack = Program.dataStack.stack",
+                            "    try:",
+                            "        while True:"]
+                           + ["            " + line for line in self._lines]
+                           + ["    except SystemExit: # error of generically executed instruction",
+                              f"        n += counter.idx - {self.start}",
+                              "        raise",
+                              "    finally:",
+                              "        Program.executed += n"])
+        label = self.instructions[self.start].args[0].name
+        exec(compile(source, f"<region {label}>", "exec"), self.namespace)
+        return self.namespace["region"]
+
+    def _isSupported(self, instruction):
+        """Returns bool whether instruction can be part of compiled region."""
+        if instruction is None or isinstance(instruction, (Call, Return, Exit, Break)):
+            return False
+        if not isinstance(instruction, Instruction):
+            return False
+        if isinstance(instruction, (Jump, Jumpifeq, Jumpifneq)):
+            return Label._definedLabels.get(instruction.args[0].name) is not None
+        return True
+
+    # --- Instructions -----
+
+    def _instruction(self, instruction):
+        """Emits code of instruction."""
+        args = instruction.args
+        if isinstance(instruction, Move):
+            self._write(args[0], *self._read(args[1]))
+        elif isinstance(instruction, (Add, Sub, Mul)):
+            operator = "+" if isinstance(instruction, Add) else "-" if isinstance(instruction, Sub) else "*"
+            self._arithmetic(instruction, operator)
+        elif isinstance(instruction, (Idiv, Div)):
+            self._division(instruction)
+        elif isinstance(instruction, (Lt, Gt)):
+            self._relational(instruction, "<" if isinstance(instruction, Lt) else ">")
+        elif isinstance(instruction, Eq):
+            result = self._equality(args[1], args[2])
+            if result is None:
+                self._generic(instruction)
+            else:
+                self._write(args[0], self._temp(f"Constant(BOOL, {result})"), ConstantType.BOOL)
+        elif isinstance(instruction, (And, Or)):
+            self._typed(instruction, (ConstantType.BOOL, ConstantType.BOOL), ConstantType.BOOL,
+                        "{0}.value and {1}.value" if isinstance(instruction, And) else "{0}.value or {1}.value")
+        elif isinstance(instruction, Not):
+            self._typed(instruction, (ConstantType.BOOL,), ConstantType.BOOL, "not {0}.value")
+        elif isinstance(instruction, Concat):
+            self._typed(instruction, (ConstantType.STRING, ConstantType.STRING), ConstantType.STRING,
+                        "{0}.value + {1}.value")
+        elif isinstance(instruction, Strlen):
+            self._typed(instruction, (ConstantType.STRING,), ConstantType.INT, "len({0}.value)")
+        elif isinstance(instruction, (Getchar, Stri2int)):
+            self._typed(instruction, (ConstantType.STRING, ConstantType.INT),
+                        ConstantType.STRING if isinstance(instruction, Getchar) else ConstantType.INT,
+                        "{0}.value[{1}.value]" if isinstance(instruction, Getchar) else "ord({0}.value[{1}.value])",
+                        "not 0 <= {1}.value < len({0}.value)")
+        elif isinstance(instruction, Int2char):
+            self._typed(instruction, (ConstantType.INT,), ConstantType.STRING, "chr({0}.value)",
+                        "not 0 <= {0}.value < 0x110000")
+        elif isinstance(instruction, Pushs):
+            self._emit(f"stack.append({self._read(args[0])[0]})")
+        elif isinstance(instruction, Pops):
+            self._checkWritable(args[0])
+            self._exitIf("not stack")
+            self._write(args[0], self._temp("stack.pop()"))
+        elif isinstance(instruction, Jump):
+            self._jump(args[0])
+        elif isinstance(instruction, (Jumpifeq, Jumpifneq)):
+            result = self._equality(args[1], args[2])
+            if result is None:
+                self._generic(instruction)
+                return
+            self._emit(f"if {'' if isinstance(instruction, Jumpifeq) else 'not '}{result}:")
+            self._lines.append("    " + self._jumpCode(args[0]))
+        else:
+            self._generic(instruction)
+
+    def _arithmetic(self, instruction, operator):
+        """Emits ADD, SUB or MUL: operands have the same numeric type, result has it too."""
+        operand1, operand2 = self._read(instruction.args[1]), self._read(instruction.args[2])
+        resultType = self._sameType(operand1, operand2, self._NUMERIC)
+        if resultType is None:
+            self._generic(instruction)
+            return
+        self._write(instruction.args[0],
+                    self._temp(f"Constant({resultType}, {operand1[0]}.value {operator} {operand2[0]}.value)"),
+                    ConstantType.__members__.get(resultType))
+
+    def _division(self, instruction):
+        """Emits IDIV or DIV with non-zero divisor."""
+        integer = isinstance(instruction, Idiv)
+        constType = ConstantType.INT if integer else ConstantType.FLOAT
+        if not self._checkTypes(instruction, (constType, constType), "{1}.value == 0"):
+            return
+        operand1, operand2 = self._read(instruction.args[1]), self._read(instruction.args[2])
+        operator = "//" if integer else "/"
+        self._write(instruction.args[0],
+                    self._temp(f"Constant({constType.name}, {operand1[0]}.value {operator} {operand2[0]}.value)"),
+                    constType)
+
+    def _relational(self, instruction, operator):
+        """Emits LT or GT: operands have the same type other than nil."""
+        operand1, operand2 = self._read(instruction.args[1]), self._read(instruction.args[2])
+        if self._sameType(operand1, operand2, self._COMPARABLE) is None:
+            self._generic(instruction)
+            return
+        self._write(instruction.args[0],
+                    self._temp(f"Constant(BOOL, {operand1[0]}.value {operator} {operand2[0]}.value)"),
+                    ConstantType.BOOL)
+
+    def _equality(self, symb1, symb2):
+        """Emits comparison of EQ or conditional jump, returns expression of its result
+        (None if operands always differ in type)."""
+        (name1, type1), (name2, type2) = self._read(symb1), self._read(symb2)
+        if type1 is not None and type2 is not None:
+            if type1 is type2:
+                return self._temp(f"{name1}.value == {name2}.value")
+            if ConstantType.NIL in (type1, type2):
+                return "False"
+            return None
+
+        if type1 is not None: # the constant one is the second one
+            name1, type1, name2, type2 = name2, type2, name1, type1
+        if type2 is ConstantType.NIL:
+            return self._temp(f"{name1}.type is NIL")
+        if type2 is not None:
+            self._exitIf(f"{name1}.type is not {type2.name} and {name1}.type is not NIL")
+            return self._temp(f"{name1}.type is {type2.name} and {name1}.value == {name2}.value")
+        self._exitIf(f"{name1}.type is not {name2}.type and {name1}.type is not NIL and {name2}.type is not NIL")
+        return self._temp(f"{name1}.type is {name2}.type and {name1}.value == {name2}.value")
+
+    def _typed(self, instruction, types, resultType, expression, failure = None):
+        """Emits instruction with operands of given types, result is given expression
+        of operands (formatted with their names), failure is expression of invalid values."""
+        if not self._checkTypes(instruction, types, failure):
+            return
+        names = [self._read(symb)[0] for symb in instruction.args[1:]]
+        self._write(instruction.args[0], self._temp(f"Constant({resultType.name}, {expression.format(*names)})"),
+                    resultType)
+
+    def _checkTypes(self, instruction, types, failure = None):
+        """Emits guards of operands types (and of failure expression), returns False
+        (and emits generic instruction) if the guards always fail."""
+        operands = [self._read(symb) for symb in instruction.args[1:]]
+        conditions = list()
+        for (name, constType), expected in zip(operands, types):
+            if constType is None:
+                conditions.append(f"{name}.type is not {expected.name}")
+            elif constType is not expected:
+                self._generic(instruction)
+                return False
+        if failure is not None:
+            conditions.append(failure.format(*(name for name, _ in operands)))
+        if conditions:
+            self._exitIf(" or ".join(conditions))
+        return True
+
+    def _sameType(self, operand1, operand2, allowed):
+        """Emits guard of operands having the same type from allowed types,
+        returns expression of the type (None if the guard always fails)."""
+        (name1, type1), (name2, type2) = operand1, operand2
+        if type1 is not None and type2 is not None:
+            return type1.name if type1 is type2 and type1 in allowed else None
+        if type1 is not None or type2 is not None:
+            known, other = (type1, name2) if type1 is not None else (type2, name1)
+            if known not in allowed:
+                return None
+            self._exitIf(f"{other}.type is not {known.name}")
+            return known.name
+        allowedTypes = " and ".join(f"{name1}.type is not {constType.name}" for constType in allowed)
+        self._exitIf(f"{name1}.type is not {name2}.type or ({allowedTypes})")
+        return f"{name1}.type"
+
+    def _jump(self, labelNT):
+        """Emits jump to label."""
+        self._emit(self._jumpCode(labelNT))
+
+    def _jumpCode(self, labelNT):
+        """Returns code of jump to label, jump to region start continues the loop."""
+        target = Label._definedLabels[labelNT.name]
+        if target == self.start:
+            self.loops = True
+            return f"n += {self._rel + 1}; continue"
+        return f"n += {self._rel}; return {target}, False"
+
+    def _generic(self, instruction):
+        """Emits generic execution of instruction."""
+        name = f"i{self._idx}"
+        self.namespace[name] = instruction
+        self._emit(f"counter.idx = {self._idx}")
+        self._emit(f"{name}.exec()")
+        if isinstance(instruction, (Createframe, Pushframe, Popframe)):
+            self._emit("lf = LocFrame._vars")
+            self._emit("tf = TempFrame._vars")
+            self._values = {key: value for key, value in self._values.items() if key[0] == "gf"}
+            self._defined = {key for key in self._defined if key[0] == "gf"}
+        elif not isinstance(instruction, (Write, Dprint, Defvar)):
+            self._values = dict() # instruction can write any variable
+
+    # --- Operands -----
+
+    def _read(self, symb):
+        """Emits reading of symbol, returns name of its constant and its type if it is known."""
+        if isinstance(symb, Constant):
+            name = f"k{len(self.namespace)}"
+            self.namespace[name] = symb
+            return name, symb.type
+
+        key = (self._FRAMES[symb.frame], symb.name)
+        if key in self._values:
+            return self._values[key]
+        if key in self._defined:
+            name = self._temp(f"{key[0]}[{symb.name!r}]")
+        elif key[0] == "gf":
+            name = self._temp(f"gf.get({symb.name!r})")
+            self._exitIf(f"{name} is None")
+        else:
+            name = self._temp(f"{key[0]}.get({symb.name!r}) if {key[0]} is not None else None")
+            self._exitIf(f"{name} is None")
+        self._values[key] = (name, None)
+        self._defined.add(key)
+        return name, None
+
+    def _checkWritable(self, var):
+        """Emits guard of variable being defined."""
+        key = (self._FRAMES[var.frame], var.name)
+        if key in self._defined:
+            return
+        if key[0] == "gf":
+            self._exitIf(f"{var.name!r} not in gf")
+        else:
+            self._exitIf(f"{key[0]} is None or {var.name!r} not in {key[0]}")
+
+    def _write(self, var, name, constType = None):
+        """Emits writing of constant with given name (and type if it is known) into variable."""
+        self._checkWritable(var)
+        key = (self._FRAMES[var.frame], var.name)
+        self._emit(f"{key[0]}[{var.name!r}] = {name}")
+        self._values[key] = (name, constType)
+        self._defined.add(key)
+
+    # --- Code -----
+
+    def _temp(self, expression):
+        """Emits assignment of expression into new local, returns its name."""
+        self._temps += 1
+        name = f"c{self._temps}"
+        self._emit(f"{name} = {expression}")
+        return name
+
+    def _exitIf(self, condition):
+        """Emits side exit before current instruction taken when condition holds."""
+        self._emit(f"if {condition}: n += {self._rel}; return {self._idx}, True")
+
+    def _emit(self, line):
+        self._lines.append(line)
@@ -0,0 +1,94 @@
+"""
+Module containing instrumentation of interpret phases.
+
+Report lists wall and CPU time of each phase (loading steps, execution, output),
+peak resident set size at the end of each phase and number of garbage collections
+of each generation during it, followed by totals and numbers of loaded
+and executed instructions. Phases are measured only at their boundaries,
+so nothing is paid inside of the main loop.
+
+Author: Vilém Gottwald (xgottw07)
+Project: IPP 2022 - IPPcode2022 interpret
+"""
+
+import atexit
+import gc
+import sys
+from contextlib import contextmanager
+from time import perf_counter, process_time
+
+try:
+    import resource
+except ImportError: # not available outside of unix systems
+    resource = None
+
+
+class Timings:
+    """Timings of interpret phases written into report file when interpret ends."""
+
+    _file = None
+    _start = None
+    _phases = list()
+    """Name, wall time, CPU time, peak RSS and GC collections of each finished phase."""
+
+    @classmethod
+    def enable(cls, file):
+        """Starts measuring, report is written into file at interpret exit."""
+        cls._file = file
+        cls._start = cls._sample()
+        atexit.register(cls.write)
+
+    @classmethod
+    def isEnabled(cls):
+        """Returns bool whether phases are measured."""
+        return cls._file is not None
+
+    @classmethod
+    @contextmanager
+    def phase(cls, name):
+        """Measures enclosed phase (also when it ends by exit or error)."""
+        if cls._file is None:
+            yield
+            return
+
+        start = cls._sample()
+        try:
+            yield
+        finally:
+            cls._phases.append((name,) + cls._difference(start, cls._sample()))
+
+    @staticmethod
+    def _sample():
+        """Returns wall time, CPU time, peak RSS (KiB) and GC collections of each generation."""
+        peakRss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss if resource is not None else None
+        collections = tuple(generation["collections"] for generation in gc.get_stats())
+        return perf_counter(), process_time(), peakRss, collections
+
+    @staticmethod
+    def _difference(start, end):
+        """Returns wall time and CPU time spent between samples, peak RSS of the end sample
+        and GC collections between samples."""
+        collections = tuple(e - s for s, e in zip(start[3], end[3]))
+        return end[0] - start[0], end[1] - start[1], end[2], collections
+
+    @classmethod
+    def write(cls):
+        """Writes report of measured phases."""
+        from program import Program
+        rows = cls._phases + [("total",) + cls._difference(cls._start, cls._sample())]
+        lines = [f"{'phase':<16}{'wall [ms]':>12}{'cpu [ms]':>12}{'peak RSS [KiB]':>16}  gc collections"]
+        for name, wall, cpu, peakRss, collections in rows:
+            peakRss = "-" if peakRss is None else peakRss
+            collections = "/".join(map(str, collections))
+            lines.append(f"{name:<16}{wall * 1000:>12.3f}{cpu * 1000:>12.3f}{peakRss:>16}  {collections}")
+
+        instructions = getattr(Program, "instructions", None)
+        loaded = 0 if instructions is None else len(instructions) - 1
+        lines.append(f"loaded instructions: {loaded}")
+        lines.append(f"executed instructions: {Program.executed}")
+
+        try:
+            with open(cls._file, "w") as f:
+                f.write("\n".join(lines) + "\n")
+        except OSError:
+            print("ERROR - Couldn't write timings file", file = sys.stderr)
@@ -0,0 +1,97 @@
+"""
+IPPcode22 trace decoder
+
+Prints trace file created by interpret --trace=FILE option in readable form.
+
+    Usage: python3.8 trace_decode.py FILE [--last=N]
+
+Author: Vilém Gottwald (xgottw07)
+Project: IPP 2022 - IPPcode2022 interpret
+"""
+
+import sys
+from struct import Struct, error as StructError
+
+HEADER = Struct("<8sHHH")
+COUNTS = Struct("<IQ")
+RECORD = Struct("<IQBBq")
+DOUBLE = Struct("<d")
+INT64 = Struct("<q")
+
+TYPES = {0: "int", 1: "string", 2: "bool", 3: "nil", 4: "float"}
+KINDS = {252: "uninit", 253: "exit", 254: "branch", 255: ""}
+
+
+def readTrace(data):
+    """Parses trace file data, returns opcode names, total record count and records."""
+    magic, version, recordSize, opcodeCount = HEADER.unpack_from(data, 0)
+    if magic != b"IPPTRACE" or version != 2 or recordSize != RECORD.size:
+        raise ValueError("unsupported trace file")
+
+    offset = HEADER.size
+    opcodes = list()
+    for _ in range(opcodeCount):
+        length = data[offset]
+        opcodes.append(data[offset + 1:offset + 1 + length].decode("ascii"))
+        offset += 1 + length
+
+    stored, total = COUNTS.unpack_from(data, offset)
+    offset += COUNTS.size
+    records = [RECORD.unpack_from(data, offset + i * RECORD.size) for i in range(stored)]
+    return opcodes, total, records
+
+
+def formatResult(kind, value):
+    """Returns readable form of record result."""
+    if kind in TYPES:
+        typeName = TYPES[kind]
+        if typeName == "float":
+            value = float.hex(DOUBLE.unpack(INT64.pack(value))[0])
+        elif typeName == "bool":
+            value = "true" if value else "false"
+        elif typeName == "string":
+            value = f"len={value}"
+        elif typeName == "nil":
+            value = "nil"
+        return f"{typeName}@{value}"
+    elif kind == 254:
+        return "taken" if value else "not taken"
+    elif kind == 253:
+        return f"exit {value}"
+    return KINDS.get(kind, f"kind {kind}")
+
+
+def main():
+    args = sys.argv[1:]
+    last = None
+    for arg in args[:]:
+        if arg.startswith("--last="):
+            last = int(arg[7:])
+            args.remove(arg)
+    if len(args) != 1:
+        print("Usage: python3.8 trace_decode.py FILE [--last=N]", file=sys.stderr)
+        exit(10)
+
+    try:
+        with open(args[0], "rb") as f:
+            data = f.read()
+        opcodes, total, records = readTrace(data)
+    except OSError:
+        print("ERROR - Couldn't open trace file", file=sys.stderr)
+        exit(11)
+    except (ValueError, StructError, IndexError):
+        print("ERROR - Invalid trace file", file=sys.stderr)
+        exit(11)
+
+    first = total - len(records)
+    if last is not None and last < len(records):
+        first += len(records) - last
+        records = records[len(records) - last:]
+
+    print(f"# {total} executed instructions traced, showing last {len(records)}")
+    for seq, (idx, order, opcodeId, kind, value) in enumerate(records, first):
+        result = formatResult(kind, value)
+        print(f"{seq:>10}  idx={idx:<8} order={order:<8} {opcodes[opcodeId]:<12} {result}")
+
+if __name__ == "__main__":
+    main()
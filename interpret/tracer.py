@@ -0,0 +1,178 @@
+"""
+Module containing binary execution tracer.
+
+Tracer keeps last executed instructions in fixed-size ring buffer of binary
+records and dumps them into a file when interpretation ends (normally or
+with error). Trace file can be read by trace_decode.py.
+
+Trace file format (little endian):
+    header:  magic "IPPTRACE", version (u16), record size (u16),
+             number of opcodes (u16), opcode names (u8 length + ASCII),
+             number of records in file (u32), number of all records (u64)
+    records: instruction index (u32), instruction order (u64, larger orders are
+             stored as the maximal u64 value),
+             opcode id (u8), result kind (u8), value summary (i64)
+
+Author: Vilém Gottwald (xgottw07)
+Project: IPP 2022 - IPPcode2022 interpret
+"""
+
+from struct import Struct
+
+import program
+from program import Program, Instruction, Jumpifeq, Jumpifneq
+from data_types import *
+
+
+class Tracer:
+    """Ring buffer tracer of executed instructions."""
+
+    MAGIC = b"IPPTRACE"
+    VERSION = 2
+    DEFAULT_SIZE = 65536
+
+    HEADER = Struct("<8sHHH")
+    COUNTS = Struct("<IQ")
+    RECORD = Struct("<IQBBq")
+    DOUBLE = Struct("<d")
+    INT64 = Struct("<q")
+
+    # result kinds, ConstantType values are used for results written into variables
+    KIND_NONE = 255
+    """Instruction without result."""
+    KIND_BRANCH = 254
+    """Conditional jump, value is 1 if the jump was taken."""
+    KIND_EXIT = 253
+    """Instruction ending the interpretation, value is exit code."""
+    KIND_UNINIT = 252
+    """Written variable is uninitialised (DEFVAR)."""
+
+    INT64_MIN = -2 ** 63
+    INT64_MAX = 2 ** 63 - 1
+    UINT64_MAX = 2 ** 64 - 1
+
+    def __init__(self, file, size = None):
+        """Creates tracer writing into given file, keeping at most size records."""
+        self.file = file
+        self.size = size or self.DEFAULT_SIZE
+        self.buffer = bytearray(self.size * self.RECORD.size)
+        self.count = 0
+
+        self.opcodes = self._opcodeNames()
+        self._classInfo = dict()
+
+    @staticmethod
+    def _opcodeNames():
+        """Returns sorted list of all opcode names."""
+        names = list()
+        for name, value in vars(program).items():
+            if isinstance(value, type) and issubclass(value, Instruction) \
+                    and value is not Instruction and name == name.capitalize():
+                names.append(name.upper())
+        return sorted(names)
+
+    # how is instruction result recorded
+    _RESULT_NONE = 0
+    _RESULT_VAR = 1
+    _RESULT_BRANCH = 2
+
+    def _info(self, instrClass):
+        """Returns opcode id and result recording mode of instruction class.
+        Specialised instruction classes use id of their opcode."""
+        info = self._classInfo.get(instrClass)
+        if info is None:
+            opcodeId = 0
+            for cls in instrClass.__mro__:
+                if cls.__name__.upper() in self.opcodes:
+                    opcodeId = self.opcodes.index(cls.__name__.upper())
+                    break
+
+            if instrClass.operands[:1] == ("var",):
+                mode = self._RESULT_VAR
+            elif issubclass(instrClass, (Jumpifeq, Jumpifneq)):
+                mode = self._RESULT_BRANCH
+            else:
+                mode = self._RESULT_NONE
+
+            info = (opcodeId, mode)
+            self._classInfo[instrClass] = info
+        return info
+
+    def register(self):
+        """Registers tracer into program execution."""
+        Program.observers.append(self.record)
+        Program.finalizers.append(self.finish)
+
+    def record(self, instr, idx):
+        """Records executed instruction into ring buffer."""
+        opcodeId, mode = self._info(instr.__class__)
+        kind = self.KIND_NONE
+        value = 0
+        if mode == self._RESULT_VAR:
+            const = instr.args[0].getValueUninit()
+            if const is None:
+                kind = self.KIND_UNINIT
+            else:
+                kind = const.type.value
+                value = self._summary(const)
+        elif mode == self._RESULT_BRANCH:
+            kind = self.KIND_BRANCH
+            value = int(Program.counter.jump)
+
+        offset = (self.count % self.size) * self.RECORD.size
+        order = instr.order if instr.order <= self.UINT64_MAX else self.UINT64_MAX
+        self.RECORD.pack_into(self.buffer, offset, idx, order, opcodeId, kind, value)
+        self.count += 1
+
+    def _summary(self, const):
+        """Returns 64 bit integer summary of constant value."""
+        if const.type is ConstantType.INT:
+            value = const.value
+            if self.INT64_MIN <= value <= self.INT64_MAX:
+                return value
+            return self.INT64_MIN if value < 0 else self.INT64_MAX
+        elif const.type is ConstantType.FLOAT:
+            return self.INT64.unpack(self.DOUBLE.pack(const.value))[0]
+        elif const.type is ConstantType.BOOL:
+            return int(const.value)
+        elif const.type is ConstantType.STRING:
+            return len(const.value)
+        return 0
+
+    def finish(self, exitCode):
+        """Records the last instruction with exit code and dumps trace into file."""
+        idx = Program.counter.getIndex()
+        instr = Program.instructions[idx]
+        if instr is not None:
+            code = exitCode if isinstance(exitCode, int) else 0
+            opcodeId, _ = self._info(instr.__class__)
+            offset = (self.count % self.size) * self.RECORD.size
+            order = min(instr.order, self.UINT64_MAX)
+            self.RECORD.pack_into(self.buffer, offset, idx, order, opcodeId, self.KIND_EXIT, code)
+            self.count += 1
+        self.dump()
+
+    def records(self):
+        """Returns buffered records in chronological order."""
+        recordSize = self.RECORD.size
+        if self.count <= self.size:
+            return self.buffer[:self.count * recordSize]
+        start = (self.count % self.size) * recordSize
+        return self.buffer[start:] + self.buffer[:start]
+
+    def dump(self):
+        """Writes trace file."""
+        header = bytearray(self.HEADER.pack(self.MAGIC, self.VERSION,
+                                            self.RECORD.size, len(self.opcodes)))
+        for name in self.opcodes:
+            header += bytes([len(name)]) + name.encode("ascii")
+
+        records = self.records()
+        header += self.COUNTS.pack(len(records) // self.RECORD.size, self.count)
+
+        try:
+            with open(self.file, "wb") as f:
+                f.write(header)
+                f.write(records)
+        except OSError:
+            exitWMsg(OUTPUT_FILE_ERR, "Could not create trace output file.")
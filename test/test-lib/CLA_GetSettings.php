@@ -25,6 +25,8 @@ class CLA_GetSettings
     public $testType = TestTypes::BOTH;
     public $recursive = false;
     public $noclean = false;
+    public $force = false;
+    public $cacheFile = NULL;
 
     /**
      * Parses command line arguments and saves settings into public properties.
@@ -39,7 +41,9 @@ class CLA_GetSettings
                                 "parse-only",
                                 "int-only",
                                 "jexampath:",
-                                "noclean"           );
+                                "noclean",
+                                "force",
+                                "cache:"            );
 
         $options = getopt("", $longOptions);
         global $argc;
@@ -101,6 +105,7 @@ class CLA_GetSettings
         
         $this->recursive = array_key_exists("recursive", $options);
         $this->noclean = array_key_exists("noclean", $options);
+        $this->force = array_key_exists("force", $options);
 
         if(array_key_exists("directory", $options))
         {
@@ -122,6 +127,7 @@ class CLA_GetSettings
             $this->checkPathExists($options["jexampath"]);
             $this->jexampath = $options["jexampath"];
         }
+        $this->cacheFile = $options["cache"] ?? $this->directory . '/.testcache.json';
     }
 
     /**
@@ -153,6 +159,8 @@ class CLA_GetSettings
         echo "  --int-only           only interpreter script will be tested\n"; 
         echo "  --jexampath=path     path to directory containing jexamxml.jar and options files (default: /pub/courses/ipp/jexamml/)\n"; 
         echo "  --noclean            temporary files with intermediate results wil not be deleted\n"; 
+        echo "  --force              all tests will be executed, also tests with unchanged files and scripts, cache is rebuilt\n";
+        echo "  --cache=file         file with results of previous tests (default: .testcache.json in tests directory)\n";
     }
 }
 ?>
\ No newline at end of file
@@ -90,6 +90,11 @@ final class HTML
         font-weight: bold;
     }
 
+    .cached {
+        color: gray;
+        font-style: italic;
+    }
+
     ul {
         list-style-type: "- ";
     }
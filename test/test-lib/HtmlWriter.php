@@ -65,6 +65,12 @@ class HtmlWriter
         {
             echo "          <li>noclean</li>\n";
         }
+
+        if ($config->force)
+        {
+            echo "          <li>force</li>\n";
+        }
+        echo "          <li>cache: $config->cacheFile</li>\n";
         echo HTML::$configEnd;
     }
 
@@ -72,8 +78,9 @@ class HtmlWriter
      * Prints testing summary to output HTML.
      * @param int $passedC nubber of passed tests
      * @param int $failedC number of failed tests
+     * @param int $executedC number of executed tests (others have result from previous run)
      */
-    static function printSummary($passedC, $failedC)
+    static function printSummary($passedC, $failedC, $executedC)
     {
         $sum = $passedC + $failedC;
         $percentage = round($passedC / $sum * 100, 2);
@@ -83,6 +90,7 @@ class HtmlWriter
         echo "<li>Počet testů: $sum</li>\n";
         echo "<li>Celkem úspěšných: $passedC</li>\n";
         echo "<li>Celkem neúspěšných: $failedC</li>\n";
+        echo "<li>Spuštěných testů: $executedC (ostatní z předchozího běhu)</li>\n";
         echo HTML::$summaryEnd;
         echo HTML::$resultsHeader;
     }
@@ -98,6 +106,10 @@ class HtmlWriter
         echo "    <div class='description'>\n";
         echo "        <p>Umístění: $testResult->testDir</p>\n";
         echo "        <p>Název: $testResult->testName</p>\n";
+        if ($testResult->cached)
+        {
+            echo "        <p class='cached'>Výsledek z předchozího běhu</p>\n";
+        }
         if ($testResult->type === "failed")
         {
             if($testResult->expRC)
@@ -0,0 +1,150 @@
+<?php
+
+/**
+ * @package IPP project 2022 - test.php
+ * @author Vilem Gottwald
+ */
+
+require_once(__DIR__. "/ReturnValues.php");
+require_once(__DIR__. "/TestTypes.php");
+
+/**
+ * Class storing results of tests between test.php runs.
+ * Each result is stored with hash of its test files (.src, .in, .out, .rc), of sources
+ * of tested scripts (all files with the script extension in the script directory) and
+ * of testing type, test is executed again only if any of them has changed.
+ */
+final class TestCache
+{
+    private $path;
+    private $entries;
+    private $scriptsHash;
+
+    /**
+     * Loads cache file, missing or damaged cache file is an empty cache.
+     * With --force the cache file is not loaded, so it is rebuilt from results of this run.
+     * @param $config - object containing current testing configurantion
+     */
+    public function __construct($config)
+    {
+        $this->path = $config->cacheFile;
+        $this->entries = [];
+        if (!$config->force and file_exists($this->path))
+        {
+            $entries = json_decode(file_get_contents($this->path), true);
+            if (is_array($entries))
+            {
+                $this->entries = $entries;
+            }
+        }
+        $this->scriptsHash = $this->scriptsHash($config);
+    }
+
+    /**
+     * Returns stored result of test if its files and tested scripts haven't changed, NULL otherwise.
+     * @param $test - name of test with path, without extension
+     * @return array|NULL stored result (keys passed, expRC, actRC)
+     */
+    public function get($test)
+    {
+        $entry = $this->entries[$this->key($test)] ?? NULL;
+        if (!is_array($entry) or ($entry['hash'] ?? NULL) !== $this->testHash($test))
+        {
+            return NULL;
+        }
+        return $entry;
+    }
+
+    /**
+     * Stores result of test.
+     * @param $test - name of test with path, without extension
+     * @param $testResult - TestResult object of the test
+     */
+    public function set($test, $testResult)
+    {
+        $this->entries[$this->key($test)] = array(
+            'hash' => $this->testHash($test),
+            'passed' => $testResult->type === "passed",
+            'expRC' => $testResult->expRC,
+            'actRC' => $testResult->actRC,
+        );
+    }
+
+    /**
+     * Writes cache into cache file, exits with OUTPUT_FILE_ERR if it can't be written.
+     */
+    public function save()
+    {
+        if (file_put_contents($this->path, json_encode($this->entries, JSON_PRETTY_PRINT)) === false)
+        {
+            fwrite(STDERR, "ERROR: test cache file can't be written\n");
+            exit(ReturnValues::OUTPUT_FILE_ERR);
+        }
+    }
+
+    /**
+     * Returns key of test in cache, the same test has the same key from any working directory.
+     * @param $test - name of test with path, without extension
+     */
+    private function key($test)
+    {
+        $path = realpath($test . ".src");
+        return $path === false ? $test : substr($path, 0, -strlen(".src"));
+    }
+
+    /**
+     * Returns hash of test files together with hash of tested scripts.
+     * @param $test - name of test with path, without extension
+     */
+    private function testHash($test)
+    {
+        $hash = $this->scriptsHash;
+        foreach (array(".src", ".in", ".out", ".rc") as $extension)
+        {
+            $hash .= (is_file($test . $extension) ? sha1_file($test . $extension) : "-");
+        }
+        return sha1($hash);
+    }
+
+    /**
+     * Returns hash of testing type and of sources of tested scripts (and of JExamXML options for parser).
+     * @param $config - object containing current testing configurantion
+     */
+    private function scriptsHash($config)
+    {
+        $files = [];
+        if ($config->testType !== TestTypes::INTERPRET)
+        {
+            array_push($files, ...$this->sources($config->parseScript));
+        }
+        if ($config->testType !== TestTypes::PARSER)
+        {
+            array_push($files, ...$this->sources($config->intScript));
+        }
+        if ($config->testType === TestTypes::PARSER)
+        {
+            $files[] = $config->jexampath . $config->options;
+        }
+
+        $hash = (string) $config->testType;
+        foreach ($files as $file)
+        {
+            $hash .= $file . (is_file($file) ? sha1_file($file) : "-");
+        }
+        return sha1($hash);
+    }
+
+    /**
+     * Returns sorted paths of all files with the same extension as script in its directory.
+     * @param string $script path to tested script
+     */
+    private function sources($script)
+    {
+        $extension = pathinfo($script, PATHINFO_EXTENSION);
+        $files = glob(dirname(realpath($script) ?: $script) . "/*." . $extension) ?: [$script];
+        sort($files);
+        return $files;
+    }
+}
+
+?>
@@ -7,6 +7,7 @@
 
 require_once(__DIR__. "/TestTypes.php");
 require_once(__DIR__. "/HtmlWriter.php");
+require_once(__DIR__. "/TestCache.php");
 /**
  * Class for representing single test case result.
  */
@@ -18,6 +19,7 @@ final class TestResult
     public $testDir;
     public $expRC;
     public $actRC;
+    public $cached;
 
     /**
      * Creates TestResult object.
@@ -26,8 +28,9 @@ final class TestResult
      * @param bool $hasPassed - marks whether test has passed or not
      * @param $expRc - expected return code (in case of different return codes)
      * @param $actRc - actual return code (in case of different return codes)
+     * @param bool $cached - marks whether result is taken from previous run
      */
-    public function __construct($order, $filePath, $hasPassed, $expRC=NULL, $actRC= NULL)
+    public function __construct($order, $filePath, $hasPassed, $expRC=NULL, $actRC= NULL, $cached=false)
     {
         $this->order=$order;
         $info = pathinfo($filePath);
@@ -36,6 +39,7 @@ final class TestResult
         $this->type = $hasPassed ? "passed" : "failed";
         $this->expRC = is_null($expRC) ? NULL : $expRC;
         $this->actRC = is_null($actRC) ? NULL : $actRC;
+        $this->cached = $cached;
     }
 }
 
@@ -47,6 +51,7 @@ final class Tester
     public $testResults;
     public $passedCount;
     public $failedCount;
+    public $executedCount;
     private $counter;
 
     public function __construct()
@@ -54,6 +59,7 @@ final class Tester
         $this->counter = 1;
         $this->passedCount = 0;
         $this->failedCount = 0;
+        $this->executedCount = 0;
         $this->testResults = [];
     }
 
@@ -66,7 +72,7 @@ final class Tester
         HtmlWriter::printHead();
         HtmlWriter::printHeader();
         HtmlWriter::printConfig($config);
-        HtmlWriter::printSummary($this->passedCount, $this->failedCount);
+        HtmlWriter::printSummary($this->passedCount, $this->failedCount, $this->executedCount);
         foreach ($this->testResults as $test)
         {
             HtmlWriter::printTestcase($test);
@@ -76,23 +82,39 @@ final class Tester
 
     /**
      * Performs tests given in testFiles and stores results.
+     * Tests whose files and tested scripts haven't changed since the previous run
+     * take their result from test cache (unless --force is given).
      * @param $config - object containing current testing configurantion
      * @param $testFiles - list of files containig tests
      */
     public function test($config, $testFiles)
     {
-        switch($config->testType)
+        $cache = new TestCache($config);
+        foreach($testFiles as $test)
         {
-            case TestTypes::BOTH:
-                $this->bothTest($config, $testFiles);
-                break;
-            case TestTypes::PARSER:
-                $this->parserTest($config, $testFiles);
-                break;
-            case TestTypes::INTERPRET:
-                $this->interpretTest($config, $testFiles);
-                break;
+            $cached = $config->force ? NULL : $cache->get($test);
+            if (!is_null($cached))
+            {
+                $this->newCachedTest($test, $cached);
+                continue;
+            }
+
+            switch($config->testType)
+            {
+                case TestTypes::BOTH:
+                    $this->bothTest($config, [$test]);
+                    break;
+                case TestTypes::PARSER:
+                    $this->parserTest($config, [$test]);
+                    break;
+                case TestTypes::INTERPRET:
+                    $this->interpretTest($config, [$test]);
+                    break;
+            }
+            $this->executedCount++;
+            $cache->set($test, end($this->testResults));
         }
+        $cache->save();
     }
 
     /**
@@ -260,6 +282,24 @@ final class Tester
         $this->passedCount++;               
     }
 
+    /**
+     * Creates new test result from result of previous run.
+     * @param $filePath - filepath to the test
+     * @param array $cached - result stored in test cache
+     */
+    private function newCachedTest($filePath, $cached)
+    {
+        $this->testResults[] = new TestResult($this->counter++, $filePath, $cached['passed'], $cached['expRC'], $cached['actRC'], true);
+        if ($cached['passed'])
+        {
+            $this->passedCount++;
+        }
+        else
+        {
+            $this->failedCount++;
+        }
+    }
+
     /**
      * Creates new test result that has failed.
      * @param $filePath -  filepath to the test